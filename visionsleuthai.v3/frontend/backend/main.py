@@ -1,9 +1,15 @@
 import os
 import logging
+import threading
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+# Routes import torch / ultralytics / cv2 / google-cloud-storage lazily, on
+# first use or in the background warmup below, so the app starts in well under
+# a second and /health answers while models load
 from routes import video_analysis, forensic_report, live_analysis
+from models.model_registry import model_registry
+from utils.responses import FastJSONResponse
 
 # Configure logging
 logging.basicConfig(
@@ -15,7 +21,9 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="VisionSleuth AI API",
     description="Backend API for VisionSleuth AI",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson-encoded responses (NumPy, datetimes and Detections supported natively)
+    default_response_class=FastJSONResponse
 )
 
 # CORS Configuration
@@ -87,6 +95,38 @@ app.include_router(video_analysis.router, prefix="/api/video", tags=["video"])
 app.include_router(forensic_report.router, prefix="/api/forensic", tags=["forensic"])
 app.include_router(live_analysis.router, prefix="/api/live", tags=["live"])
 
+@app.on_event("startup")
+async def resume_analysis_jobs():
+    # Pick up jobs interrupted by a restart or crash of the API process
+    try:
+        video_analysis.resume_interrupted_jobs()
+    except Exception as e:
+        logger.error(f"Could not resume interrupted jobs: {str(e)}")
+
+# Model configurations loaded at startup (WARMUP_MODELS, comma-separated modes)
+WARMUP_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", "live_analysis").split(",") if m.strip()]
+
+
+def _warm_up():
+    video_analysis.get_storage_or_none()
+    # Worker processes load their own model as soon as they start
+    if os.getenv("WARMUP_JOB_WORKERS", "true").lower() in ("1", "true", "yes"):
+        video_analysis.job_queue.start()
+    model_registry.warm_up(WARMUP_MODELS)
+    logger.info(f"Warmup finished: {model_registry.warmup_status}")
+
+@app.on_event("startup")
+async def start_background_warmup():
+    # Loading weights and the first inference take seconds; do it off the event loop
+    for mode in WARMUP_MODELS:
+        model_registry.warmup_status.setdefault(mode, "pending")
+    threading.Thread(target=_warm_up, name="model-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_job_queue():
+    # Stop analysis worker processes together with the API
+    video_analysis.job_queue.shutdown()
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -94,8 +134,24 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    # Liveness only; never waits for models
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    models = dict(model_registry.warmup_status)
+    ready = all(state == "warm" for state in models.values())
+    if ready:
+        status = "ready"
+    elif "failed" in models.values():
+        status = "failed"
+    else:
+        status = "warming"
+    return FastJSONResponse(
+        {"status": status, "models": models, "job_queue": video_analysis.job_queue.stats()},
+        status_code=200 if ready else 503
+    )
+
 # Debug endpoint
 @app.get("/debug/routes")
 async def list_routes(request: Request):
@@ -1,23 +1,100 @@
 import torch
 import os
 import logging
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, NamedTuple, Tuple, List, Optional
 import numpy as np
-from ultralytics import YOLO
+from models.detections import CLASS_NAMES, Detections
+from models.model_registry import BACKENDS, default_backend, model_registry
+from models.tiling import expand_regions, merge_tile_detections, select_tiles, tile_grid, tile_to_frame
+from utils.storage import fetch_to_local
 
 logger = logging.getLogger(__name__)
 
+# FALSE POSITIVE FILTERING: Common misclassifications for knives
+# These objects are often confused with knives but should NOT be mapped to knife
+# Context-aware filtering based on confidence, aspect ratio, and size
+KNIFE_FALSE_POSITIVES = {
+    'toothbrush': {
+        'min_confidence': 0.55,  # High confidence toothbrush = not a knife
+        'aspect_ratio_range': (0.25, 0.75),  # Toothbrushes are longer/thinner
+        'max_area_ratio': 0.02  # Toothbrushes are typically smaller relative to frame
+    },
+    'scissors': {
+        'min_confidence': 0.45,  # Scissors have distinct shape (two blades)
+        'aspect_ratio_range': (0.35, 0.85),  # Scissors are more square-ish
+        'max_area_ratio': 0.03
+    },
+    'baseball_bat': {
+        'min_confidence': 0.35,  # Baseball bats are much longer and thicker
+        'aspect_ratio_range': (0.08, 0.35),  # Very long/thin
+        'min_area_ratio': 0.01  # Baseball bats are typically larger
+    },
+    'remote': {
+        'min_confidence': 0.5,
+        'aspect_ratio_range': (0.4, 1.6),  # More square/rectangular
+        'max_area_ratio': 0.015
+    },
+    'cell phone': {
+        'min_confidence': 0.5,
+        'aspect_ratio_range': (0.5, 2.0),  # Rectangular, can be portrait/landscape
+        'max_area_ratio': 0.02
+    },
+    'hair drier': {
+        'min_confidence': 0.5,
+        'aspect_ratio_range': (0.3, 0.8),  # Similar to toothbrush
+        'max_area_ratio': 0.02
+    }
+}
+# Area ratios above are relative to this frame size
+FP_REFERENCE_AREA = 640 * 640
+WEAPON_KEYWORDS = ['gun', 'pistol', 'rifle', 'firearm', 'weapon', 'knife', 'blade', 'sword']
+HIGH_RISK_OBJECTS = ['gun', 'knife', 'weapon', 'pistol', 'rifle', 'firearm', 'machete', 'axe']
+MEDIUM_RISK_OBJECTS = ['scissors', 'hammer', 'crowbar', 'baseball_bat', 'bottle']
+
+
+class ClassLookup(NamedTuple):
+    """
+    Per model class index lookup tables for vectorized post-processing.
+
+    A detection of class c maps to fp_id[c] (its own, lower-cased class) when
+    its raw confidence reaches fp_min_conf[c] (knife false-positive classes
+    only, +inf otherwise), and to base_id[c] (name-based dangerous object
+    mapping) otherwise; the *_thr / *_risk columns follow the same choice.
+    """
+    names: Dict[int, str]
+    original_id: np.ndarray
+    base_id: np.ndarray
+    fp_id: np.ndarray
+    fp_min_conf: np.ndarray
+    base_thr: np.ndarray
+    fp_thr: np.ndarray
+    # 2 = high-risk object, 1 = medium-risk object, 0 = other
+    base_risk: np.ndarray
+    fp_risk: np.ndarray
+    # Typical false-positive geometry (aspect ratio h/w, area ratio); NaN = no bound
+    fp_geometry: np.ndarray
+
 
 class CrimeDetectionModel:
-    def __init__(self, mode: str = "video_upload"):
+    def __init__(self, mode: str = "video_upload", model_path: Optional[str] = None, backend: Optional[str] = None):
         """
         Initialize CrimeDetectionModel with mode parameter.
         
         Args:
             mode: "video_upload" (default, no changes) or "live_analysis" (all improvements active)
+            model_path: Weights to load (default: MODEL_PATH env)
+            backend: "torch" or "onnx" (default: INFERENCE_BACKEND env)
         """
         self.model = None
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self._pending_tracker_state: Optional[bytes] = None
+        self.backend = backend or default_backend()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend: {self.backend}")
+        # ONNX Runtime runs on the CPU provider only
+        if self.backend == "onnx":
+            self.device = torch.device('cpu')
+        else:
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.mode = mode
         
         # MOD AYIRIMI: Live analysis için tüm sınırları kaldır
@@ -48,7 +125,7 @@ class CrimeDetectionModel:
         except Exception:
             self.temp_scale = 1.0
         # Model path/name
-        self.model_path = os.getenv("MODEL_PATH", "yolo11n.pt")
+        self.model_path = model_path or os.getenv("MODEL_PATH", "yolo11n.pt")
         
         # Versiyon Tespiti
         path_lower = self.model_path.lower()
@@ -92,64 +169,51 @@ class CrimeDetectionModel:
         except Exception:
             self.iou_threshold = 0.40
         self.agnostic_nms = os.getenv("NMS_CLASS_AGNOSTIC", "false").lower() == "true"
+        # Inference input size; live sessions override it per frame (see models.resolution_controller)
+        self.imgsz = 640
+        # Frames per YOLO call for batched (uploaded video) inference
+        try:
+            self.batch_size = max(1, int(os.getenv("INFERENCE_BATCH_SIZE", "16")))
+        except Exception:
+            self.batch_size = 16
+        # Sliced inference: full-resolution tiles around people/weapons found by the full-frame pass
+        self.tiled_inference = os.getenv("TILED_INFERENCE", "false").lower() == "true"
+        try:
+            self.tile_size = max(64, int(os.getenv("TILE_SIZE", "640")))
+            self.tile_overlap = min(0.9, max(0.0, float(os.getenv("TILE_OVERLAP", "0.2"))))
+            self.tile_max = max(1, int(os.getenv("TILE_MAX_TILES", "6")))
+            self.tile_region_margin = max(0.0, float(os.getenv("TILE_REGION_MARGIN", "0.5")))
+        except Exception:
+            self.tile_size, self.tile_overlap, self.tile_max, self.tile_region_margin = 640, 0.2, 6, 0.5
+        trigger_classes = os.getenv("TILE_TRIGGER_CLASSES", "person,knife,gun,weapon,scissors")
+        self.tile_trigger_ids = np.array(
+            [CLASS_NAMES.intern(c.strip()) for c in trigger_classes.split(",") if c.strip()], dtype=np.int32
+        )
+        self._tile_model = None
+        # Post-processing lookup tables per model class-names table (see _class_lookup)
+        self._class_lookups: Dict[int, ClassLookup] = {}
 
     def load_model(self) -> Dict[str, Any]:
-        """Load the YOLOv8 model from local path, model hub name, or GCP bucket with optimizations"""
+        """Load the YOLOv8 model from local path, model hub name, or object storage with optimizations"""
         try:
-            # Handle GCP path if provided (Format: gcp://bucket-name/path/to/model.pt)
-            if self.model_path.startswith("gcp://"):
-                try:
-                    import re
-                    from utils.gcp_connector import GCPConnector
-                    
-                    # Parse gcp://bucket/blob
-                    match = re.match(r"gcp://([^/]+)/(.+)", self.model_path)
-                    if not match:
-                        raise ValueError(f"Invalid GCP path format: {self.model_path}")
-                    
-                    bucket_name, blob_path = match.groups()
-                    local_model_dir = os.path.join(os.path.dirname(__file__), 'temp_models')
-                    os.makedirs(local_model_dir, exist_ok=True)
-                    local_model_path = os.path.join(local_model_dir, os.path.basename(blob_path))
-                    
-                    # Download only if it doesn't exist
-                    if not os.path.exists(local_model_path):
-                        logger.info(f"Downloading model from GCP: {self.model_path} -> {local_model_path}")
-                        gcp = GCPConnector(bucket_name=bucket_name)
-                        gcp.download_file(blob_path, local_model_path)
-                    
-                    # Update model_path to local for YOLO loading
-                    self.model_path = local_model_path
-                except Exception as gcp_err:
-                    logger.error(f"GCP model download failed: {str(gcp_err)}. Falling back to default.")
-                    self.model_path = "yolov8n.pt"
+            # Weights in object storage (gcp://bucket/path, gs://bucket/path or
+            # storage://key on the configured backend) are downloaded once
+            try:
+                local_model_dir = os.path.join(os.path.dirname(__file__), 'temp_models')
+                self.model_path = fetch_to_local(self.model_path, local_model_dir)
+            except Exception as storage_err:
+                logger.error(f"Model download failed: {str(storage_err)}. Falling back to default.")
+                self.model_path = "yolov8n.pt"
 
-            self.model = YOLO(self.model_path)
-            
-            # Optimize model for inference speed
-            if self.device.type == 'cuda' and torch.cuda.is_available():
-                # Move model to GPU and enable optimizations
-                self.model.to(self.device)
-                # Enable TensorRT if available (further speedup)
-                try:
-                    # This will be used automatically if TensorRT is available
-                    pass
-                except:
-                    pass
-            
-            # Warm up model with dummy inference (reduces first inference latency)
-            if self.mode == "live_analysis":
-                try:
-                    dummy_frame = np.zeros((640, 640, 3), dtype=np.uint8)
-                    _ = self.model(dummy_frame, verbose=False, conf=0.25)
-                    logger.debug("Model warmup completed")
-                except:
-                    pass
+            # Weights are loaded (and warmed up) once per process and shared;
+            # this instance gets its own predictor/tracker on top of them
+            self.model = model_registry.session(self.model_path, self.device, backend=self.backend)
             
-            logger.info(f"Model loaded: {self.model_path} on {self.device}")
+            logger.info(f"Model loaded: {self.model_path} on {self.device} ({self.backend})")
             return {
                 "status": "loaded",
                 "model_path": self.model_path,
+                "backend": self.backend,
                 "device": str(self.device),
                 "confidence_threshold": self.confidence_threshold
             }
@@ -157,119 +221,290 @@ class CrimeDetectionModel:
             logger.error(f"Failed to load model '{self.model_path}': {str(e)}")
             return {"status": "error", "message": str(e)}
 
-    def _calibrate_conf(self, conf: float) -> float:
-        # Simple temperature scaling: conf' = sigmoid(logit(conf)/T)
-        # For stability fallback to linear scaling if conf is edge
-        try:
-            conf = float(conf)
-            if conf <= 0.0:
-                return 0.0
-            if conf >= 1.0:
-                return 1.0
-            import math
-            logit = math.log(conf / (1.0 - conf))
-            scaled = 1.0 / (1.0 + math.exp(-logit / max(1e-6, self.temp_scale)))
-            return float(max(0.0, min(1.0, scaled)))
-        except Exception:
-            # Fallback: linear scaling
-            return float(max(0.0, min(1.0, conf / max(1e-6, self.temp_scale))))
+    def _ensure_loaded(self) -> None:
+        if self.model is None:
+            load_status = self.load_model()
+            if load_status.get("status") != "loaded":
+                raise ValueError(load_status.get("message", "Model not loaded"))
 
-    def process_frame(self, frame: np.ndarray) -> Tuple[List[Dict[str, Any]], np.ndarray]:
-        """Process a single frame and return detections with annotated frame"""
-        try:
-            if self.model is None:
-                load_status = self.load_model()
-                if load_status.get("status") != "loaded":
-                    raise ValueError(load_status.get("message", "Model not loaded"))
-
-            # Preprocessing optimization: resize if frame is too large (faster inference)
-            original_shape = frame.shape
-            max_size = 1280  # Max dimension for faster inference
-            if max(original_shape[:2]) > max_size:
-                scale = max_size / max(original_shape[:2])
-                new_width = int(original_shape[1] * scale)
-                new_height = int(original_shape[0] * scale)
-                import cv2
-                frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-                logger.debug(f"Resized frame from {original_shape} to {frame.shape} for faster inference")
-
-            # Run inference with ByteTrack (SOTA tracking)
-            # persist=True ensures tracks are maintained across process_frame calls
-            results = self.model.track(
-                frame,
-                persist=True,
+    def _prepare_frame(self, frame: np.ndarray) -> np.ndarray:
+        """Resize frames larger than 1280px before inference"""
+        # Preprocessing optimization: resize if frame is too large (faster inference)
+        original_shape = frame.shape
+        max_size = 1280  # Max dimension for faster inference
+        if max(original_shape[:2]) > max_size:
+            scale = max_size / max(original_shape[:2])
+            new_width = int(original_shape[1] * scale)
+            new_height = int(original_shape[0] * scale)
+            import cv2
+            frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+            logger.debug(f"Resized frame from {original_shape} to {frame.shape} for faster inference")
+        return frame
+
+    def _track(self, source, imgsz: Optional[int] = None):
+        # Run inference with ByteTrack (SOTA tracking)
+        # persist=True ensures tracks are maintained across calls; for a list
+        # source ultralytics updates the tracker image by image, in list order
+        use_half = self.device.type == 'cuda'
+        return self.model.track(
+            source,
+            persist=True,
+            conf=self.confidence_threshold,
+            iou=self.iou_threshold,
+            agnostic_nms=True,
+            half=use_half,
+            verbose=False,
+            max_det=50,
+            imgsz=imgsz or self.imgsz,
+            tracker="bytetrack.yaml", # or "botsort.yaml"
+            **self._device_args()
+        )
+
+    def _device_args(self) -> Dict[str, Any]:
+        # Pre-processing tensors stay on the CPU for ONNX Runtime
+        return {"device": "cpu"} if self.backend == "onnx" else {}
+
+    def _refine_with_tiles(
+        self,
+        frames: List[np.ndarray],
+        prepared: List[np.ndarray],
+        detections: List[Detections]
+    ) -> List[Detections]:
+        """
+        Sliced second pass (see models.tiling). Only frames larger than a tile
+        whose full-frame pass found a trigger class are sliced, and only the
+        tiles around those detections are run; the tiles of the whole batch go
+        through one untracked model call per batch_size tiles.
+        """
+        crops: List[np.ndarray] = []
+        owners: List[Tuple[int, Tuple[float, float, float]]] = []
+        for i, (frame, small, dets) in enumerate(zip(frames, prepared, detections)):
+            h, w = frame.shape[:2]
+            if max(h, w) <= self.tile_size or len(dets) == 0:
+                continue
+            flagged = np.isin(dets.class_id, self.tile_trigger_ids)
+            if dets.original_class_id is not None:
+                flagged |= np.isin(dets.original_class_id, self.tile_trigger_ids)
+            if not flagged.any():
+                continue
+            # Detections are in the coordinates of the (possibly downsized) prepared frame
+            scale = w / small.shape[1]
+            regions = expand_regions(dets.xyxy[flagged] * scale, self.tile_region_margin, w, h)
+            tiles = select_tiles(tile_grid(w, h, self.tile_size, self.tile_overlap), regions, self.tile_max)
+            for x1, y1, x2, y2 in tiles.tolist():
+                crops.append(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+                owners.append((i, (x1, y1, 1.0 / scale)))
+        if not crops:
+            return detections
+
+        if self._tile_model is None:
+            # Own predictor without tracker callbacks, so tiles never touch this session's tracks
+            self._tile_model = model_registry.session(self.model_path, self.device, backend=self.backend)
+        found: List[List[Detections]] = [[] for _ in frames]
+        for start in range(0, len(crops), self.batch_size):
+            batch_results = self._tile_model.predict(
+                crops[start:start + self.batch_size],
                 conf=self.confidence_threshold,
                 iou=self.iou_threshold,
-                agnostic_nms=True,
-                half=use_half,
+                agnostic_nms=False,
+                half=self.device.type == 'cuda',
                 verbose=False,
                 max_det=50,
-                imgsz=640,
-                tracker="bytetrack.yaml" # or "botsort.yaml"
-            )[0]
+                imgsz=self.tile_size,
+                **self._device_args()
+            )
+            for results, (i, transform) in zip(batch_results, owners[start:start + self.batch_size]):
+                found[i].append(self._extract_detections(results, transform=transform))
+        return [
+            merge_tile_detections(dets, Detections.concat(parts), self.iou_threshold) if parts else dets
+            for dets, parts in zip(detections, found)
+        ]
 
-            detections: List[Dict[str, Any]] = []
-            
-            # Results now contain tracking IDs
-            if results.boxes.id is not None:
-                boxes = results.boxes.xyxy.cpu().numpy()
-                confs = results.boxes.conf.cpu().numpy()
-                clss = results.boxes.cls.cpu().numpy()
-                ids = results.boxes.id.cpu().numpy()
-                
-                for box, conf, cls, track_id in zip(boxes, confs, clss, ids):
-                    x1, y1, x2, y2 = box
-                    cls_idx = int(cls)
-                    class_name = results.names[cls_idx]
-                    
-                    mapped_class = self._map_to_dangerous_object(class_name, float(conf), [float(x1), float(y1), float(x2), float(y2)])
-                    
-                    # Version-based threshold logic
-                    if self.is_yolo11:
-                        thr = self.confidence_threshold
-                    else:
-                        thr = float(self.class_thresholds.get(mapped_class, self.confidence_threshold))
-                    
-                    calibrated = self._calibrate_conf(float(conf))
-                    
-                    if calibrated < thr:
-                        continue
-                        
-                    risk_level = self._calculate_risk_level(mapped_class, calibrated)
-                    
-                    detections.append({
-                        "class_name": mapped_class,
-                        "original_class": class_name,
-                        "confidence": calibrated,
-                        "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                        "risk_level": risk_level,
-                        "track_id": int(track_id) # Built-in Track ID
-                    })
+    def reset_tracker(self) -> None:
+        """Forget ByteTrack state, e.g. before analysing a non-contiguous part of a video"""
+        self._pending_tracker_state = None
+        predictor = getattr(self.model, "predictor", None) if self.model is not None else None
+        for tracker in getattr(predictor, "trackers", None) or []:
+            tracker.reset()
+
+    def export_tracker_state(self) -> Optional[bytes]:
+        """Pickled ByteTrack state (trackers and the track ID counter), or None if there is none yet"""
+        predictor = getattr(self.model, "predictor", None) if self.model is not None else None
+        trackers = getattr(predictor, "trackers", None)
+        if not trackers:
+            return self._pending_tracker_state
+        import pickle
+        from ultralytics.trackers.basetrack import BaseTrack
+        return pickle.dumps({"trackers": trackers, "next_id": BaseTrack._count})
+
+    def import_tracker_state(self, state: Optional[bytes]) -> None:
+        """Continue tracking from export_tracker_state() output (applied when the next prediction starts)"""
+        self._ensure_loaded()
+        self._pending_tracker_state = state
+        if not getattr(self, "_restore_callback_added", False):
+            # Runs before ultralytics' own tracker setup, which keeps existing trackers when persist=True
+            self.model.add_callback("on_predict_start", self._restore_tracker_state)
+            self._restore_callback_added = True
+
+    def _restore_tracker_state(self, predictor) -> None:
+        state, self._pending_tracker_state = self._pending_tracker_state, None
+        if state is None:
+            return
+        try:
+            import pickle
+            from ultralytics.trackers.basetrack import BaseTrack
+            restored = pickle.loads(state)
+            predictor.trackers = restored["trackers"]
+            BaseTrack._count = max(BaseTrack._count, int(restored["next_id"]))
+        except Exception as e:
+            logger.error(f"Could not restore tracker state, starting new tracks: {str(e)}")
+
+    def _extract_detections(self, results, transform: Optional[Tuple[float, float, float]] = None) -> Detections:
+        """
+        Convert a single ultralytics result into columnar Detections.
+
+        transform=(dx, dy, scale) maps boxes of a tile back into frame
+        coordinates ((box + offset) * scale) before they are filtered.
+        """
+        boxes = results.boxes
+        # Results now contain tracking IDs
+        if boxes.id is not None:
+            xyxy = boxes.xyxy.cpu().numpy()
+            confs = boxes.conf.cpu().numpy()
+            clss = boxes.cls.cpu().numpy()
+            ids = boxes.id.cpu().numpy()
+            # Version-based threshold logic
+            class_thresholds = not self.is_yolo11
+        else:
+            # Fallback for frames with no tracks/detections
+            # rows are [x1, y1, x2, y2, conf, cls] or [x1, y1, x2, y2, id, conf, cls]
+            data = boxes.data.cpu().numpy()
+            xyxy = data[:, :4]
+            if data.shape[1] == 7:
+                ids, confs, clss = data[:, 4], data[:, 5], data[:, 6]
             else:
-                # Fallback for frames with no tracks/detections
-                for r in results.boxes.data.tolist():
-                    # r might be [x1, y1, x2, y2, conf, cls] or [x1, y1, x2, y2, id, conf, cls]
-                    if len(r) == 7:
-                        x1, y1, x2, y2, track_id, conf, cls = r
-                    else:
-                        x1, y1, x2, y2, conf, cls = r
-                        track_id = -1
-                    
-                    cls_idx = int(cls)
-                    class_name = results.names[cls_idx]
-                    mapped_class = self._map_to_dangerous_object(class_name, float(conf), [float(x1), float(y1), float(x2), float(y2)])
-                    
-                    calibrated = self._calibrate_conf(float(conf))
-                    if calibrated < self.confidence_threshold: continue
-                    
-                    detections.append({
-                        "class_name": mapped_class,
-                        "original_class": class_name,
-                        "confidence": calibrated,
-                        "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                        "risk_level": self._calculate_risk_level(mapped_class, calibrated),
-                        "track_id": int(track_id)
-                    })
+                ids, confs, clss = np.full(len(data), -1), data[:, 4], data[:, 5]
+            class_thresholds = False
+        if transform is not None:
+            xyxy = tile_to_frame(xyxy, transform)
+
+        if len(confs) == 0:
+            return Detections.empty()
+
+        # All boxes at once: class mapping, thresholds and risk come from lookup tables
+        lut = self._class_lookup(results.names)
+        cls = np.asarray(clss).astype(np.int64)
+        confs = np.asarray(confs, dtype=np.float64)
+        own_class = confs >= lut.fp_min_conf[cls]
+        if own_class.any() and logger.isEnabledFor(logging.DEBUG):
+            self._log_false_positives(lut, cls, confs, xyxy, own_class)
+
+        calibrated = self._calibrate_confs(confs)
+        if class_thresholds:
+            thr = np.where(own_class, lut.fp_thr[cls], lut.base_thr[cls])
+        else:
+            thr = self.confidence_threshold
+        keep = calibrated >= thr
+        if not keep.any():
+            return Detections.empty()
+
+        cls, own_class, calibrated = cls[keep], own_class[keep], calibrated[keep]
+        risk = np.where(own_class, lut.fp_risk[cls], lut.base_risk[cls])
+        return Detections(
+            xyxy=np.asarray(xyxy)[keep],
+            confidence=calibrated,
+            class_id=np.where(own_class, lut.fp_id[cls], lut.base_id[cls]),
+            original_class_id=lut.original_id[cls],
+            track_id=np.asarray(ids)[keep].astype(np.int32),  # Built-in Track ID
+            risk_level=self._risk_levels(risk, calibrated)
+        )
+
+    def _class_lookup(self, names: Dict[int, str]) -> ClassLookup:
+        """Lookup tables for a model's class names, built once per names table"""
+        cached = self._class_lookups.get(id(names))
+        if cached is not None and cached.names is names:
+            return cached
+        size = max(names) + 1 if names else 0
+        original_id = np.zeros(size, dtype=np.int32)
+        base_id = np.zeros(size, dtype=np.int32)
+        fp_id = np.zeros(size, dtype=np.int32)
+        fp_min_conf = np.full(size, np.inf)
+        base_thr = np.full(size, self.confidence_threshold)
+        fp_thr = np.full(size, self.confidence_threshold)
+        base_risk = np.zeros(size, dtype=np.int8)
+        fp_risk = np.zeros(size, dtype=np.int8)
+        fp_geometry = np.full((size, 4), np.nan)
+
+        def risk_category(mapped: str) -> int:
+            return 2 if mapped in HIGH_RISK_OBJECTS else 1 if mapped in MEDIUM_RISK_OBJECTS else 0
+
+        for index, class_name in names.items():
+            base = self._map_class_name(class_name)
+            own = class_name.lower()
+            original_id[index] = CLASS_NAMES.intern(class_name)
+            base_id[index] = CLASS_NAMES.intern(base)
+            fp_id[index] = CLASS_NAMES.intern(own)
+            base_thr[index] = float(self.class_thresholds.get(base, self.confidence_threshold))
+            fp_thr[index] = float(self.class_thresholds.get(own, self.confidence_threshold))
+            base_risk[index] = risk_category(base)
+            fp_risk[index] = risk_category(own)
+            fp_config = KNIFE_FALSE_POSITIVES.get(own)
+            if fp_config is not None:
+                fp_min_conf[index] = fp_config['min_confidence']
+                fp_geometry[index] = (
+                    *fp_config['aspect_ratio_range'],
+                    fp_config.get('min_area_ratio', np.nan),
+                    fp_config.get('max_area_ratio', np.nan)
+                )
+
+        lookup = ClassLookup(names, original_id, base_id, fp_id, fp_min_conf, base_thr, fp_thr,
+                             base_risk, fp_risk, fp_geometry)
+        self._class_lookups[id(names)] = lookup
+        return lookup
+
+    def _log_false_positives(self, lut: ClassLookup, cls: np.ndarray, confs: np.ndarray,
+                             xyxy: np.ndarray, own_class: np.ndarray) -> None:
+        """Debug log of knife look-alikes kept as their own class (vectorized geometry check)"""
+        boxes = np.asarray(xyxy, dtype=np.float64)
+        width = boxes[:, 2] - boxes[:, 0]
+        height = boxes[:, 3] - boxes[:, 1]
+        aspect_ratio = np.divide(height, width, out=np.zeros_like(height), where=width > 0)
+        area_ratio = width * height / FP_REFERENCE_AREA
+        ar_min, ar_max, area_min, area_max = lut.fp_geometry[cls].T
+        geometry_match = (
+            (width > 0) & (height > 0)
+            & (aspect_ratio >= ar_min) & (aspect_ratio <= ar_max)
+            & ~(area_ratio > area_max) & ~(area_ratio < area_min)
+        )
+        for i in np.flatnonzero(own_class):
+            reason = "likely false positive for knife" if geometry_match[i] else "not mapping to knife"
+            logger.debug(
+                f"High confidence {lut.names[int(cls[i])]} (conf={confs[i]:.2f}, ar={aspect_ratio[i]:.2f}, "
+                f"area_ratio={area_ratio[i]:.4f}) - {reason}"
+            )
+
+    def _calibrate_confs(self, confs: np.ndarray) -> np.ndarray:
+        """Temperature scaling: conf' = sigmoid(logit(conf) / T), clamped at 0 and 1"""
+        confs = np.asarray(confs, dtype=np.float64)
+        inner = np.clip(confs, 1e-12, 1.0 - 1e-12)
+        logit = np.log(inner / (1.0 - inner))
+        scaled = 1.0 / (1.0 + np.exp(-logit / max(1e-6, self.temp_scale)))
+        return np.where(confs <= 0.0, 0.0, np.where(confs >= 1.0, 1.0, scaled))
+
+    @staticmethod
+    def _risk_levels(risk_category: np.ndarray, confs: np.ndarray) -> np.ndarray:
+        """Risk level indices (0=Low, 1=Medium, 2=High) from risk category and confidence"""
+        high = np.where(confs > 0.7, 2, np.where(confs > 0.5, 1, 0))
+        medium = np.where(confs > 0.8, 1, 0)
+        return np.where(risk_category == 2, high, np.where(risk_category == 1, medium, 0)).astype(np.int8)
+
+    def process_frame(self, frame: np.ndarray) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Process a single frame and return detections with annotated frame"""
+        try:
+            self._ensure_loaded()
+            frame = self._prepare_frame(frame)
+            results = self._track(frame)[0]
+            detections = self._extract_detections(results).to_dicts()
 
             # LIVE MOD: Tüm nesneler için bounding box çiz (results.plot() kullan)
             annotated_frame = results.plot()
@@ -278,138 +513,68 @@ class CrimeDetectionModel:
             logger.error(f"Error processing frame: {str(e)}")
             return [], frame
 
-    def _map_to_dangerous_object(self, class_name: str, confidence: float = 0.0, bbox: List[float] = None) -> str:
+    def process_frames(
+        self,
+        frames: List[np.ndarray],
+        batch_size: Optional[int] = None,
+        annotate: bool = False,
+        imgsz: Optional[int] = None
+    ) -> List[Tuple[Detections, Optional[np.ndarray]]]:
         """
-        Map detected class to dangerous object category with false positive filtering.
-        
+        Process consecutive frames in inference batches.
+
         Args:
-            class_name: Detected class name
-            confidence: Detection confidence
-            bbox: Bounding box [x1, y1, x2, y2] for aspect ratio analysis
+            frames: Frames in temporal order (ByteTrack is updated in this order)
+            batch_size: Frames per YOLO call (default: self.batch_size)
+            annotate: Also return annotated frames (results.plot() is costly)
+            imgsz: Inference input size (default: self.imgsz)
+
+        Returns:
+            One (Detections, annotated_frame or None) tuple per input frame
         """
+        batch_size = max(1, int(batch_size or self.batch_size))
+        outputs: List[Tuple[Detections, Optional[np.ndarray]]] = []
+        try:
+            self._ensure_loaded()
+        except Exception as e:
+            logger.error(f"Error processing frames: {str(e)}")
+            return [(Detections.empty(), None) for _ in frames]
+
+        for start in range(0, len(frames), batch_size):
+            originals = frames[start:start + batch_size]
+            batch = [self._prepare_frame(f) for f in originals]
+            try:
+                batch_results = self._track(batch, imgsz=imgsz)
+                detections = [self._extract_detections(results) for results in batch_results]
+                if self.tiled_inference:
+                    try:
+                        detections = self._refine_with_tiles(originals, batch, detections)
+                    except Exception as e:
+                        logger.error(f"Tiled inference failed at offset {start}, using full-frame detections: {str(e)}")
+                for results, dets in zip(batch_results, detections):
+                    outputs.append((dets, results.plot() if annotate else None))
+            except Exception as e:
+                logger.error(f"Error processing frame batch at offset {start}: {str(e)}")
+                outputs.extend((Detections.empty(), None) for _ in batch)
+        return outputs
+
+    def _map_class_name(self, class_name: str) -> str:
+        """Name-based dangerous object mapping (no confidence / geometry checks)"""
         class_name_lower = class_name.lower()
-        
-        # FALSE POSITIVE FILTERING: Common misclassifications for knives
-        # These objects are often confused with knives but should NOT be mapped to knife
-        # Context-aware filtering based on confidence, aspect ratio, and size
-        knife_false_positives = {
-            'toothbrush': {
-                'min_confidence': 0.55,  # High confidence toothbrush = not a knife
-                'aspect_ratio_range': (0.25, 0.75),  # Toothbrushes are longer/thinner
-                'max_area_ratio': 0.02  # Toothbrushes are typically smaller relative to frame
-            },
-            'scissors': {
-                'min_confidence': 0.45,  # Scissors have distinct shape (two blades)
-                'aspect_ratio_range': (0.35, 0.85),  # Scissors are more square-ish
-                'max_area_ratio': 0.03
-            },
-            'baseball_bat': {
-                'min_confidence': 0.35,  # Baseball bats are much longer and thicker
-                'aspect_ratio_range': (0.08, 0.35),  # Very long/thin
-                'min_area_ratio': 0.01  # Baseball bats are typically larger
-            },
-            'remote': {
-                'min_confidence': 0.5,
-                'aspect_ratio_range': (0.4, 1.6),  # More square/rectangular
-                'max_area_ratio': 0.015
-            },
-            'cell phone': {
-                'min_confidence': 0.5,
-                'aspect_ratio_range': (0.5, 2.0),  # Rectangular, can be portrait/landscape
-                'max_area_ratio': 0.02
-            },
-            'hair drier': {
-                'min_confidence': 0.5,
-                'aspect_ratio_range': (0.3, 0.8),  # Similar to toothbrush
-                'max_area_ratio': 0.02
-            }
-        }
-        
-        # Check if this is a known false positive for knife
-        if class_name_lower in knife_false_positives:
-            fp_config = knife_false_positives[class_name_lower]
-            
-            # If confidence is high enough, trust the original classification
-            if confidence >= fp_config['min_confidence']:
-                # Context-aware filtering: check aspect ratio and size
-                if bbox is not None and len(bbox) >= 4:
-                    width = bbox[2] - bbox[0]
-                    height = bbox[3] - bbox[1]
-                    if width > 0 and height > 0:
-                        aspect_ratio = height / width
-                        min_ar, max_ar = fp_config['aspect_ratio_range']
-                        
-                        # Calculate area ratio (for size-based filtering)
-                        # Assuming frame dimensions are available (we'll use a default if not)
-                        frame_area = 640 * 640  # Default frame size
-                        bbox_area = width * height
-                        area_ratio = bbox_area / frame_area if frame_area > 0 else 0
-                        
-                        # Check aspect ratio
-                        ar_match = min_ar <= aspect_ratio <= max_ar
-                        
-                        # Check area ratio (if specified)
-                        area_match = True
-                        if 'max_area_ratio' in fp_config:
-                            area_match = area_match and (area_ratio <= fp_config['max_area_ratio'])
-                        if 'min_area_ratio' in fp_config:
-                            area_match = area_match and (area_ratio >= fp_config['min_area_ratio'])
-                        
-                        # If both aspect ratio and area match false positive characteristics
-                        if ar_match and area_match:
-                            logger.debug(f"Filtered {class_name} (conf={confidence:.2f}, ar={aspect_ratio:.2f}, area_ratio={area_ratio:.4f}) - likely false positive for knife")
-                            return class_name_lower  # Return original class, not knife
-                
-                # High confidence in false positive class = not a knife
-                logger.debug(f"High confidence {class_name} (conf={confidence:.2f}) - not mapping to knife")
-                return class_name_lower
-        
         # First check exact dangerous object matches
         for dangerous_type, variations in self.dangerous_objects.items():
             for variation in variations:
                 if variation in class_name_lower:
-                    # Special handling: if it's a known false positive with high confidence, don't map
-                    if class_name_lower in knife_false_positives and dangerous_type == 'knife':
-                        if confidence >= knife_false_positives[class_name_lower]['min_confidence']:
-                            logger.debug(f"Skipping knife mapping for high-confidence {class_name}")
-                            continue
-                    logger.debug(f"Mapped {class_name} to dangerous object: {dangerous_type}")
                     return dangerous_type
         
         # Check for weapon-like patterns in class name
-        weapon_keywords = ['gun', 'pistol', 'rifle', 'firearm', 'weapon', 'knife', 'blade', 'sword']
-        for keyword in weapon_keywords:
+        for keyword in WEAPON_KEYWORDS:
             if keyword in class_name_lower:
-                # Skip if it's a known false positive
-                if class_name_lower in knife_false_positives and keyword == 'knife':
-                    if confidence >= knife_false_positives[class_name_lower]['min_confidence']:
-                        continue
-                logger.debug(f"Found weapon keyword '{keyword}' in {class_name}, mapping to weapon")
                 return 'weapon'
                     
         # If not a dangerous object, return original class
         return class_name
     
-    def _calculate_risk_level(self, class_name: str, confidence: float) -> str:
-        """Calculate risk level based on object type and confidence"""
-        high_risk_objects = ['gun', 'knife', 'weapon', 'pistol', 'rifle', 'firearm', 'machete', 'axe']
-        medium_risk_objects = ['scissors', 'hammer', 'crowbar', 'baseball_bat', 'bottle']
-        
-        if class_name in high_risk_objects:
-            if confidence > 0.7:
-                return "High"
-            elif confidence > 0.5:
-                return "Medium"
-            else:
-                return "Low"
-        elif class_name in medium_risk_objects:
-            if confidence > 0.8:
-                return "Medium"
-            else:
-                return "Low"
-        else:
-            return "Low"
-    
     def get_model_info(self) -> Dict[str, Any]:
         model_ver = "YOLOv8x"
         if self.is_yolo11: model_ver = "YOLO11 (Latest)"
@@ -417,6 +582,7 @@ class CrimeDetectionModel:
         
         return {
             "status": "loaded" if self.model is not None else "not_loaded",
+            "backend": self.backend,
             "device": str(self.device),
             "confidence_threshold": self.confidence_threshold,
             "model_type": model_ver,
@@ -0,0 +1,243 @@
+"""
+Columnar container for the detections of a single frame.
+
+Detections are kept as parallel NumPy arrays (boxes, confidences, class ids,
+track ids, risk) instead of one dict per object; class names are interned in a
+process-wide table so a frame only stores small integer ids. Dicts are built
+only at the API/storage boundary with to_dicts() / frame_result_to_dict().
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+RISK_LEVELS = ("Low", "Medium", "High")
+_RISK_LEVEL_IDS = {name: i for i, name in enumerate(RISK_LEVELS)}
+
+
+class StringInterner:
+    """Maps strings to stable small integer ids (and back)"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, name: str) -> int:
+        idx = self._ids.get(name)
+        if idx is None:
+            with self._lock:
+                idx = self._ids.get(name)
+                if idx is None:
+                    idx = len(self._names)
+                    self._names.append(name)
+                    self._ids[name] = idx
+        return idx
+
+    def name(self, idx: int) -> str:
+        return self._names[int(idx)]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+# Shared by every Detections object in the process
+CLASS_NAMES = StringInterner()
+
+
+class Detections:
+    """
+    Detections of one frame as parallel arrays (N = number of detections).
+
+    Args:
+        xyxy: (N, 4) float32 boxes
+        confidence: (N,) float32 calibrated confidences
+        class_id: (N,) int32 ids of the (mapped) class names in CLASS_NAMES
+        original_class_id: (N,) int32 ids of the raw model class names
+        track_id: (N,) int32 ByteTrack ids (-1 = untracked)
+        risk_level: (N,) int8 indices into RISK_LEVELS
+        risk_score: (N,) float32 VideoProcessor risk scores
+        annotations: Sparse per-row extra fields (e.g. ThreatAnalyzer alerts)
+    """
+
+    __slots__ = ("xyxy", "confidence", "class_id", "original_class_id",
+                 "track_id", "risk_level", "risk_score", "annotations")
+
+    def __init__(
+        self,
+        xyxy: np.ndarray,
+        confidence: np.ndarray,
+        class_id: np.ndarray,
+        original_class_id: Optional[np.ndarray] = None,
+        track_id: Optional[np.ndarray] = None,
+        risk_level: Optional[np.ndarray] = None,
+        risk_score: Optional[np.ndarray] = None,
+        annotations: Optional[Dict[int, Dict[str, Any]]] = None
+    ):
+        n = len(confidence)
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(n, 4)
+        self.confidence = np.asarray(confidence, dtype=np.float32)
+        self.class_id = np.asarray(class_id, dtype=np.int32)
+        self.original_class_id = None if original_class_id is None else np.asarray(original_class_id, dtype=np.int32)
+        self.track_id = np.full(n, -1, dtype=np.int32) if track_id is None else np.asarray(track_id, dtype=np.int32)
+        self.risk_level = None if risk_level is None else np.asarray(risk_level, dtype=np.int8)
+        self.risk_score = None if risk_score is None else np.asarray(risk_score, dtype=np.float32)
+        self.annotations = annotations or None
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32))
+
+    @classmethod
+    def from_dicts(cls, detections: Iterable[Dict[str, Any]]) -> "Detections":
+        """Build from the dict form (model or frame-result shape)"""
+        detections = [d for d in detections if isinstance(d, dict)]
+        if not detections:
+            return cls.empty()
+        has_original = any("original_class" in d for d in detections)
+        has_level = any("risk_level" in d for d in detections)
+        has_score = any("risk_score" in d for d in detections)
+        known = {"type", "class_name", "original_class", "confidence", "bbox", "risk_level", "risk_score", "track_id"}
+        annotations = {}
+        for i, d in enumerate(detections):
+            extra = {k: v for k, v in d.items() if k not in known}
+            if extra:
+                annotations[i] = extra
+        return cls(
+            xyxy=[d.get("bbox", [0.0, 0.0, 0.0, 0.0]) for d in detections],
+            confidence=[float(d.get("confidence", 0.0)) for d in detections],
+            class_id=[CLASS_NAMES.intern(str(d.get("class_name", "unknown"))) for d in detections],
+            original_class_id=[CLASS_NAMES.intern(str(d.get("original_class", ""))) for d in detections] if has_original else None,
+            track_id=[int(d["track_id"]) if d.get("track_id") is not None else -1 for d in detections],
+            risk_level=[_RISK_LEVEL_IDS.get(d.get("risk_level"), 0) for d in detections] if has_level else None,
+            risk_score=[float(d.get("risk_score", 0.0)) for d in detections] if has_score else None,
+            annotations=annotations
+        )
+
+    def __len__(self) -> int:
+        return len(self.confidence)
+
+    def take(self, indices) -> "Detections":
+        """Subset of rows (annotations are not carried over)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        return Detections(
+            xyxy=self.xyxy[indices],
+            confidence=self.confidence[indices],
+            class_id=self.class_id[indices],
+            original_class_id=None if self.original_class_id is None else self.original_class_id[indices],
+            track_id=self.track_id[indices],
+            risk_level=None if self.risk_level is None else self.risk_level[indices],
+            risk_score=None if self.risk_score is None else self.risk_score[indices]
+        )
+
+    @classmethod
+    def concat(cls, parts: List["Detections"]) -> "Detections":
+        """Rows of all parts in order; optional columns are kept only if every non-empty part has them"""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+
+        def column(name: str):
+            values = [getattr(p, name) for p in parts]
+            return None if any(v is None for v in values) else np.concatenate(values)
+
+        return cls(
+            xyxy=np.concatenate([p.xyxy for p in parts]),
+            confidence=np.concatenate([p.confidence for p in parts]),
+            class_id=np.concatenate([p.class_id for p in parts]),
+            original_class_id=column("original_class_id"),
+            track_id=np.concatenate([p.track_id for p in parts]),
+            risk_level=column("risk_level"),
+            risk_score=column("risk_score")
+        )
+
+    def class_name(self, i: int) -> str:
+        return CLASS_NAMES.name(self.class_id[i])
+
+    def class_names(self) -> List[str]:
+        return [CLASS_NAMES.name(c) for c in self.class_id]
+
+    def annotation(self, i: int) -> Dict[str, Any]:
+        return (self.annotations or {}).get(i, {})
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Per-detection dicts; keys follow the columns that are populated"""
+        n = len(self)
+        if n == 0:
+            return []
+        names = self.class_names()
+        boxes = self.xyxy.tolist()
+        confs = self.confidence.tolist()
+        tracks = self.track_id.tolist()
+        originals = [CLASS_NAMES.name(c) for c in self.original_class_id] if self.original_class_id is not None else None
+        levels = [RISK_LEVELS[l] for l in self.risk_level] if self.risk_level is not None else None
+        scores = self.risk_score.tolist() if self.risk_score is not None else None
+        annotations = self.annotations or {}
+
+        out: List[Dict[str, Any]] = []
+        for i in range(n):
+            det: Dict[str, Any] = {}
+            if scores is not None:
+                det["type"] = names[i]
+            det["class_name"] = names[i]
+            if originals is not None:
+                det["original_class"] = originals[i]
+            det["confidence"] = confs[i]
+            det["bbox"] = boxes[i]
+            if levels is not None:
+                det["risk_level"] = levels[i]
+            if scores is not None:
+                det["risk_score"] = scores[i]
+            det["track_id"] = tracks[i]
+            if i in annotations:
+                det.update(annotations[i])
+            out.append(det)
+        return out
+
+    # Class ids are only meaningful inside one process; pickles carry the
+    # names and are re-interned on load (e.g. results of segment workers)
+    def __getstate__(self):
+        state = {slot: getattr(self, slot) for slot in self.__slots__}
+        ids = set(self.class_id.tolist())
+        if self.original_class_id is not None:
+            ids.update(self.original_class_id.tolist())
+        state["class_names"] = {i: CLASS_NAMES.name(i) for i in ids}
+        return state
+
+    def __setstate__(self, state):
+        names = state.pop("class_names")
+        remap = {i: CLASS_NAMES.intern(name) for i, name in names.items()}
+        for slot in self.__slots__:
+            setattr(self, slot, state[slot])
+        if remap:
+            self.class_id = np.array([remap[c] for c in self.class_id.tolist()], dtype=np.int32)
+            if self.original_class_id is not None:
+                self.original_class_id = np.array([remap[c] for c in self.original_class_id.tolist()], dtype=np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.xyxy, self.confidence, self.class_id, self.original_class_id,
+                                      self.track_id, self.risk_level, self.risk_score) if a is not None)
+
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(len(a), len(b)) IoU matrix of two xyxy box arrays"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def frame_result_to_dict(frame_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Frame result with its Detections converted to dicts (for JSON responses and storage)"""
+    detections = frame_result.get("detections")
+    if isinstance(detections, Detections):
+        return {**frame_result, "detections": detections.to_dicts()}
+    return frame_result
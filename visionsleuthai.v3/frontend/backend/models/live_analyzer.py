@@ -6,7 +6,6 @@ import numpy as np
 from datetime import datetime
 from models.crime_detection_model import CrimeDetectionModel
 from models.video_processor import VideoProcessor
-from utils.gcp_connector import GCPConnector
 
 router = APIRouter()
 active_connections: Dict[str, WebSocket] = {}
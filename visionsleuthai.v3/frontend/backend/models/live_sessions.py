@@ -0,0 +1,135 @@
+"""
+Per-client live analysis sessions.
+
+Every live client (WebSocket connection or `client_id` sent to POST /frame)
+gets its own VideoProcessor with its own ByteTrack tracker and motion gate,
+built on a model handle from the registry, so all sessions share one loaded
+network while their track IDs stay separate.
+
+A session's ResolutionController picks the input size (and optionally a
+smaller model variant) of each frame from the session's own p95 latency.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from models.model_registry import get_model
+from models.resolution_controller import ResolutionController
+from models.video_processor import VideoProcessor
+from utils.metrics import live_resolution_switches
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSession:
+    def __init__(self, client_id: str, processor: VideoProcessor):
+        self.client_id = client_id
+        self.processor = processor
+        # Processors of other model variants used by resolution levels, built on first use
+        self.processors: Dict[Optional[str], VideoProcessor] = {None: processor}
+        self.resolution = ResolutionController()
+        # Frames of one client must reach its tracker one at a time and in order
+        self.lock = threading.Lock()
+        self.frame_count = 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    def _processor_for(self, model_path: Optional[str]) -> VideoProcessor:
+        processor = self.processors.get(model_path)
+        if processor is None:
+            # Tracks do not carry over to another model; its tracker starts fresh
+            processor = VideoProcessor(get_model(mode="live_analysis", model_path=model_path), mode="live_analysis")
+            self.processors[model_path] = processor
+        return processor
+
+    def process(self, frame) -> Dict[str, Any]:
+        """
+        Analyse one frame at the session's current resolution level (call
+        with self.lock held). The result records the input size and weights
+        that produced it.
+        """
+        imgsz, model_path = self.resolution.imgsz, self.resolution.model_path
+        processor = self._processor_for(model_path)
+        t0 = time.perf_counter()
+        result = processor.process_frame(frame, as_dicts=False, imgsz=imgsz)
+        # Motion-skipped frames never reached the model and say nothing about its latency
+        if not result.get("motion_skipped"):
+            direction = self.resolution.record((time.perf_counter() - t0) * 1000.0)
+            if direction is not None:
+                live_resolution_switches.labels(direction=direction).inc()
+        result["input_size"] = imgsz
+        result["model"] = os.path.basename(processor.model.model_path)
+        return result
+
+
+class LiveSessionPool:
+    """
+    Args:
+        max_sessions: Sessions kept at once; the least recently used idle one
+            is dropped beyond this (LIVE_MAX_SESSIONS, default 64)
+        idle_timeout: Seconds after which an unused session is dropped
+            (LIVE_SESSION_TTL_S, default 300)
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, idle_timeout: Optional[float] = None):
+        if max_sessions is None:
+            try:
+                max_sessions = int(os.getenv("LIVE_MAX_SESSIONS", "64"))
+            except Exception:
+                max_sessions = 64
+        if idle_timeout is None:
+            try:
+                idle_timeout = float(os.getenv("LIVE_SESSION_TTL_S", "300"))
+            except Exception:
+                idle_timeout = 300.0
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[str, LiveSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, client_id: str) -> LiveSession:
+        """Session of client_id, created on first use"""
+        with self._lock:
+            session = self._sessions.get(client_id)
+            if session is not None:
+                self._sessions.move_to_end(client_id)
+                session.last_used = time.time()
+                return session
+        # Model handles are cheap (shared weights) but building one can still
+        # load the weights on first use, so do it outside the pool lock
+        processor = VideoProcessor(get_model(mode="live_analysis"), mode="live_analysis")
+        with self._lock:
+            session = self._sessions.get(client_id)
+            if session is None:
+                session = LiveSession(client_id, processor)
+                self._sessions[client_id] = session
+                self._evict_locked()
+                logger.info(f"Live session opened: {client_id} ({len(self._sessions)} active)")
+            session.last_used = time.time()
+            return session
+
+    def close(self, client_id: str) -> None:
+        with self._lock:
+            if self._sessions.pop(client_id, None) is not None:
+                logger.info(f"Live session closed: {client_id}")
+
+    def _evict_locked(self) -> None:
+        now = time.time()
+        for client_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.idle_timeout and not session.lock.locked():
+                del self._sessions[client_id]
+        while len(self._sessions) > self.max_sessions:
+            client_id, _ = self._sessions.popitem(last=False)
+            logger.info(f"Live session evicted: {client_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_timeout_s": self.idle_timeout,
+                "resolution": {client_id: session.resolution.stats() for client_id, session in self._sessions.items()},
+            }
@@ -0,0 +1,177 @@
+"""
+Process-wide registry of loaded detection models.
+
+Weights are loaded once per (model_path, backend, device) and shared
+read-only. Callers get lightweight per-session handles: a CrimeDetectionModel
+whose YOLO wrapper is a shallow copy of the shared one with its own predictor
+(and therefore its own ByteTrack state), so sessions never see each other's
+tracks while the network itself lives in memory only once.
+
+Backends (INFERENCE_BACKEND, default "torch"):
+- torch: the PyTorch weights through ultralytics
+- onnx: an ONNX export of the weights run on ONNX Runtime's CPU provider
+  (see models.onnx_backend); all sessions share one AutoBackend and its
+  InferenceSession, loaded once
+"""
+import copy
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx")
+
+
+def default_backend() -> str:
+    return os.getenv("INFERENCE_BACKEND", "torch").lower()
+
+
+def _session_copy(shared_model):
+    """Shallow copy of an ultralytics model that shares the network but not the predictor"""
+    session = copy.copy(shared_model)
+    session.predictor = None
+    # Trackers register callbacks per predictor; keep those lists per session
+    callbacks = getattr(shared_model, "callbacks", None)
+    if isinstance(callbacks, dict):
+        session.callbacks = {event: list(funcs) for event, funcs in callbacks.items()}
+    # ONNX: reuse the loaded AutoBackend instead of letting the predictor load the file again
+    template = getattr(shared_model, "_shared_predictor", None)
+    if template is not None:
+        from models.onnx_backend import shared_predictor
+        session.predictor = shared_predictor(template, session.callbacks)
+    return session
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._weights: Dict[Tuple[str, str, str], Any] = {}
+        self._prototypes: Dict[Tuple[str, str, str], Any] = {}
+        self.loads = 0
+        self.handles = 0
+        # mode -> "pending" | "loading" | "warm" | "failed"
+        self.warmup_status: Dict[str, str] = {}
+
+    def _key_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def session(self, model_path: str, device, backend: str = "torch"):
+        """
+        Per-session model object for model_path; the weights are loaded (and
+        warmed up) on first use and shared afterwards.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend}")
+        key = (model_path, backend, str(device))
+        shared = self._weights.get(key)
+        if shared is None:
+            with self._key_lock(key):
+                shared = self._weights.get(key)
+                if shared is None:
+                    if backend == "onnx":
+                        shared = self._load_onnx(model_path)
+                    else:
+                        shared = self._load(model_path, device)
+                    self._weights[key] = shared
+        return _session_copy(shared)
+
+    def _load(self, model_path: str, device):
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        use_half = getattr(device, "type", str(device)) == 'cuda'
+        if use_half:
+            model.to(device)
+        # Warm up once so layer fusing / fp16 conversion of the shared network
+        # happens here and not inside a session's first request
+        try:
+            model.predict(np.zeros((640, 640, 3), dtype=np.uint8), imgsz=640, half=use_half, verbose=False)
+        except Exception as e:
+            logger.warning(f"Model warmup failed for {model_path}: {str(e)}")
+        self.loads += 1
+        logger.info(f"ModelRegistry loaded {model_path} on {device}")
+        return model
+
+    def _load_onnx(self, model_path: str):
+        from ultralytics import YOLO
+        from models.onnx_backend import ONNX_IMGSZ, create_session, export_onnx, use_session
+        onnx_path = export_onnx(model_path)
+        model = YOLO(onnx_path, task="detect")
+        try:
+            # Builds the predictor and its AutoBackend; the only time this process loads the file
+            model.predict(np.zeros((ONNX_IMGSZ, ONNX_IMGSZ, 3), dtype=np.uint8), imgsz=ONNX_IMGSZ, device="cpu", verbose=False)
+            use_session(model.predictor.model, create_session(onnx_path))
+            # Template for the predictors of session copies (see _session_copy)
+            model._shared_predictor = model.predictor
+        except Exception as e:
+            # Session copies then load their own backend on first use
+            logger.warning(f"Model warmup failed for {onnx_path}: {str(e)}")
+        self.loads += 1
+        logger.info(f"ModelRegistry loaded {onnx_path} on ONNX Runtime (CPU)")
+        return model
+
+    def acquire(self, mode: str = "video_upload", model_path: Optional[str] = None, backend: Optional[str] = None):
+        """
+        Loaded CrimeDetectionModel handle for (model_path, mode, backend);
+        backend defaults to INFERENCE_BACKEND.
+
+        Thresholds and class mappings are built once per key and copied into
+        each handle. If the weights cannot be loaded the handle is returned
+        unloaded and retries lazily, like a freshly constructed model.
+        """
+        from models.crime_detection_model import CrimeDetectionModel
+        backend = backend or default_backend()
+        key = (model_path or "", mode, backend)
+        prototype = self._prototypes.get(key)
+        if prototype is None:
+            with self._key_lock(key):
+                prototype = self._prototypes.get(key)
+                if prototype is None:
+                    candidate = CrimeDetectionModel(mode=mode, model_path=model_path, backend=backend)
+                    status = candidate.load_model()
+                    if status.get("status") != "loaded":
+                        logger.error(f"ModelRegistry could not load {key}: {status.get('message')}")
+                        return candidate
+                    prototype = candidate
+                    self._prototypes[key] = prototype
+
+        handle = copy.copy(prototype)
+        handle.model = _session_copy(prototype.model)
+        self.handles += 1
+        return handle
+
+    def warm_up(self, modes: Iterable[str]) -> None:
+        """Load and warm up the model of each mode ahead of the first request; progress in warmup_status"""
+        modes = list(modes)
+        for mode in modes:
+            self.warmup_status.setdefault(mode, "pending")
+        for mode in modes:
+            self.warmup_status[mode] = "loading"
+            try:
+                handle = self.acquire(mode=mode)
+                self.warmup_status[mode] = "warm" if handle.model is not None else "failed"
+            except Exception as e:
+                logger.error(f"Model warmup failed for mode {mode}: {str(e)}")
+                self.warmup_status[mode] = "failed"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "warmup": dict(self.warmup_status),
+            "loaded_weights": [{"model_path": k[0], "backend": k[1], "device": k[2]} for k in self._weights],
+            "configurations": [{"model_path": k[0] or None, "mode": k[1], "backend": k[2]} for k in self._prototypes],
+            "weight_loads": self.loads,
+            "handles_issued": self.handles,
+        }
+
+
+model_registry = ModelRegistry()
+
+
+def get_model(mode: str = "video_upload", model_path: Optional[str] = None, backend: Optional[str] = None):
+    """Shorthand for model_registry.acquire"""
+    return model_registry.acquire(mode=mode, model_path=model_path, backend=backend)
@@ -0,0 +1,107 @@
+import os
+import logging
+from typing import Any, Dict, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """
+    Cheap change detector used to skip YOLO on static frames.
+
+    Frames are downscaled to a small grayscale thumbnail and compared with the
+    thumbnail of the last frame that was actually sent to the model. A frame is
+    "static" when the fraction of changed pixels is below the threshold.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        pixel_threshold: Optional[int] = None,
+        width: Optional[int] = None,
+        max_skip: Optional[int] = None
+    ):
+        """
+        Args:
+            threshold: Fraction of changed thumbnail pixels below which a frame is static
+            pixel_threshold: Per-pixel gray level difference counted as a change
+            width: Thumbnail width in pixels (height keeps the aspect ratio)
+            max_skip: Force inference after this many consecutive skipped frames
+        """
+        try:
+            self.threshold = float(threshold if threshold is not None else os.getenv("MOTION_THRESHOLD", "0.002"))
+        except Exception:
+            self.threshold = 0.002
+        try:
+            self.pixel_threshold = int(pixel_threshold if pixel_threshold is not None else os.getenv("MOTION_PIXEL_THRESHOLD", "25"))
+        except Exception:
+            self.pixel_threshold = 25
+        try:
+            self.width = max(8, int(width if width is not None else os.getenv("MOTION_THUMB_WIDTH", "64")))
+        except Exception:
+            self.width = 64
+        try:
+            self.max_skip = max(0, int(max_skip if max_skip is not None else os.getenv("MOTION_MAX_SKIP", "30")))
+        except Exception:
+            self.max_skip = 30
+
+        self._reference: Optional[np.ndarray] = None
+        self._skip_run = 0
+        self.last_motion = 1.0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        import cv2
+        h, w = frame.shape[:2]
+        height = max(1, int(round(h * self.width / max(1, w))))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def is_static(self, frame: np.ndarray) -> bool:
+        """Return True when frame can reuse the previous detections"""
+        thumb = self._thumbnail(frame)
+        if self._reference is None or self._reference.shape != thumb.shape:
+            self._reference = thumb
+            self._skip_run = 0
+            self.last_motion = 1.0
+            return False
+
+        import cv2
+        diff = cv2.absdiff(thumb, self._reference)
+        self.last_motion = float(np.count_nonzero(diff > self.pixel_threshold)) / float(diff.size)
+        if self.last_motion < self.threshold and self._skip_run < self.max_skip:
+            self._skip_run += 1
+            return True
+
+        # Frame goes to the model and becomes the new reference
+        self._reference = thumb
+        self._skip_run = 0
+        return False
+
+    def reset(self) -> None:
+        self._reference = None
+        self._skip_run = 0
+        self.last_motion = 1.0
+
+    def get_state(self) -> Dict[str, Any]:
+        """Reference thumbnail and skip counter, e.g. for job checkpoints"""
+        return {
+            "reference": None if self._reference is None else self._reference.copy(),
+            "skip_run": self._skip_run,
+            "last_motion": self.last_motion,
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self._reference = state.get("reference")
+        self._skip_run = int(state.get("skip_run", 0))
+        self.last_motion = float(state.get("last_motion", 1.0))
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            "threshold": self.threshold,
+            "pixel_threshold": self.pixel_threshold,
+            "thumbnail_width": self.width,
+            "max_skip": self.max_skip,
+        }
@@ -0,0 +1,131 @@
+"""
+ONNX Runtime (CPU) inference backend.
+
+The configured weights are exported to ONNX once (dynamic batch, so batched
+video inference works) and the .onnx file is cached next to them; it is
+re-exported only when the weights are newer. Ultralytics loads the .onnx
+file through its AutoBackend, so pre-processing, NMS, post-processing and
+ByteTrack stay exactly as with PyTorch. The model registry loads that
+AutoBackend once, points it at an InferenceSession created here with tuned
+threading options, and hands the same AutoBackend to every session's
+predictor (see shared_predictor):
+
+- ORT_INTRA_OP_THREADS: threads inside an operator (default: all CPUs)
+- ORT_INTER_OP_THREADS: operators run in parallel (default 1, i.e. sequential
+  execution, which is fastest for YOLO's mostly linear graph)
+"""
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+ONNX_IMGSZ = 640
+
+_export_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def onnx_path_for(model_path: str, imgsz: int = ONNX_IMGSZ) -> str:
+    """
+    Cached .onnx file for a weights file: same directory and name, .onnx
+    extension (.<imgsz>.onnx for exports at a non-default input size)
+    """
+    if model_path.lower().endswith(".onnx"):
+        return model_path
+    suffix = ".onnx" if imgsz == ONNX_IMGSZ else f".{imgsz}.onnx"
+    return os.path.splitext(model_path)[0] + suffix
+
+
+def _is_fresh(onnx_path: str, model_path: str) -> bool:
+    if not os.path.exists(onnx_path):
+        return False
+    try:
+        return os.path.getmtime(onnx_path) >= os.path.getmtime(model_path)
+    except OSError:
+        # Hub names ("yolo11n.pt") have no local file until ultralytics downloads them
+        return True
+
+
+def export_onnx(model_path: str, imgsz: int = ONNX_IMGSZ) -> str:
+    """Path of an up-to-date ONNX export of model_path at input size imgsz, exporting it if needed"""
+    onnx_path = onnx_path_for(model_path, imgsz)
+    if onnx_path == model_path:
+        return onnx_path
+    with _export_lock:
+        if _is_fresh(onnx_path, model_path):
+            return onnx_path
+        import fcntl
+        from ultralytics import YOLO
+        # Analysis workers are separate processes; only one of them exports
+        with open(onnx_path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if _is_fresh(onnx_path, model_path):
+                    return onnx_path
+                logger.info(f"Exporting {model_path} to ONNX")
+                exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+                if os.path.abspath(str(exported)) != os.path.abspath(onnx_path):
+                    os.replace(str(exported), onnx_path)
+                logger.info(f"ONNX model cached at {onnx_path}")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return onnx_path
+
+
+def session_options() -> Dict[str, Any]:
+    """Threading options used for new sessions"""
+    return {
+        "intra_op_threads": max(1, _env_int("ORT_INTRA_OP_THREADS", os.cpu_count() or 1)),
+        "inter_op_threads": max(1, _env_int("ORT_INTER_OP_THREADS", 1)),
+    }
+
+
+def create_session(onnx_path: str):
+    """CPU InferenceSession for onnx_path with full graph optimisation and tuned threads"""
+    import onnxruntime as ort
+    settings = session_options()
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = settings["intra_op_threads"]
+    options.inter_op_num_threads = settings["inter_op_threads"]
+    options.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL if settings["inter_op_threads"] > 1 else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+    logger.info(
+        f"ONNX Runtime session for {onnx_path}: intra_op={settings['intra_op_threads']}, "
+        f"inter_op={settings['inter_op_threads']}"
+    )
+    return session
+
+
+def use_session(backend, session) -> None:
+    """Point an ultralytics ONNX AutoBackend at session"""
+    backend.session = session
+    backend.output_names = [output.name for output in session.get_outputs()]
+
+
+def shared_predictor(template, callbacks: Dict[str, list]):
+    """
+    New predictor of the same class and arguments as template that runs on
+    template's loaded AutoBackend instead of building its own.
+
+    Model.predict() only calls setup_model() when the model has no predictor
+    yet, so a predictor created here never loads the .onnx file again; it
+    gets its own callbacks (and therefore its own ByteTrack trackers).
+    """
+    predictor = template.__class__(overrides=dict(vars(template.args)), _callbacks=callbacks)
+    predictor.model = template.model
+    predictor.device = template.device
+    predictor.args.half = template.args.half
+    # The shared backend was warmed up when it was loaded
+    predictor.done_warmup = True
+    return predictor
@@ -0,0 +1,147 @@
+"""
+Latency-driven input resolution for live analysis sessions.
+
+Each live session owns a ResolutionController holding a ladder of levels,
+cheapest first, e.g. 320 / 480 / 640 px. A level may also name other weights
+("320:yolo11n.pt"), so the lowest rungs can switch to a smaller model variant.
+The controller keeps the session's recent inference latencies and:
+
+- steps down when their p95 exceeds the target
+- steps up when the p95, scaled by the pixel count of the next level, would
+  still stay below UPGRADE_HEADROOM of the target
+
+After a switch the window restarts and no further switch happens for
+`cooldown` frames, so a single slow frame does not make the level oscillate.
+"""
+import logging
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (input size, weights or None for the session's default model)
+Level = Tuple[int, Optional[str]]
+
+DEFAULT_LEVELS = "320,480,640"
+# Stepping up must leave this much of the budget unused
+UPGRADE_HEADROOM = 0.8
+
+
+def parse_levels(spec: str) -> List[Level]:
+    """Levels from "320,480,640" or "320:yolo11n.pt,480,640", sorted by input size"""
+    levels = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        size, _, model_path = item.partition(":")
+        levels.append((int(size), model_path.strip() or None))
+    if not levels:
+        raise ValueError(f"No resolution levels in {spec!r}")
+    return sorted(levels, key=lambda level: level[0])
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class ResolutionController:
+    """
+    Args:
+        levels: Resolution ladder (LIVE_RESOLUTION_LEVELS, default "320,480,640")
+        target_p95_ms: Per-session p95 latency budget (LIVE_P95_TARGET_MS, default 150)
+        window: Latency samples the p95 is computed over (LIVE_LATENCY_WINDOW, default 30)
+        min_samples: Samples needed before the first decision (default 10)
+        cooldown: Frames after a switch before the next one (LIVE_RESOLUTION_COOLDOWN, default 15)
+
+    Sessions start at the largest level, i.e. the previous fixed 640 px.
+    """
+
+    def __init__(
+        self,
+        levels: Optional[List[Level]] = None,
+        target_p95_ms: Optional[float] = None,
+        window: Optional[int] = None,
+        min_samples: int = 10,
+        cooldown: Optional[int] = None
+    ):
+        if levels is None:
+            try:
+                levels = parse_levels(os.getenv("LIVE_RESOLUTION_LEVELS", DEFAULT_LEVELS))
+            except Exception as e:
+                logger.error(f"Invalid LIVE_RESOLUTION_LEVELS, using {DEFAULT_LEVELS}: {str(e)}")
+                levels = parse_levels(DEFAULT_LEVELS)
+        self.levels = list(levels)
+        self.target_p95_ms = target_p95_ms if target_p95_ms is not None else _env_float("LIVE_P95_TARGET_MS", 150.0)
+        window = window if window is not None else int(_env_float("LIVE_LATENCY_WINDOW", 30))
+        self.min_samples = max(1, min(min_samples, window))
+        self.cooldown = max(0, cooldown if cooldown is not None else int(_env_float("LIVE_RESOLUTION_COOLDOWN", 15)))
+        self._latencies: deque = deque(maxlen=max(1, window))
+        self.index = len(self.levels) - 1
+        self._since_switch = 0
+        self.switches = 0
+
+    @property
+    def imgsz(self) -> int:
+        return self.levels[self.index][0]
+
+    @property
+    def model_path(self) -> Optional[str]:
+        return self.levels[self.index][1]
+
+    @property
+    def at_floor(self) -> bool:
+        """True when there is no cheaper level left to degrade to"""
+        return self.index == 0
+
+    def p95(self) -> Optional[float]:
+        if not self._latencies:
+            return None
+        return float(np.percentile(np.fromiter(self._latencies, dtype=np.float64), 95))
+
+    def over_budget(self) -> bool:
+        p95 = self.p95()
+        return p95 is not None and p95 > self.target_p95_ms
+
+    def record(self, latency_ms: float) -> Optional[str]:
+        """Add one inference latency; returns "down" or "up" when the level changed"""
+        self._latencies.append(float(latency_ms))
+        self._since_switch += 1
+        if len(self._latencies) < self.min_samples or self._since_switch < self.cooldown:
+            return None
+        p95 = self.p95()
+        if p95 > self.target_p95_ms and self.index > 0:
+            return self._switch(self.index - 1, "down", p95)
+        if self.index < len(self.levels) - 1:
+            next_size = self.levels[self.index + 1][0]
+            projected = p95 * (next_size / self.imgsz) ** 2
+            if projected < self.target_p95_ms * UPGRADE_HEADROOM:
+                return self._switch(self.index + 1, "up", p95)
+        return None
+
+    def _switch(self, index: int, direction: str, p95: float) -> str:
+        previous = self.imgsz
+        self.index = index
+        self._latencies.clear()
+        self._since_switch = 0
+        self.switches += 1
+        logger.info(
+            f"Live resolution {direction}: {previous} -> {self.imgsz} px "
+            f"(p95 {p95:.1f} ms, target {self.target_p95_ms:.0f} ms)"
+        )
+        return direction
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "imgsz": self.imgsz,
+            "model_path": self.model_path,
+            "p95_ms": self.p95(),
+            "target_p95_ms": self.target_p95_ms,
+            "switches": self.switches,
+        }
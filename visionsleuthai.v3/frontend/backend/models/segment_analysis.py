@@ -0,0 +1,467 @@
+"""
+Segment-parallel analysis of a single video.
+
+The video is split into consecutive frame ranges that overlap by a few frames.
+Each range is analysed in a process of a long-lived segment pool (own model
+handle, own ByteTrack tracker, own decode/inference pipeline). The pool is
+created on the first segmented job of a job worker and reused by the next
+ones, so its processes load the model once; its size is the job worker's
+share of the CPUs. Frame results stream back in chunks while a segment runs
+and are merged in frame order; track IDs of a segment are mapped onto the IDs of the
+previous segment by matching tracks of the same class on the overlapping
+frames by IoU, so a person keeps one ID across segment boundaries.
+"""
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.detections import Detections, pairwise_iou
+
+logger = logging.getLogger(__name__)
+
+Segment = Tuple[int, int]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def plan_segments(total_frames: int, segments: int, overlap: int, min_frames: int = 1) -> List[Segment]:
+    """
+    Split [0, total_frames) into at most `segments` inclusive ranges of at
+    least min_frames frames; every range after the first starts `overlap`
+    frames before the end of the previous one.
+    """
+    if total_frames <= 0:
+        return []
+    segments = max(1, min(segments, total_frames // max(1, min_frames)))
+    bounds = np.linspace(0, total_frames, segments + 1).astype(int)
+    plan = []
+    for k in range(segments):
+        start = int(bounds[k]) if k == 0 else max(0, int(bounds[k]) - overlap)
+        plan.append((start, int(bounds[k + 1]) - 1))
+    return plan
+
+
+# -- worker side ---------------------------------------------------------------
+
+_processor = None
+# Set by the pool initializer: queue the frame chunks are streamed through, stop flag of the current run
+_result_queue = None
+_stop_event = None
+
+
+def _init_segment_worker(torch_threads: int, result_queue, stop_event) -> None:
+    """Runs once per pool process: load a model and cap its thread use"""
+    global _processor, _result_queue, _stop_event
+    _result_queue, _stop_event = result_queue, stop_event
+    try:
+        import cv2
+        cv2.setNumThreads(1)
+    except Exception:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(max(1, torch_threads))
+    except Exception:
+        pass
+    # Same per-worker budget for ONNX Runtime sessions created in this process
+    os.environ["ORT_INTRA_OP_THREADS"] = str(max(1, torch_threads))
+    from models.model_registry import get_model
+    from models.video_processor import VideoProcessor
+    _processor = VideoProcessor(get_model())
+
+
+def _analyse_segment(run_id: int, video_path: str, segment: Segment, batch_size: int,
+                     decoder: Optional[str] = None, chunk_frames: int = 256) -> Dict[str, Any]:
+    """
+    Analyse one frame range. Frame results are put on the result queue as
+    ("frames", run_id, segment, [(index, result), ...]) chunks in frame order;
+    the return value holds the segment's counters and the number of frames sent.
+    """
+    from models.video_pipeline import VideoPipeline
+    from utils.video_decoder import open_video
+
+    start, end = segment
+    processor = _processor
+    processor.reset()
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    sent = [0]
+
+    def flush() -> None:
+        if chunk:
+            _result_queue.put(("frames", run_id, segment, list(chunk)))
+            sent[0] += len(chunk)
+            chunk.clear()
+
+    def on_result(index: int, result: Dict[str, Any]) -> None:
+        chunk.append((index, result))
+        if len(chunk) >= chunk_frames:
+            flush()
+
+    cap = open_video(video_path, decoder)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video file for segment {segment}")
+    try:
+        pipeline = VideoPipeline(
+            processor,
+            batch_size=batch_size,
+            on_result=on_result,
+            stop_event=_stop_event
+        )
+        pipeline.run(cap, windows=[(start, end)])
+    finally:
+        cap.release()
+    flush()
+    return {
+        "segment": segment,
+        "frames_sent": sent[0],
+        "frames_inferred": processor.frames_inferred,
+        "frames_skipped": processor.frames_skipped,
+        "pipeline": pipeline.stats(),
+    }
+
+
+# -- segment pool ----------------------------------------------------------------
+
+class _SegmentPool:
+    """Pool processes plus the queue and stop flag they were started with"""
+
+    def __init__(self, workers: int, torch_threads: int):
+        ctx = mp.get_context("spawn")
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.result_queue = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_segment_worker,
+            initargs=(torch_threads, self.result_queue, self.stop_event)
+        )
+
+    def shutdown(self) -> None:
+        self.stop_event.set()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.result_queue.close()
+
+
+_pool: Optional[_SegmentPool] = None
+# One segmented run at a time per pool (a job worker runs one job at a time anyway)
+_pool_lock = threading.Lock()
+_run_ids = itertools.count(1)
+
+
+def _get_pool(workers: int, torch_threads: int) -> _SegmentPool:
+    """Process-wide segment pool, (re)created when missing or sized differently; call with _pool_lock held"""
+    global _pool
+    if _pool is not None and (_pool.workers, _pool.torch_threads) != (workers, torch_threads):
+        _pool.shutdown()
+        _pool = None
+    if _pool is None:
+        _pool = _SegmentPool(workers, torch_threads)
+    return _pool
+
+
+def shutdown_segment_pool() -> None:
+    """Stop the segment pool of this process, if one was started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+# -- track stitching -------------------------------------------------------------
+
+def match_tracks(
+    previous: Dict[int, Dict[str, Any]],
+    current: Dict[int, Dict[str, Any]],
+    overlap_frames: List[int],
+    iou_threshold: float
+) -> Dict[int, int]:
+    """
+    Match track IDs of `current` to track IDs of `previous` on the frames both
+    segments analysed. A pair's score is its mean IoU (same class only) over
+    the overlap frames in which the current track appears; pairs are taken
+    greedily by score. Returns {current_track_id: previous_track_id}.
+    """
+    scores: Dict[Tuple[int, int], float] = {}
+    presence: Dict[int, int] = {}
+    for frame_index in overlap_frames:
+        prev_result, cur_result = previous.get(frame_index), current.get(frame_index)
+        if prev_result is None or cur_result is None:
+            continue
+        prev_dets, cur_dets = prev_result["detections"], cur_result["detections"]
+        if not isinstance(prev_dets, Detections) or not isinstance(cur_dets, Detections):
+            continue
+        for track_id in cur_dets.track_id.tolist():
+            if track_id >= 0:
+                presence[track_id] = presence.get(track_id, 0) + 1
+        if len(prev_dets) == 0 or len(cur_dets) == 0:
+            continue
+        iou = pairwise_iou(prev_dets.xyxy, cur_dets.xyxy)
+        iou[prev_dets.class_id[:, None] != cur_dets.class_id[None, :]] = 0.0
+        for i, j in zip(*np.nonzero(iou)):
+            a, b = int(prev_dets.track_id[i]), int(cur_dets.track_id[j])
+            if a >= 0 and b >= 0:
+                scores[(a, b)] = scores.get((a, b), 0.0) + float(iou[i, j])
+
+    ranked = sorted(((total / presence[b], a, b) for (a, b), total in scores.items()), reverse=True)
+    mapping: Dict[int, int] = {}
+    taken = set()
+    for mean_iou, a, b in ranked:
+        if mean_iou < iou_threshold:
+            break
+        if b in mapping or a in taken:
+            continue
+        mapping[b] = a
+        taken.add(a)
+    return mapping
+
+
+def _remap_result(result: Dict[str, Any], mapping: Dict[int, int]) -> None:
+    dets = result.get("detections")
+    if isinstance(dets, Detections) and len(dets):
+        dets.track_id = np.array([mapping.get(t, t) for t in dets.track_id.tolist()], dtype=np.int32)
+        for annotation in (dets.annotations or {}).values():
+            if annotation.get("associated_person_id") is not None:
+                annotation["associated_person_id"] = mapping.get(annotation["associated_person_id"], annotation["associated_person_id"])
+    for interaction in result.get("suspicious_interactions", []):
+        for key in ("track_id", "associated_person_id"):
+            if interaction.get(key) is not None:
+                interaction[key] = mapping.get(interaction[key], interaction[key])
+
+
+def stitch_segments(outputs: List[Dict[str, Any]], iou_threshold: float) -> Tuple[List[Tuple[int, Dict[str, Any]]], Dict[str, Any]]:
+    """
+    Merge segment outputs (sorted by start frame) into one frame-ordered list
+    with globally consistent track IDs. Overlap frames keep the result of the
+    earlier segment, whose tracker has already seen the preceding frames.
+    """
+    merged: List[Tuple[int, Dict[str, Any]]] = []
+    previous: Dict[int, Dict[str, Any]] = {}
+    next_id = 1
+    stitched_tracks = 0
+    last_frame = -1
+
+    for output in outputs:
+        current = dict(output["frames"])
+        local_ids = set()
+        for result in current.values():
+            dets = result.get("detections")
+            if isinstance(dets, Detections):
+                local_ids.update(t for t in dets.track_id.tolist() if t >= 0)
+
+        # `previous` already carries global IDs, so matches map straight to them
+        overlap = [i for i in sorted(current) if i <= last_frame]
+        matches = match_tracks(previous, current, overlap, iou_threshold) if overlap else {}
+        stitched_tracks += len(matches)
+        mapping: Dict[int, int] = {}
+        for local_id in sorted(local_ids):
+            if local_id in matches:
+                mapping[local_id] = matches[local_id]
+            else:
+                mapping[local_id] = next_id
+                next_id += 1
+
+        for frame_index in sorted(current):
+            result = current[frame_index]
+            _remap_result(result, mapping)
+            if frame_index > last_frame:
+                merged.append((frame_index, result))
+
+        previous = current
+        if current:
+            last_frame = max(last_frame, max(current))
+
+    return merged, {"tracks": next_id - 1, "stitched_tracks": stitched_tracks}
+
+
+# -- parent side -----------------------------------------------------------------
+
+class SegmentedAnalyzer:
+    """
+    Args:
+        workers: Segment pool processes (SEGMENT_WORKERS, default: CPU count
+            divided by ANALYSIS_WORKERS, since every job worker has its own pool)
+        overlap: Frames analysed by both neighbouring segments (SEGMENT_OVERLAP, default 15)
+        min_frames: Smallest segment length (SEGMENT_MIN_FRAMES, default 300)
+        iou_threshold: Mean IoU needed to stitch two tracks (STITCH_IOU_THRESHOLD, default 0.5)
+        chunk_frames: Frame results per streamed chunk (SEGMENT_CHUNK_FRAMES, default 256)
+        drain_timeout: Seconds to wait for missing chunks after all segments finished
+            (SEGMENT_DRAIN_TIMEOUT_S, default 30)
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        overlap: Optional[int] = None,
+        min_frames: Optional[int] = None,
+        iou_threshold: Optional[float] = None,
+        chunk_frames: Optional[int] = None,
+        drain_timeout: Optional[float] = None
+    ):
+        # CPUs available to this job worker
+        cpus = max(1, (os.cpu_count() or 1) // max(1, _env_int("ANALYSIS_WORKERS", 1)))
+        self.workers = max(1, workers if workers is not None else _env_int("SEGMENT_WORKERS", cpus))
+        self.overlap = max(0, overlap if overlap is not None else _env_int("SEGMENT_OVERLAP", 15))
+        self.min_frames = max(1, min_frames if min_frames is not None else _env_int("SEGMENT_MIN_FRAMES", 300))
+        if iou_threshold is None:
+            try:
+                iou_threshold = float(os.getenv("STITCH_IOU_THRESHOLD", "0.5"))
+            except Exception:
+                iou_threshold = 0.5
+        self.iou_threshold = iou_threshold
+        self.chunk_frames = max(1, chunk_frames if chunk_frames is not None else _env_int("SEGMENT_CHUNK_FRAMES", 256))
+        if drain_timeout is None:
+            try:
+                drain_timeout = float(os.getenv("SEGMENT_DRAIN_TIMEOUT_S", "30"))
+            except Exception:
+                drain_timeout = 30.0
+        self.drain_timeout = max(0.0, drain_timeout)
+        # Split this job worker's cores between the pool processes
+        self.torch_threads = max(1, cpus // self.workers)
+
+    def run(
+        self,
+        video_path: str,
+        total_frames: int,
+        batch_size: int,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        cancel_event=None,
+        decoder: Optional[str] = None
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], Dict[str, Any]]:
+        """
+        Analyse video_path; returns (frame-ordered [(index, result)], stats).
+        on_progress(done_frames, done_segments) is called as frame chunks
+        arrive; done_frames counts overlap frames once.
+        Segments are decoded with `decoder` (see utils.video_decoder), which
+        must be the backend total_frames was read with.
+        """
+        global _pool
+        plan = plan_segments(total_frames, self.workers, self.overlap, self.min_frames)
+        if not plan:
+            return [], {"segments": []}
+        # First frame each segment contributes on its own; the overlap before it is the previous segment's
+        owned_start = {segment: plan[k - 1][1] + 1 if k else segment[0] for k, segment in enumerate(plan)}
+        t0 = time.perf_counter()
+        frames: Dict[Segment, List[Tuple[int, Dict[str, Any]]]] = {segment: [] for segment in plan}
+        outputs: Dict[Segment, Dict[str, Any]] = {}
+        timings: Dict[Segment, float] = {}
+
+        with _pool_lock:
+            pool_reused = _pool is not None
+            pool = _get_pool(self.workers, self.torch_threads)
+            started = time.perf_counter()
+            run_id = next(_run_ids)
+            pool.stop_event.clear()
+            done_frames = 0
+
+            def drain(timeout: float) -> None:
+                nonlocal done_frames
+                deadline = time.perf_counter() + timeout
+                received = False
+                while True:
+                    try:
+                        kind, chunk_run, segment, chunk = pool.result_queue.get(
+                            timeout=max(0.0, deadline - time.perf_counter()))
+                    except queue.Empty:
+                        break
+                    # Chunks of an earlier, aborted run are dropped
+                    if kind != "frames" or chunk_run != run_id:
+                        continue
+                    frames[segment].extend(chunk)
+                    done_frames += sum(1 for index, _ in chunk if index >= owned_start[segment])
+                    received = True
+                    deadline = time.perf_counter()  # take what is queued, then report
+                if received and on_progress:
+                    on_progress(done_frames, len(outputs))
+
+            try:
+                pending = {
+                    pool.executor.submit(_analyse_segment, run_id, video_path, segment, batch_size,
+                                         decoder, self.chunk_frames): segment
+                    for segment in plan
+                }
+                while pending:
+                    drain(0.1)
+                    if cancel_event is not None and cancel_event.is_set():
+                        pool.stop_event.set()
+                    finished, _ = wait(list(pending), timeout=0, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        segment = pending.pop(future)
+                        outputs[segment] = future.result()
+                        timings[segment] = time.perf_counter() - started
+
+                # Chunks still in flight behind the finished futures. A chunk is lost
+                # when its pool process dies or it cannot be pickled, so wait at most
+                # drain_timeout without any chunk arriving
+                deadline = time.perf_counter() + self.drain_timeout
+                while True:
+                    short = [s for s in plan if s in outputs and len(frames[s]) < outputs[s]["frames_sent"]]
+                    if not short or (cancel_event is not None and cancel_event.is_set()):
+                        break
+                    if time.perf_counter() >= deadline:
+                        segment = short[0]
+                        raise RuntimeError(
+                            f"Segment {segment[0]}-{segment[1]} sent {outputs[segment]['frames_sent']} frames "
+                            f"but only {len(frames[segment])} arrived within {self.drain_timeout:.0f}s"
+                        )
+                    received = sum(len(frames[s]) for s in short)
+                    drain(0.5)
+                    if sum(len(frames[s]) for s in short) > received:
+                        deadline = time.perf_counter() + self.drain_timeout
+            except BaseException as e:
+                pool.stop_event.set()
+                if isinstance(e, BrokenProcessPool):
+                    # A pool process died; start a fresh pool for the next job
+                    pool.shutdown()
+                    _pool = None
+                else:
+                    # Running segments see the stop flag; wait so the pool is idle for the next job
+                    for future in pending:
+                        future.cancel()
+                    wait(list(pending))
+                raise
+
+        ordered = []
+        for segment in plan:
+            if segment in outputs:
+                outputs[segment]["frames"] = frames[segment]
+                ordered.append(outputs[segment])
+        merged, track_stats = stitch_segments(ordered, self.iou_threshold)
+        stats = {
+            "wall_seconds": round(time.perf_counter() - t0, 3),
+            # False for the job that started the pool and paid for spawning it and loading the model
+            "pool_reused": pool_reused,
+            "workers": min(self.workers, len(plan)),
+            "torch_threads_per_worker": self.torch_threads,
+            "overlap_frames": self.overlap,
+            "segments": [
+                {
+                    "start": o["segment"][0],
+                    "end": o["segment"][1],
+                    "frames": len(o["frames"]),
+                    "frames_inferred": o["frames_inferred"],
+                    "frames_skipped": o["frames_skipped"],
+                    "finished_after_seconds": round(timings.get(o["segment"], 0.0), 3),
+                    "pipeline": o["pipeline"],
+                }
+                for o in ordered
+            ],
+            **track_stats,
+        }
+        return merged, stats
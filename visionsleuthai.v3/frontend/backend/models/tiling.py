@@ -0,0 +1,99 @@
+"""
+Sliced (tiled) inference helpers for small objects in high-resolution frames.
+
+The regular full-frame pass runs at 640 px, so a knife in a 4K frame shrinks
+to a few pixels. CrimeDetectionModel uses that pass as a cheap first stage:
+detections of trigger classes (people, weapons) flag regions of interest, and
+only the full-resolution tiles that cover those regions are run through the
+model again. The tile detections are moved back into frame coordinates and
+merged with the full-frame ones by class-aware NMS.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from models.detections import Detections, pairwise_iou
+
+
+def _axis_starts(length: int, tile: int, step: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: float) -> np.ndarray:
+    """(K, 4) xyxy tiles covering the frame; neighbours overlap by `overlap` of the tile size"""
+    step = max(1, int(tile_size * (1.0 - overlap)))
+    xs = _axis_starts(width, tile_size, step)
+    ys = _axis_starts(height, tile_size, step)
+    return np.array(
+        [[x, y, min(x + tile_size, width), min(y + tile_size, height)] for y in ys for x in xs],
+        dtype=np.int32
+    )
+
+
+def tile_to_frame(xyxy: np.ndarray, transform: Tuple[float, float, float]) -> np.ndarray:
+    """Boxes of a tile crop moved into the coordinates of the frame detections: (box + (dx, dy)) * scale"""
+    dx, dy, scale = transform
+    return (np.asarray(xyxy, dtype=np.float32) + np.array([dx, dy, dx, dy], dtype=np.float32)) * scale
+
+
+def expand_regions(boxes: np.ndarray, margin: float, width: int, height: int) -> np.ndarray:
+    """Grow boxes by `margin` of their size on every side (a held weapon extends past the person box)"""
+    if len(boxes) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    boxes = np.asarray(boxes, dtype=np.float32)
+    pad = np.concatenate([boxes[:, 2:] - boxes[:, :2]] * 2, axis=1) * margin
+    grown = boxes + pad * np.array([-1, -1, 1, 1], dtype=np.float32)
+    return np.clip(grown, 0, [width, height, width, height]).astype(np.float32)
+
+
+def select_tiles(tiles: np.ndarray, regions: np.ndarray, max_tiles: int) -> np.ndarray:
+    """Tiles that overlap any region, the ones covering most region area first, at most max_tiles"""
+    if len(tiles) == 0 or len(regions) == 0 or max_tiles <= 0:
+        return tiles[:0]
+    x1 = np.maximum(tiles[:, None, 0], regions[None, :, 0])
+    y1 = np.maximum(tiles[:, None, 1], regions[None, :, 1])
+    x2 = np.minimum(tiles[:, None, 2], regions[None, :, 2])
+    y2 = np.minimum(tiles[:, None, 3], regions[None, :, 3])
+    covered = (np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)).sum(axis=1)
+    order = np.argsort(-covered, kind="stable")
+    order = order[covered[order] > 0][:max_tiles]
+    return tiles[np.sort(order)]
+
+
+def class_aware_nms(detections: Detections, iou_threshold: float) -> np.ndarray:
+    """Indices kept by greedy NMS run separately per class, highest confidence first"""
+    if len(detections) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-detections.confidence, kind="stable")
+    iou = pairwise_iou(detections.xyxy, detections.xyxy)
+    same_class = detections.class_id[:, None] == detections.class_id[None, :]
+    suppressed = np.zeros(len(detections), dtype=bool)
+    keep = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= same_class[i] & (iou[i] > iou_threshold)
+    return np.sort(np.asarray(keep, dtype=np.int64))
+
+
+def merge_tile_detections(base: Detections, tiles: Detections, iou_threshold: float) -> Detections:
+    """
+    Add tile detections to the full-frame ones. Duplicates between tiles are
+    removed by class-aware NMS, and a tile detection that overlaps a
+    full-frame detection of the same class is dropped so the tracked box
+    (and its track ID) wins.
+    """
+    if len(tiles) == 0:
+        return base
+    tiles = tiles.take(class_aware_nms(tiles, iou_threshold))
+    if len(base):
+        iou = pairwise_iou(tiles.xyxy, base.xyxy)
+        same_class = tiles.class_id[:, None] == base.class_id[None, :]
+        duplicate = (same_class & (iou > iou_threshold)).any(axis=1)
+        tiles = tiles.take(np.flatnonzero(~duplicate))
+    return Detections.concat([base, tiles])
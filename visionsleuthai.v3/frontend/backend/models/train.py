@@ -3,7 +3,10 @@ YOLOv8 Custom Training Script for Dangerous Object Detection
 Specifically optimized for knife detection to reduce false positives
 """
 import os
+import json
+import random
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional
 from ultralytics import YOLO
 import yaml
 import logging
@@ -202,10 +205,230 @@ def validate_model(
     return metrics
 
 
-def main():
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def _val_image_paths(data_yaml: str) -> List[str]:
+    """Validation images listed by data.yaml (a directory, an image list file, or a list of either)"""
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get('path') or Path(data_yaml).parent)
+    if not root.is_absolute():
+        root = Path(data_yaml).parent / root
+    entries = data['val'] if isinstance(data['val'], list) else [data['val']]
+    images = []
+    for entry in entries:
+        source = Path(entry) if Path(entry).is_absolute() else root / entry
+        if source.is_dir():
+            images += [str(p) for p in sorted(source.rglob('*')) if p.suffix.lower() in IMAGE_SUFFIXES]
+        elif source.suffix == '.txt' and source.exists():
+            for line in source.read_text().splitlines():
+                line = line.strip()
+                if line:
+                    images.append(line if Path(line).is_absolute() else str(root / line))
+    return images
+
+
+def _letterbox(image, img_size: int):
+    """Same input transform as ultralytics inference: resize, pad to img_size x img_size with gray, RGB, NCHW, [0, 1]"""
+    import cv2
+    import numpy as np
+    h, w = image.shape[:2]
+    scale = min(img_size / h, img_size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((img_size, img_size, 3), 114, dtype=np.uint8)
+    top, left = (img_size - new_h) // 2, (img_size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+class ValCalibrationReader:
+    """
+    onnxruntime CalibrationDataReader over a random sample of the
+    validation images.
+
+    Args:
+        image_paths: Candidate images
+        input_name: Name of the model's image input
+        img_size: Input image size
+        num_images: Images used for calibration
+        seed: Sampling seed (same sample on every run)
+    """
+
+    def __init__(self, image_paths: List[str], input_name: str, img_size: int = 640,
+                 num_images: int = 200, seed: int = 42):
+        paths = list(image_paths)
+        random.Random(seed).shuffle(paths)
+        self.image_paths = paths[:num_images]
+        self.input_name = input_name
+        self.img_size = img_size
+        self._batches: Optional[Iterator[Dict]] = None
+
+    def _iter_batches(self) -> Iterator[Dict]:
+        import cv2
+        for path in self.image_paths:
+            image = cv2.imread(path)
+            if image is None:
+                logger.warning(f"Skipping unreadable calibration image: {path}")
+                continue
+            yield {self.input_name: _letterbox(image, self.img_size)}
+
+    def get_next(self) -> Optional[Dict]:
+        if self._batches is None:
+            self._batches = self._iter_batches()
+        return next(self._batches, None)
+
+    def rewind(self) -> None:
+        self._batches = None
+
+
+def _head_postprocess_nodes(model) -> List[str]:
+    """
+    Nodes of the Detect head after its conv branches (DFL, box decoding,
+    sigmoid, output concat). Box coordinates and class scores share one
+    output tensor with very different ranges, so they stay in FP32.
+    """
+    prefixes = [node.name.split('/')[1] for node in model.graph.node if node.name.startswith('/model.')]
+    if not prefixes:
+        return []
+    head = max(prefixes, key=lambda p: int(p.split('.')[1]))
+    return [
+        node.name for node in model.graph.node
+        if node.name.startswith(f'/{head}/') and '/cv2.' not in node.name and '/cv3.' not in node.name
+    ]
+
+
+def quantize_int8(
+    model_path: str,
+    data_yaml: str,
+    img_size: int = 640,
+    calibration_images: int = 200,
+    output_path: Optional[str] = None,
+    per_channel: bool = True
+) -> str:
+    """
+    Post-training static INT8 quantization (ONNX Runtime, QDQ format).
+
+    The weights are exported to FP32 ONNX at img_size next to model_path
+    (best.pt -> best.onnx, see models.onnx_backend.onnx_path_for), activation ranges are calibrated on a sample of the data.yaml
+    validation images, and the result is written as best.int8.onnx. Either
+    file can be used as MODEL_PATH.
+
+    Args:
+        model_path: Trained weights (best.pt)
+        data_yaml: Path to data.yaml configuration
+        img_size: Input image size
+        calibration_images: Validation images used for calibration
+        output_path: Quantized model path (default: <weights>.int8.onnx)
+        per_channel: Per-channel weight scales (more accurate, slightly larger)
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    from models.onnx_backend import export_onnx
+
+    # Exported at the training size so calibration and validation see the same input size
+    fp32_path = export_onnx(model_path, imgsz=img_size)
+    output_path = output_path or os.path.splitext(model_path)[0] + '.int8.onnx'
+    image_paths = _val_image_paths(data_yaml)
+    if not image_paths:
+        raise FileNotFoundError(f"No validation images found through {data_yaml}")
+
+    # Shape inference / graph cleanup recommended before static quantization
+    prepared_path = os.path.splitext(output_path)[0] + '.prep.onnx'
+    quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+    try:
+        prepared = onnx.load(prepared_path)
+        reader = ValCalibrationReader(
+            image_paths, prepared.graph.input[0].name, img_size=img_size, num_images=calibration_images
+        )
+        logger.info(f"Calibrating INT8 quantization on {len(reader.image_paths)} validation images")
+        quantize_static(
+            prepared_path,
+            output_path,
+            reader,
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=_head_postprocess_nodes(prepared)
+        )
+    finally:
+        if os.path.exists(prepared_path):
+            os.remove(prepared_path)
+
+    # ultralytics reads names/stride/imgsz from the export's metadata
+    quantized = onnx.load(output_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(onnx.load(fp32_path).metadata_props)
+    onnx.save(quantized, output_path)
+
+    logger.info(f"INT8 model saved at: {output_path}")
+    return output_path
+
+
+def compare_fp32_int8(
+    fp32_path: str,
+    int8_path: str,
+    data_yaml: str,
+    img_size: int = 640,
+    report_path: Optional[str] = None
+) -> Dict:
+    """
+    Validate the FP32 and INT8 ONNX models on the CPU and write a JSON report
+    with mAP50, mAP50-95, per-image latency and file size of each.
+
+    Args:
+        fp32_path: FP32 ONNX model
+        int8_path: INT8 ONNX model
+        data_yaml: Path to data.yaml configuration
+        img_size: Input image size
+        report_path: Report file (default: quantization_report.json next to the INT8 model)
+    """
+    report = {'data': data_yaml, 'img_size': img_size}
+    for label, path in (('fp32', fp32_path), ('int8', int8_path)):
+        logger.info(f"Validating {label.upper()} model {path}")
+        metrics = YOLO(path, task='detect').val(
+            data=data_yaml, imgsz=img_size, batch=1, device='cpu', plots=False, verbose=False
+        )
+        report[label] = {
+            'model_path': path,
+            'size_mb': round(os.path.getsize(path) / 1e6, 2),
+            'map50': float(metrics.box.map50),
+            'map50_95': float(metrics.box.map),
+            # ultralytics reports milliseconds per image
+            'latency_ms': {stage: round(float(ms), 2) for stage, ms in metrics.speed.items()},
+        }
+
+    fp32, int8 = report['fp32'], report['int8']
+    report['map50_drop'] = round(fp32['map50'] - int8['map50'], 4)
+    inference_int8 = int8['latency_ms'].get('inference') or 0.0
+    report['inference_speedup'] = (
+        round(fp32['latency_ms'].get('inference', 0.0) / inference_int8, 2) if inference_int8 else None
+    )
+
+    report_path = report_path or str(Path(int8_path).parent / 'quantization_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    logger.info(f"mAP50 FP32={fp32['map50']:.4f} INT8={int8['map50']:.4f} (drop {report['map50_drop']:.4f})")
+    logger.info(
+        f"Inference ms/image FP32={fp32['latency_ms'].get('inference')} "
+        f"INT8={int8['latency_ms'].get('inference')} (speedup x{report['inference_speedup']})"
+    )
+    logger.info(f"Quantization report saved at: {report_path}")
+    return report
+
+
+def main(quantize: bool = True):
     """
     Main training script.
     Adjust paths and parameters as needed.
+
+    Args:
+        quantize: Also build and evaluate an INT8 ONNX model after training
     """
     # Dataset paths (adjust these to your dataset structure)
     base_dir = Path("data")
@@ -255,7 +478,30 @@ def main():
             data_yaml=data_yaml,
             img_size=img_size
         )
-    
+
+        # Post-training INT8 quantization for CPU inference; optional, so a
+        # missing onnx/onnxruntime install or validation split never loses the training run
+        if quantize:
+            logger.info("=" * 50)
+            logger.info("INT8 Quantization")
+            logger.info("=" * 50)
+            try:
+                from models.onnx_backend import export_onnx
+                int8_model_path = quantize_int8(
+                    model_path=str(best_model_path),
+                    data_yaml=data_yaml,
+                    img_size=img_size
+                )
+                compare_fp32_int8(
+                    fp32_path=export_onnx(str(best_model_path), imgsz=img_size),
+                    int8_path=int8_model_path,
+                    data_yaml=data_yaml,
+                    img_size=img_size
+                )
+                logger.info(f"To use the INT8 model, set MODEL_PATH={int8_model_path}")
+            except Exception as e:
+                logger.warning(f"INT8 quantization failed, keeping the FP32 model only: {str(e)}")
+
     logger.info("=" * 50)
     logger.info("Training Pipeline Completed!")
     logger.info("=" * 50)
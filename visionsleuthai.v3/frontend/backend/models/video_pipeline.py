@@ -0,0 +1,325 @@
+"""
+Staged video analysis pipeline: decode -> inference -> aggregation.
+
+The decoder and inference stages run in their own threads and the
+aggregation stage runs in the caller's thread. Stages are connected by
+bounded queues, so a slow stage applies backpressure to the ones before it
+instead of letting decoded frames pile up in memory.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream on every queue
+_END = object()
+# Emitted by the decoder when it jumps to a new, non-contiguous window
+_DISCONTINUITY = object()
+
+
+class StageStats:
+    """Busy/wait accounting for a single pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def snapshot(self, wall_seconds: float) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "utilization": round(self.busy_seconds / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        }
+
+
+class MonitoredQueue(queue.Queue):
+    """Bounded queue that records its depth every time an item is added"""
+
+    def __init__(self, name: str, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self.name = name
+        self.max_depth = 0
+        self._depth_total = 0
+        self._samples = 0
+
+    def _put(self, item):
+        super()._put(item)
+        depth = len(self.queue)
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_total += depth
+        self._samples += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.maxsize,
+            "depth": self.qsize(),
+            "max_depth": self.max_depth,
+            "mean_depth": round(self._depth_total / self._samples, 2) if self._samples else 0.0,
+        }
+
+
+class VideoPipeline:
+    """
+    Run a VideoProcessor over a cv2.VideoCapture with overlapping stages.
+
+    Args:
+        processor: VideoProcessor used for inference and result building
+        batch_size: Frames per inference call
+        queue_size: Capacity of the decoded-frame queue (frames)
+        on_result: Called as on_result(frame_index, frame_result) in frame order
+        stop_event: Optional event that aborts the run when set
+        on_batch: Called in the inference thread as on_batch(last_frame_index)
+            after each batch, before its results are queued (e.g. to snapshot
+            tracker state that matches that frame)
+    """
+
+    def __init__(
+        self,
+        processor,
+        batch_size: int,
+        queue_size: Optional[int] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+        on_batch: Optional[Callable[[int], None]] = None
+    ):
+        self.processor = processor
+        self.batch_size = max(1, int(batch_size))
+        if queue_size is None:
+            try:
+                queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+            except Exception:
+                queue_size = 64
+        # The frame queue must hold at least one full batch
+        queue_size = max(self.batch_size, int(queue_size))
+        self.on_result = on_result
+        self.on_batch = on_batch
+        self.stop_event = stop_event or threading.Event()
+
+        self.frame_queue = MonitoredQueue("decoded_frames", queue_size)
+        self.result_queue = MonitoredQueue("inference_results", queue_size)
+        self.stages = {
+            "decode": StageStats("decode"),
+            "inference": StageStats("inference"),
+            "aggregation": StageStats("aggregation"),
+        }
+        self._errors: List[BaseException] = []
+        # Set for decoders that downscale at decode time (see utils.video_decoder)
+        self._box_scale: Optional[np.ndarray] = None
+        self._source_shape: Optional[Tuple[int, int, int]] = None
+        self._t_start: Optional[float] = None
+        self._t_end: Optional[float] = None
+
+    # -- queue helpers ---------------------------------------------------
+    def _put(self, q: queue.Queue, item, stats: StageStats) -> bool:
+        t0 = time.perf_counter()
+        try:
+            while True:
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    if self.stop_event.is_set():
+                        return False
+        finally:
+            stats.wait_seconds += time.perf_counter() - t0
+
+    def _get(self, q: queue.Queue, stats: StageStats):
+        t0 = time.perf_counter()
+        try:
+            while True:
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    if self.stop_event.is_set():
+                        return _END
+        finally:
+            stats.wait_seconds += time.perf_counter() - t0
+
+    def _fail(self, err: BaseException) -> None:
+        self._errors.append(err)
+        self.stop_event.set()
+
+    # -- stages ----------------------------------------------------------
+    def _decode(self, cap, stride: int, windows: Optional[List[Tuple[int, int]]], start_frame: int = 0) -> None:
+        stats = self.stages["decode"]
+        try:
+            if windows is None:
+                self._decode_strided(cap, stride, stats, start_frame)
+            else:
+                self._decode_windows(cap, windows, stats)
+        except Exception as e:
+            logger.exception("Decoder stage failed: %s", str(e))
+            self._fail(e)
+        finally:
+            self._put(self.frame_queue, _END, stats)
+
+    def _decode_strided(self, cap, stride: int, stats: StageStats, start_frame: int = 0) -> None:
+        index = 0
+        if start_frame > 0:
+            import cv2
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            index = start_frame
+        while not self.stop_event.is_set():
+            t0 = time.perf_counter()
+            if index % stride == 0:
+                ret, frame = cap.read()
+            else:
+                # grab() advances without converting the frame to BGR
+                ret, frame = cap.grab(), None
+            stats.busy_seconds += time.perf_counter() - t0
+            if not ret:
+                break
+            if frame is not None:
+                if not self._put(self.frame_queue, (index, frame), stats):
+                    return
+                stats.items += 1
+            index += 1
+
+    def _decode_windows(self, cap, windows: List[Tuple[int, int]], stats: StageStats) -> None:
+        import cv2
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        for start, end in windows:
+            if self.stop_event.is_set():
+                return
+            if position != start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                position = start
+            if not self._put(self.frame_queue, _DISCONTINUITY, stats):
+                return
+            while position <= end and not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                ret, frame = cap.read()
+                stats.busy_seconds += time.perf_counter() - t0
+                if not ret:
+                    return
+                if not self._put(self.frame_queue, (position, frame), stats):
+                    return
+                stats.items += 1
+                position += 1
+
+    def _infer(self) -> None:
+        stats = self.stages["inference"]
+        try:
+            finished = False
+            while not finished:
+                batch = []
+                reset = False
+                # Fill the batch; a short batch is flushed at the end of stream
+                # or when the decoder jumps to a new window
+                while len(batch) < self.batch_size:
+                    item = self._get(self.frame_queue, stats)
+                    if item is _END:
+                        finished = True
+                        break
+                    if item is _DISCONTINUITY:
+                        reset = True
+                        break
+                    batch.append(item)
+                if self.stop_event.is_set():
+                    break
+
+                if batch:
+                    t0 = time.perf_counter()
+                    detections = self.processor.infer_frames([f for _, f in batch], batch_size=self.batch_size)
+                    stats.busy_seconds += time.perf_counter() - t0
+                    stats.items += len(batch)
+                    if self.on_batch:
+                        self.on_batch(batch[-1][0])
+
+                    for (index, frame), dets in zip(batch, detections):
+                        if not self._put(self.result_queue, (index, frame.shape, dets), stats):
+                            return
+                if reset:
+                    # Track IDs must not be carried across a gap in the video
+                    self.processor.reset_tracking()
+        except Exception as e:
+            logger.exception("Inference stage failed: %s", str(e))
+            self._fail(e)
+        finally:
+            self._put(self.result_queue, _END, stats)
+
+    def _aggregate(self) -> None:
+        stats = self.stages["aggregation"]
+        while True:
+            item = self._get(self.result_queue, stats)
+            if item is _END:
+                break
+            index, frame_shape, dets = item
+            t0 = time.perf_counter()
+            if self._box_scale is not None:
+                # Report boxes (and frame size) in source video pixels
+                if dets is not None and len(dets):
+                    dets.xyxy = dets.xyxy * self._box_scale
+                frame_shape = self._source_shape
+            frame_result = self.processor.build_result(dets, frame_shape)
+            if self.on_result:
+                self.on_result(index, frame_result)
+            stats.busy_seconds += time.perf_counter() - t0
+            stats.items += 1
+
+    # -- public API ------------------------------------------------------
+    def run(self, cap, stride: int = 1, windows: Optional[List[Tuple[int, int]]] = None, start_frame: int = 0) -> int:
+        """
+        Process frames of cap; returns the number of frames aggregated.
+
+        Args:
+            cap: Opened cv2.VideoCapture (or a utils.video_decoder capture;
+                boxes of downscaled frames are mapped back to source pixels)
+            stride: Analyse every stride-th frame (ignored when windows is given)
+            windows: Sorted, non-overlapping inclusive (start, end) frame ranges
+                to analyse densely; the tracker is reset at every window
+            start_frame: Continue a strided run at this frame without resetting
+                the tracker (ignored when windows is given)
+        """
+        frame_scale = getattr(cap, "frame_scale", None)
+        if frame_scale is not None and tuple(frame_scale) != (1.0, 1.0):
+            sx, sy = frame_scale
+            self._box_scale = np.array([sx, sy, sx, sy], dtype=np.float32)
+            self._source_shape = cap.source_shape
+        self._t_start = time.perf_counter()
+        decoder = threading.Thread(
+            target=self._decode,
+            args=(cap, max(1, int(stride)), windows, max(0, int(start_frame))),
+            name="pipeline-decode",
+            daemon=True
+        )
+        inference = threading.Thread(target=self._infer, name="pipeline-inference", daemon=True)
+        decoder.start()
+        inference.start()
+        try:
+            self._aggregate()
+        except Exception as e:
+            self._fail(e)
+        finally:
+            decoder.join()
+            inference.join()
+            self._t_end = time.perf_counter()
+
+        if self._errors:
+            raise self._errors[0]
+        return self.stages["aggregation"].items
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-stage utilization and per-queue depth (safe to call while running)"""
+        if self._t_start is None:
+            wall = 0.0
+        else:
+            wall = (self._t_end or time.perf_counter()) - self._t_start
+        return {
+            "wall_seconds": round(wall, 3),
+            "batch_size": self.batch_size,
+            "stages": {name: s.snapshot(wall) for name, s in self.stages.items()},
+            "queues": {
+                self.frame_queue.name: self.frame_queue.snapshot(),
+                self.result_queue.name: self.result_queue.snapshot(),
+            },
+        }
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import os
 import json
 import numpy as np
@@ -17,6 +17,8 @@ def _iou(box_a: List[float], box_b: List[float]) -> float:
 
 
 from models.threat_analyzer import ThreatAnalyzer
+from models.motion_gate import MotionGate
+from models.detections import CLASS_NAMES, Detections, frame_result_to_dict
 
 class VideoProcessor:
     def __init__(self, model, mode: str = "video_upload"):
@@ -53,6 +55,16 @@ class VideoProcessor:
         # Basit ID takibi parametreleri
         self.iou_match_threshold: float = float(os.getenv("TRACK_IOU_THRESHOLD", "0.3"))
         self.next_track_id: int = 1
+        # Hareket kapısı: statik karelerde YOLO atlanır, önceki tespitler taşınır
+        self.motion_gate: Optional[MotionGate] = None
+        if os.getenv("MOTION_GATE_ENABLED", "true").lower() == "true":
+            self.motion_gate = MotionGate()
+        self.frames_inferred: int = 0
+        self.frames_skipped: int = 0
+        self._last_detections: Detections = Detections.empty()
+        # class id -> risk weight / ThreatAnalyzer relevance, filled lazily
+        self._class_weight_lut: Dict[int, float] = {}
+        self._threat_relevant_lut: Dict[int, bool] = {}
 
     def _smooth_confidence(self, current: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if not self.previous_detections:
@@ -83,70 +95,191 @@ class VideoProcessor:
                 smoothed.append(det)
         return smoothed
 
-    def _assess_risk(self, det: Dict[str, Any], frame_shape: Tuple[int, int, int]) -> float:
-        class_name = str(det.get("class_name", "")).lower()
-        conf = float(det.get("confidence", 0.0))  # 0..1
-        bbox = det.get("bbox", [0.0, 0.0, 0.0, 0.0])
+    def _assess_risk_columns(self, dets: Detections, frame_shape: Tuple[int, int, int]) -> np.ndarray:
+        """Risk score (0..1) of every row from class weight, box area and confidence"""
+        if len(dets) == 0:
+            return np.zeros(0, dtype=np.float32)
+        w_class = np.empty(len(dets), dtype=np.float32)
+        for i, class_id in enumerate(dets.class_id.tolist()):
+            weight = self._class_weight_lut.get(class_id)
+            if weight is None:
+                weight = self.class_risk_weight.get(CLASS_NAMES.name(class_id).lower(), 0.2)
+                self._class_weight_lut[class_id] = weight
+            w_class[i] = weight
         h, w = frame_shape[0], frame_shape[1]
-        area = max(0.0, (bbox[2] - bbox[0])) * max(0.0, (bbox[3] - bbox[1]))
-        frame_area = max(1.0, float(w * h))
-        area_ratio = min(1.0, area / frame_area)
-
-        # Sınıf ağırlığı
-        base_w = 0.4
-        w_class = self.class_risk_weight.get(class_name, 0.2)
-        # Yakınlık/alan etkisi
-        w_area = 0.3
-        # Güven etkisi
-        w_conf = 0.3
-
-        raw_score = base_w + w_class * 1.0 + w_area * area_ratio + w_conf * conf
+        widths = np.clip(dets.xyxy[:, 2] - dets.xyxy[:, 0], 0.0, None)
+        heights = np.clip(dets.xyxy[:, 3] - dets.xyxy[:, 1], 0.0, None)
+        area_ratio = np.minimum(1.0, widths * heights / max(1.0, float(w * h)))
+        # Sınıf ağırlığı + yakınlık/alan etkisi + güven etkisi
+        base_w, w_area, w_conf = 0.4, 0.3, 0.3
+        raw_score = base_w + w_class + w_area * area_ratio + w_conf * dets.confidence
         # 0..1 aralığına sıkıştır
-        return max(0.0, min(1.0, raw_score))
+        return np.clip(raw_score, 0.0, 1.0).astype(np.float32)
 
-    def process_frame(self, frame: np.ndarray) -> Dict[str, Any]:
-        # Model çerçeve işleme - ByteTrack ile track_id dahil gelir
-        detections, _annotated = self.model.process_frame(frame)
+    def _is_threat_relevant(self, class_id: int) -> bool:
+        relevant = self._threat_relevant_lut.get(class_id)
+        if relevant is None:
+            name = CLASS_NAMES.name(class_id).lower()
+            analyzer = self.threat_analyzer
+            relevant = name in ('person', 'people') or name in analyzer.lethal_weapons or name in analyzer.non_threat_objects
+            self._threat_relevant_lut[class_id] = relevant
+        return relevant
+
+    def _analyze_threats(self, dets: Detections) -> List[Dict[str, Any]]:
+        """
+        Run ThreatAnalyzer on the rows it looks at (persons, weapons, hard
+        negatives) and record its per-detection fields as row annotations.
+        """
+        rows = [i for i, class_id in enumerate(dets.class_id.tolist()) if self._is_threat_relevant(class_id)]
+        if not rows:
+            return []
+        subset = Detections(dets.xyxy[rows], dets.confidence[rows], dets.class_id[rows],
+                            track_id=dets.track_id[rows], risk_score=dets.risk_score[rows])
+        candidates = subset.to_dicts()
+        base_keys = set(candidates[0])
+        threat_results = self.threat_analyzer.analyze(candidates)
+        for threat in threat_results:
+            # Güvenlik puanını güncelle (silah taşıyorsa düşür)
+            if threat.get('alert_level') == "CRITICAL":
+                threat['security_score'] = threat['confidence'] * 0.4
+
+        annotations = {}
+        for row, det in zip(rows, candidates):
+            extra = {k: v for k, v in det.items() if k not in base_keys}
+            if extra:
+                annotations[row] = extra
+        dets.annotations = annotations or None
+        return threat_results
+
+    def build_result(self, detections, frame_shape: Tuple[int, int, int]) -> Dict[str, Any]:
+        """
+        Enrich raw model detections into a frame result.
+
+        detections is a Detections object (or a list of model detection
+        dicts); None marks a frame skipped by the motion gate, which reuses
+        the detections (and track IDs) of the last inferred frame. Results
+        must be built in frame order for this to hold. The result keeps its
+        detections columnar; see frame_result_to_dict.
+        """
+        motion_skipped = detections is None
+        if motion_skipped:
+            detections = self._last_detections
+        else:
+            if not isinstance(detections, Detections):
+                detections = Detections.from_dicts(detections)
+            self._last_detections = detections
 
         # Temel zenginleştirme (Risk skoru hesaplama)
-        enriched: List[Dict[str, Any]] = []
-        for det in detections:
-            if isinstance(det, dict):
-                risk = self._assess_risk(det, frame.shape)
-                det_out = {
-                    "type": det.get("class_name", "unknown"),
-                    "class_name": det.get("class_name", "unknown"),
-                    "confidence": float(det.get("confidence", 0.0)),
-                    "bbox": det.get("bbox", [0.0, 0.0, 0.0, 0.0]),
-                    "risk_score": risk,
-                    "track_id": det.get("track_id", 0)
-                }
-                enriched.append(det_out)
+        enriched = Detections(
+            detections.xyxy,
+            detections.confidence,
+            detections.class_id,
+            track_id=detections.track_id,
+            risk_score=self._assess_risk_columns(detections, frame_shape)
+        )
 
         # TEZİN ÖZGÜN MANTIĞI: ThreatAnalyzer ile bağlam duyarlı analiz
-        threat_results = self.threat_analyzer.analyze(enriched)
-        
-        # Analiz sonuçlarını ana tespit listesine işle
-        for threat in threat_results:
-            for det in enriched:
-                # Bbox eşleşmesi üzerinden ek bilgileri aktar
-                if det['bbox'] == threat['bbox']:
-                    det['alert_level'] = threat.get('alert_level')
-                    det['event_type'] = threat.get('event_type')
-                    det['associated_person_id'] = threat.get('associated_person_id')
-                    # Güvenlik puanını güncelle (silah taşıyorsa düşür)
-                    if threat.get('alert_level') == "CRITICAL":
-                        det['security_score'] = det['confidence'] * 0.4
+        threat_results = self._analyze_threats(enriched)
 
         # Ortalama güven skoru
-        avg_conf = float(np.mean([d.get("confidence", 0.0) for d in enriched])) if enriched else 0.0
+        avg_conf = float(enriched.confidence.mean()) if len(enriched) else 0.0
 
         return {
             "detections": enriched,
             "suspicious_interactions": threat_results, # Adli rapora giden kritik veri
             "confidence": avg_conf,
+            "motion_skipped": motion_skipped,
         }
 
+    def _gate(self, frame: np.ndarray) -> bool:
+        """True when the motion gate lets this frame skip inference"""
+        if self.motion_gate is None:
+            return False
+        try:
+            return self.motion_gate.is_static(frame)
+        except Exception:
+            return False
+
+    def process_frame(self, frame: np.ndarray, as_dicts: bool = True, imgsz: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Single-frame API used by the live routes.
+
+        Detections are returned as dicts unless as_dicts=False, which keeps
+        them columnar for callers that serialize with utils.result_codec.
+        imgsz overrides the model's inference size for this frame.
+        """
+        if self._gate(frame):
+            self.frames_skipped += 1
+            result = self.build_result(None, frame.shape)
+        else:
+            # Model çerçeve işleme - ByteTrack ile track_id dahil gelir
+            # (no annotated frame: live clients draw their own boxes)
+            detections, _ = self.model.process_frames([frame], batch_size=1, imgsz=imgsz)[0]
+            self.frames_inferred += 1
+            result = self.build_result(detections, frame.shape)
+        return frame_result_to_dict(result) if as_dicts else result
+
+    def reset_tracking(self) -> None:
+        """Start a new track sequence (next frame is not contiguous with the last one)"""
+        self.model.reset_tracker()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+
+    def reset(self) -> None:
+        """Prepare a reused processor for a new video"""
+        self.reset_tracking()
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self._last_detections = Detections.empty()
+
+    def export_inference_state(self) -> Dict[str, Any]:
+        """State owned by the inference side (tracker, motion gate, counters)"""
+        return {
+            "tracker": self.model.export_tracker_state(),
+            "motion_gate": self.motion_gate.get_state() if self.motion_gate is not None else None,
+            "frames_inferred": self.frames_inferred,
+            "frames_skipped": self.frames_skipped,
+        }
+
+    def import_state(self, inference_state: Dict[str, Any], last_detections: Optional[Detections] = None) -> None:
+        """Continue a video from a checkpoint (see export_inference_state)"""
+        self.model.import_tracker_state(inference_state.get("tracker"))
+        if self.motion_gate is not None and inference_state.get("motion_gate"):
+            self.motion_gate.set_state(inference_state["motion_gate"])
+        self.frames_inferred = int(inference_state.get("frames_inferred", 0))
+        self.frames_skipped = int(inference_state.get("frames_skipped", 0))
+        self._last_detections = last_detections if last_detections is not None else Detections.empty()
+
+    def infer_frames(self, frames: List[np.ndarray], batch_size: Optional[int] = None) -> List[Optional[Detections]]:
+        """
+        Run batched model inference only; returns raw detections per frame.
+
+        Frames the motion gate marks as static are not sent to the model and
+        come back as None (see build_result).
+        """
+        static = [self._gate(frame) for frame in frames]
+        moving = [frame for frame, is_static in zip(frames, static) if not is_static]
+        outputs = iter(self.model.process_frames(moving, batch_size=batch_size) if moving else [])
+        self.frames_inferred += len(moving)
+        self.frames_skipped += len(frames) - len(moving)
+        return [None if is_static else next(outputs)[0] for is_static in static]
+
+    def get_gate_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.motion_gate is not None,
+            "frames_inferred": self.frames_inferred,
+            "frames_skipped": self.frames_skipped,
+            "config": self.motion_gate.get_config() if self.motion_gate is not None else None,
+        }
+
+    def process_frames(self, frames: List[np.ndarray], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Batched counterpart of process_frame; results keep the input frame order and columnar detections"""
+        detections = self.infer_frames(frames, batch_size=batch_size)
+        return [
+            self.build_result(dets, frame.shape)
+            for frame, dets in zip(frames, detections)
+        ]
+
     def process(self, video_path: str) -> Dict[str, Any]:
         # Mevcut basit iskelet; video bazlı işleme üst seviye akışta yapılmakta
         return {
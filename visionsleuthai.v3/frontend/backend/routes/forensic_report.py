@@ -6,7 +6,7 @@ from detection results using the ForensicReportGenerator.
 """
 
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse
+from utils.responses import FastJSONResponse
 from typing import Dict, List, Any
 from datetime import datetime
 from models.forensic_report_generator import ForensicReportGenerator
@@ -66,7 +66,7 @@ async def generate_forensic_report(request: Request):
         # NOTE: This does NOT modify any detection values - only interprets them
         report = report_generator.generate_report(data)
         
-        return JSONResponse(
+        return FastJSONResponse(
             content={
                 "status": "success",
                 "report": report,
@@ -1,27 +1,27 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
-from typing import Dict, List
+from typing import Dict, List, Optional
 import asyncio
-import cv2
 import numpy as np
 from datetime import datetime
-from models.crime_detection_model import CrimeDetectionModel
-from models.video_processor import VideoProcessor
+from models.live_sessions import LiveSessionPool
 import base64
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import Response
 import logging
 import os
 from pydantic import BaseModel
 from utils.metrics import frames_processed, frames_dropped, start_timer, observe_latency_ms
+from utils.responses import FastJSONResponse, send_json_fast
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 active_connections: Dict[str, WebSocket] = {}
-video_processors: Dict[str, VideoProcessor] = {}
 client_locks: Dict[str, asyncio.Lock] = {}
 client_frame_counts: Dict[str, int] = {}
 client_last_ts_ms: Dict[str, int] = {}
 
-# Minimum interval between processed frames per client (ms)
+# Minimum interval between processed frames per client (ms); only enforced once
+# the session's resolution controller has no lower input size left, because
+# degrading resolution is preferred over dropping frames
 MIN_INTERVAL_MS = int(os.getenv("LIVE_MIN_INTERVAL_MS", "120"))
 
 # Allowed origins for CORS
@@ -33,10 +33,17 @@ ALLOWED_ORIGINS = [
 
 class FrameInput(BaseModel):
     image: str
+    # Identifies the browser session; each client gets its own tracker
+    client_id: Optional[str] = None
 
-# Initialize model and processor once (lazy load inside model) - LIVE ANALYSIS MODE
-model = CrimeDetectionModel(mode="live_analysis")
-video_processor = VideoProcessor(model, mode="live_analysis")
+# Per-client processors on top of one shared model - LIVE ANALYSIS MODE
+live_sessions = LiveSessionPool()
+# Session used by POST /frame callers that do not send a client_id
+DEFAULT_CLIENT_ID = "default"
+
+def _process_locked(session, frame):
+    with session.lock:
+        return session.process(frame)
 
 @router.post("/start")
 async def start_live_analysis():
@@ -49,9 +56,8 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
     active_connections[client_id] = websocket
     
     # Initialize video processor for this connection - LIVE ANALYSIS MODE
-    model = CrimeDetectionModel(mode="live_analysis")
-    video_processor = VideoProcessor(model, mode="live_analysis")
-    video_processors[client_id] = video_processor
+    # (shared weights from the registry; only the tracker state is per connection)
+    session = await asyncio.to_thread(live_sessions.get, client_id)
     client_locks[client_id] = asyncio.Lock()
     client_frame_counts[client_id] = 0
     client_last_ts_ms[client_id] = 0
@@ -63,6 +69,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             
             # Convert bytes to numpy array
             frame_array = np.frombuffer(frame_data, dtype=np.uint8)
+            import cv2
             frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
             
             # Rate limit and drop policy: try to acquire lock without waiting
@@ -71,17 +78,18 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                 frames_dropped.labels(client_id=client_id, reason="locked").inc()
                 continue
             now_ms = int(datetime.utcnow().timestamp() * 1000)
-            if now_ms - client_last_ts_ms.get(client_id, 0) < MIN_INTERVAL_MS:
+            if session.resolution.at_floor and now_ms - client_last_ts_ms.get(client_id, 0) < MIN_INTERVAL_MS:
                 frames_dropped.labels(client_id=client_id, reason="rate_limited").inc()
                 continue
 
             async with lock:
                 try:
                     t0 = start_timer()
-                    results = video_processor.process_frame(frame)
+                    # The session lock is also held by POST /frame threads; never block the event loop on it
+                    results = await asyncio.to_thread(_process_locked, session, frame)
                 except Exception as e:
                     logger.exception("Live WS frame processing error: %s", str(e))
-                    await websocket.send_json({
+                    await send_json_fast(websocket, {
                         "error": "processing_error",
                         "message": str(e)
                     })
@@ -93,19 +101,21 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                 logger.debug(f"client={client_id} frame={client_frame_counts[client_id]} latency_ms={elapsed_ms:.1f} det={len(results['detections'])}")
             
             # Send results back to client
-            await websocket.send_json({
+            await send_json_fast(websocket, {
                 "frame_number": client_frame_counts[client_id],
                 "timestamp": datetime.utcnow().isoformat(),
                 "detections": results["detections"],
-                "suspicious_interactions": results["suspicious_interactions"]
+                "suspicious_interactions": results["suspicious_interactions"],
+                "motion_skipped": results.get("motion_skipped", False),
+                "input_size": results["input_size"],
+                "model": results["model"]
             })
             
     except WebSocketDisconnect:
         # Cleanup on disconnect
         if client_id in active_connections:
             del active_connections[client_id]
-        if client_id in video_processors:
-            del video_processors[client_id]
+        live_sessions.close(client_id)
         if client_id in client_locks:
             del client_locks[client_id]
         if client_id in client_frame_counts:
@@ -155,7 +165,7 @@ def live_analysis_frame(input_data: FrameInput):
         image_b64 = input_data.image
         
         if not image_b64:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=400,
                 content={"detections": [], "error": "No image data received"}
             )
@@ -164,17 +174,18 @@ def live_analysis_frame(input_data: FrameInput):
             header, encoded = image_b64.split(",", 1) if "," in image_b64 else ("", image_b64)
             img_bytes = base64.b64decode(encoded)
             nparr = np.frombuffer(img_bytes, np.uint8)
+            import cv2
             frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
             
             if frame is None:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=400,
                     content={"detections": [], "error": "Invalid image data"}
                 )
 
         except Exception as e:
             logger.warning("Image decode error: %s", str(e))
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=400,
                 content={"detections": [], "error": f"Image decode error: {str(e)}"}
             )
@@ -188,7 +199,11 @@ def live_analysis_frame(input_data: FrameInput):
                     f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"live_analysis.py:live_analysis_frame","message":"Starting process_frame","timestamp":int(time.time()*1000)}) + "\n")
             except: pass
             # #endregion
-            results = video_processor.process_frame(frame)
+            session = live_sessions.get(input_data.client_id or DEFAULT_CLIENT_ID)
+            with session.lock:
+                results = session.process(frame)
+                session.frame_count += 1
+                frame_number = session.frame_count
             # #region agent log
             dt_proc = time.time() - t_proc
             dt_total = time.time() - t0
@@ -198,16 +213,20 @@ def live_analysis_frame(input_data: FrameInput):
             except: pass
             # #endregion
             
-            return JSONResponse(
+            return FastJSONResponse(
                 content={
                     "detections": results["detections"],
                     "suspicious_interactions": results.get("suspicious_interactions", []),
+                    "motion_skipped": results.get("motion_skipped", False),
+                    "input_size": results["input_size"],
+                    "model": results["model"],
+                    "frame_number": frame_number,
                     "timestamp": datetime.utcnow().isoformat()
                 }
             )
         except Exception as e:
             logger.exception("Model error: %s", str(e))
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=500,
                 content={"detections": [], "error": f"Model error: {str(e)}"}
             )
@@ -221,7 +240,7 @@ def live_analysis_frame(input_data: FrameInput):
         except: pass
         # #endregion
         logger.exception("General error: %s", str(e))
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={"detections": [], "error": f"General error: {str(e)}"}
         )
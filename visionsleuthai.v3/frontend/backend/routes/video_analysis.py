@@ -1,19 +1,31 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
-from typing import Dict, List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Dict, List, Optional, Tuple
 import uuid
-import cv2
+import hashlib
 from datetime import datetime
-from models.crime_detection_model import CrimeDetectionModel
+from models.model_registry import get_model
 from models.video_processor import VideoProcessor
-from utils.gcp_connector import GCPConnector
+from models.detections import CLASS_NAMES, Detections, frame_result_to_dict
+from models.video_pipeline import VideoPipeline
+from models.segment_analysis import SegmentedAnalyzer
+from utils.storage import get_storage
+from utils.responses import FastJSONResponse
+from utils.result_codec import dumps
+from utils.job_queue import JobQueue, JobCancelled, QueueFullError
+from utils.job_store import JobStore
+from utils.checkpoints import CheckpointStore
+from utils.job_events import TERMINAL_STATUSES, job_events
+from utils.video_decoder import CAP_PROP_FPS, CAP_PROP_FRAME_COUNT, DECODER_BACKENDS, DEFAULT_DECODER, open_video
+from utils.result_cache import analysis_cache_key
 import logging
 import numpy as np
 import time
-from utils.metrics import uploads_total, upload_failures_total, analysis_jobs_total, analysis_failures_total, analysis_duration_seconds, start_timer, observe_duration_seconds
+from utils.metrics import uploads_total, upload_failures_total, upload_cache_hits_total, analysis_jobs_total, analysis_failures_total, analysis_duration_seconds, pipeline_queue_depth, start_timer, observe_duration_seconds
 
 # Logging ayarları
 logging.basicConfig(
@@ -22,166 +34,565 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# GCP connector'ı başlat (opsiyonel)
-gcp = None
-try:
-    bucket_name = os.getenv('GCP_BUCKET_NAME')
-    if bucket_name:
-        gcp = GCPConnector(bucket_name=bucket_name)
-        logger.info(f"GCPConnector initialized with bucket: {bucket_name}")
-    else:
-        logger.warning("GCP_BUCKET_NAME not set - video upload will be disabled")
-except Exception as e:
-    logger.error(f"Failed to initialize GCPConnector: {str(e)}")
-    logger.warning("Video upload will be disabled")
+# Video ve sonuç depolaması (STORAGE_BACKEND: gcs veya local); created on
+# first use so the GCS client is not built while the app is importing
+_storage = None
+_storage_failed = False
+
+
+def get_storage_or_none():
+    """Configured storage backend, or None if it could not be initialised"""
+    global _storage, _storage_failed
+    if _storage is None and not _storage_failed:
+        try:
+            _storage = get_storage()
+        except Exception as e:
+            _storage_failed = True
+            logger.error(f"Failed to initialize storage backend: {str(e)}")
+            logger.warning("Video and result storage will be disabled")
+    return _storage
 
 router = APIRouter()
 UPLOAD_DIR = "uploads"
-analysis_tasks: Dict[str, Dict] = {}
+# Job status/progress/summary and per-frame results (SQLite, shared by workers)
+job_store = JobStore()
 ALLOWED_EXTENSIONS = {'.mp4', '.mov', '.avi'}
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+try:
+    FRAMES_PAGE_SIZE = max(1, int(os.getenv("FRAMES_PAGE_SIZE", "500")))
+except Exception:
+    FRAMES_PAGE_SIZE = 500
+try:
+    FRAMES_PAGE_MAX = max(FRAMES_PAGE_SIZE, int(os.getenv("FRAMES_PAGE_MAX", "5000")))
+except Exception:
+    FRAMES_PAGE_MAX = max(FRAMES_PAGE_SIZE, 5000)
+try:
+    UPLOAD_CHUNK_SIZE = max(64 * 1024, int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024))))
+except Exception:
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Analysis modes: "dense" runs every frame, "coarse_to_fine" runs every
+# COARSE_STRIDE-th frame and then re-analyses +/- REFINE_WINDOW frames
+# around alerts and dangerous classes, "segmented" runs every frame with
+# time segments analysed in parallel processes (see models.segment_analysis)
+ANALYSIS_MODES = ("dense", "coarse_to_fine", "segmented")
+DEFAULT_ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "dense")
+try:
+    COARSE_STRIDE = max(1, int(os.getenv("COARSE_STRIDE", "10")))
+except Exception:
+    COARSE_STRIDE = 10
+try:
+    REFINE_WINDOW = max(0, int(os.getenv("REFINE_WINDOW", str(COARSE_STRIDE))))
+except Exception:
+    REFINE_WINDOW = COARSE_STRIDE
+
+# Uploads whose content and analysis settings match an earlier job reuse it
+# (lookup and job creation are one transaction, see JobStore.create_unless_cached)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Progress stream: a keep-alive comment (and job store re-check) after this many idle seconds
+try:
+    EVENTS_KEEPALIVE_S = max(1.0, float(os.getenv("EVENTS_KEEPALIVE_S", "15")))
+except Exception:
+    EVENTS_KEEPALIVE_S = 15.0
+# Frames between two threat events of the same untracked class
+try:
+    THREAT_EVENT_GAP = max(1, int(os.getenv("THREAT_EVENT_GAP", "30")))
+except Exception:
+    THREAT_EVENT_GAP = 30
+
+# Dense-mode jobs save a resumable checkpoint every CHECKPOINT_INTERVAL frames (0 = off)
+checkpoints = CheckpointStore()
+try:
+    CHECKPOINT_INTERVAL = max(0, int(os.getenv("CHECKPOINT_INTERVAL", "500")))
+except Exception:
+    CHECKPOINT_INTERVAL = 500
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def process_video(video_id: str, video_path: str, gcp_path: str):
+# Comprehensive list of dangerous object categories
+DANGEROUS_OBJECT_CATEGORIES = [
+    'gun', 'pistol', 'rifle', 'firearm', 'weapon',
+    'knife', 'blade', 'dagger', 'sword', 'machete',
+    'scissors', 'hammer', 'axe', 'hatchet', 'crowbar',
+    'baseball_bat', 'bat', 'club', 'bottle', 'broken_bottle'
+]
+
+
+_dangerous_class_ids: Dict[int, bool] = {}
+
+
+def _is_dangerous_class(class_id: int) -> bool:
+    """Substring match of an interned class name against DANGEROUS_OBJECT_CATEGORIES (cached per id)"""
+    dangerous = _dangerous_class_ids.get(class_id)
+    if dangerous is None:
+        class_name = CLASS_NAMES.name(class_id).lower()
+        dangerous = any(category in class_name for category in DANGEROUS_OBJECT_CATEGORIES)
+        _dangerous_class_ids[class_id] = dangerous
+    return dangerous
+
+
+def _dangerous_mask(detections: Detections) -> np.ndarray:
+    if len(detections) == 0:
+        return np.zeros(0, dtype=bool)
+    unique_ids, inverse = np.unique(detections.class_id, return_inverse=True)
+    lut = np.array([_is_dangerous_class(c) for c in unique_ids.tolist()], dtype=bool)
+    mask = lut[inverse]
+    if detections.original_class_id is not None:
+        unique_ids, inverse = np.unique(detections.original_class_id, return_inverse=True)
+        mask |= np.array([_is_dangerous_class(c) for c in unique_ids.tolist()], dtype=bool)[inverse]
+    return mask
+
+
+def _as_detections(frame_result: Dict) -> Detections:
+    detections = frame_result.get("detections")
+    if isinstance(detections, Detections):
+        return detections
+    return Detections.from_dicts(detections or [])
+
+
+class FrameResultAggregator:
+    """
+    Incrementally collects frame results and the job-level statistics.
+
+    Frame results keep their columnar Detections; they are converted to dicts
+    only when flushed to the job store.
+    """
+
+    def __init__(self, job_id: Optional[str] = None, store: Optional[JobStore] = None):
+        self.job_id = job_id
+        self.store = store
+        self.frames: List[Dict] = []
+        self._unsaved: List[Dict] = []
+        self.detection_count = 0
+        self.confidence_sum = 0.0
+        self.dangerous_objects_count = 0
+        self.high_risk_frames_count = 0
+        self.detected_dangerous_types = set()  # Track what types were detected
+        self.detected_classes = set()
+
+    def add(self, frame_result: Dict) -> None:
+        if not isinstance(frame_result, dict):
+            logger.warning(f"Skipping non-dict frame result: {type(frame_result)} - {frame_result}")
+            return
+        self.frames.append(frame_result)
+        self._unsaved.append(frame_result)
+
+        detections = _as_detections(frame_result)
+        if len(detections) == 0:
+            return
+        self.detection_count += len(detections)
+        self.confidence_sum += float(detections.confidence.sum(dtype=np.float64))
+        self.detected_classes.update(CLASS_NAMES.name(c) for c in np.unique(detections.class_id).tolist())
+
+        # Check both mapped class_name and original_class
+        dangerous = _dangerous_mask(detections)
+        for i in np.flatnonzero(dangerous).tolist():
+            class_name = detections.class_name(i).lower()
+            self.dangerous_objects_count += 1
+            self.detected_dangerous_types.add(class_name)
+            logger.info(f"Dangerous object detected: {class_name} (confidence: {float(detections.confidence[i]):.3f})")
+
+        if detections.risk_score is not None:
+            self.high_risk_frames_count += int(np.count_nonzero(detections.risk_score >= 0.8))
+
+    def mark_saved(self) -> None:
+        """Frames added so far are already in the job store (e.g. restored from a checkpoint)"""
+        self._unsaved = []
+
+    def flush(self) -> None:
+        """Write frame results added since the last flush to the job store"""
+        if self.store is not None and self._unsaved:
+            self.store.add_frames(self.job_id, ((r.get("frame_index", 0), frame_result_to_dict(r)) for r in self._unsaved))
+        self._unsaved = []
+
+    @property
+    def average_confidence(self) -> float:
+        return self.confidence_sum / self.detection_count if self.detection_count else 0.0
+
+
+class ThreatEventFeed:
+    """
+    Collects threat events for the progress stream: the first sighting of
+    each dangerous object track and of each ThreatAnalyzer alert. Untracked
+    detections of a class are reported at most once every THREAT_EVENT_GAP
+    frames.
+    """
+
+    def __init__(self, untracked_gap: Optional[int] = None):
+        self.untracked_gap = untracked_gap or THREAT_EVENT_GAP
+        self._seen = set()
+        self._last_untracked: Dict[Tuple[str, str], int] = {}
+        self._pending: List[Dict] = []
+
+    def observe(self, frame_result: Dict) -> None:
+        detections = _as_detections(frame_result)
+        if len(detections) == 0:
+            return
+        frame_index = int(frame_result.get("frame_index", 0))
+        annotations = detections.annotations or {}
+        alert_rows = {i for i, a in annotations.items() if a.get("alert_level") in ("WARNING", "CRITICAL")}
+        rows = set(np.flatnonzero(_dangerous_mask(detections)).tolist()) | alert_rows
+        for i in sorted(rows):
+            class_name = detections.class_name(i)
+            track_id = int(detections.track_id[i])
+            alert_level = annotations.get(i, {}).get("alert_level")
+            kind = alert_level or "dangerous_object"
+            if track_id >= 0:
+                key = (kind, class_name, track_id)
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+            else:
+                last = self._last_untracked.get((kind, class_name))
+                if last is not None and frame_index - last < self.untracked_gap:
+                    continue
+                self._last_untracked[(kind, class_name)] = frame_index
+            event = {
+                "frame_index": frame_index,
+                "timestamp": frame_result.get("timestamp"),
+                "class_name": class_name,
+                "confidence": round(float(detections.confidence[i]), 4),
+                "track_id": track_id if track_id >= 0 else None,
+                "bbox": [round(v, 1) for v in detections.xyxy[i].tolist()],
+            }
+            if alert_level:
+                event["alert_level"] = alert_level
+            self._pending.append(event)
+
+    def take(self) -> List[Dict]:
+        """Events observed since the last call"""
+        events, self._pending = self._pending, []
+        return events
+
+
+def _is_hot_frame(frame_result: Dict) -> bool:
+    """A frame worth a dense look: ThreatAnalyzer alert or a dangerous class"""
+    detections = _as_detections(frame_result)
+    for annotation in (detections.annotations or {}).values():
+        if annotation.get("alert_level") in ("WARNING", "CRITICAL"):
+            return True
+    return bool(_dangerous_mask(detections).any())
+
+
+def _refine_windows(hot_frames: List[int], radius: int, total_frames: int) -> List[Tuple[int, int]]:
+    """Merge [frame - radius, frame + radius] around every hot frame into sorted ranges"""
+    windows: List[Tuple[int, int]] = []
+    last_frame = total_frames - 1 if total_frames > 0 else None
+    for frame_index in sorted(hot_frames):
+        start = max(0, frame_index - radius)
+        end = frame_index + radius if last_frame is None else min(last_frame, frame_index + radius)
+        if windows and start <= windows[-1][1] + 1:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def _report_progress(report: Callable[[Dict], None], processed: int, progress: int, pipeline: VideoPipeline, **extra) -> None:
+    stats = pipeline.stats()
+    for queue_name, q in stats["queues"].items():
+        pipeline_queue_depth.labels(queue=queue_name).set(q["depth"])
+    report({
+        "processed_frames": processed,
+        "progress": progress,
+        "pipeline": stats,
+        **extra
+    })
+
+
+# Job fields forwarded to progress stream subscribers
+PROGRESS_EVENT_FIELDS = ("status", "progress", "processed_frames", "total_frames", "analysis_pass",
+                         "segments_done", "resumed_from_frame", "retries", "error")
+
+
+def _apply_job_update(video_id: str, fields: Dict) -> None:
+    """
+    Merge a status/progress update (from a worker or inline) into the job
+    store and publish it to the job's progress stream. threat_events are
+    streamed only, never stored on the job record.
+    """
+    task = job_store.get(video_id)
+    if task is None:
+        return
+    # A cancelled job stays cancelled even if a late progress message arrives
+    if task.get("status") == "cancelled" and fields.get("status") != "cancelled":
+        return
+    threat_events = fields.get("threat_events") or []
+    fields = {k: v for k, v in fields.items() if k != "threat_events"}
+    status = fields.get("status")
+    if status == "failed":
+        analysis_failures_total.inc()
+    elif status == "completed" and fields.get("duration_seconds") is not None:
+        analysis_duration_seconds.observe(fields["duration_seconds"])
+    if fields:
+        job_store.update(video_id, fields)
+
+    for event in threat_events:
+        job_events.publish(video_id, {"event": "threat", "data": event})
+    progress = {k: fields[k] for k in PROGRESS_EVENT_FIELDS if k in fields}
+    if progress:
+        job_events.publish(video_id, {"event": "progress", "data": progress})
+
+
+def _restore_checkpoint(video_id: str, total_frames: int, decoder: str, processor: VideoProcessor, aggregator: FrameResultAggregator) -> int:
+    """
+    Load a dense-mode checkpoint of video_id into processor and aggregator;
+    returns the frame to continue from (0 when there is nothing to resume).
+    """
+    checkpoint = checkpoints.load(video_id)
+    if checkpoint is None:
+        return 0
+    if (checkpoint.get("analysis_mode") != "dense" or checkpoint.get("total_frames") != total_frames
+            or checkpoint.get("decoder", "opencv") != decoder):
+        logger.warning(f"Discarding checkpoint of {video_id} that does not match this run")
+        checkpoints.delete(video_id)
+        return 0
+    next_frame = int(checkpoint["next_frame"])
+    _, frames = job_store.query_frames(video_id, to_frame=next_frame - 1)
+    if len(frames) != next_frame:
+        logger.warning(f"Checkpoint of {video_id} expects {next_frame} stored frames, found {len(frames)}; starting over")
+        checkpoints.delete(video_id)
+        return 0
+    for frame_result in frames:
+        aggregator.add(frame_result)
+    aggregator.mark_saved()
+    processor.import_state(checkpoint["inference_state"], checkpoint.get("last_detections"))
+    logger.info(f"Resuming analysis of {video_id} at frame {next_frame}/{total_frames}")
+    return next_frame
+
+
+def process_video(
+    video_id: str,
+    video_path: str,
+    gcp_path: str,
+    analysis_mode: Optional[str] = None,
+    processor: Optional[VideoProcessor] = None,
+    report: Optional[Callable[[Dict], None]] = None,
+    cancel_event=None,
+    evidence_hash: Optional[str] = None,
+    decoder: Optional[str] = None
+):
+    """
+    Analyse an uploaded video and publish progress/results through report.
+
+    Args:
+        processor: Pre-loaded VideoProcessor to reuse (a new one is built if None)
+        report: Receives dicts of task fields (defaults to updating the job store)
+        cancel_event: threading/multiprocessing Event; setting it aborts the job
+        evidence_hash: SHA-256 hex digest of the video (hashed here if None)
+        decoder: Decoder backend, one of DECODER_BACKENDS (default DECODER_BACKEND)
+    """
+    if report is None:
+        report = lambda fields: _apply_job_update(video_id, fields)
     try:
-        logger.info(f"Starting video processing for {video_id}")
+        analysis_mode = analysis_mode or DEFAULT_ANALYSIS_MODE
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode: {analysis_mode}")
+        logger.info(f"Starting video processing for {video_id} (mode={analysis_mode})")
         
-        # Initialize model and processor
-        model = CrimeDetectionModel()
-        processor = VideoProcessor(model)
+        # Initialize model and processor (workers pass a loaded one)
+        if processor is None:
+            processor = VideoProcessor(get_model())
+        else:
+            processor.reset()
+        model = processor.model
         
         # Open video file
-        cap = cv2.VideoCapture(video_path)
+        decoder = decoder or DEFAULT_DECODER
+        cap = open_video(video_path, decoder)
         if not cap.isOpened():
             raise Exception("Could not open video file")
+        # open_video falls back to OpenCV when ffmpeg is missing
+        decoder = getattr(cap, "backend", "opencv")
         
         # Video özelliklerini al
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(CAP_PROP_FRAME_COUNT))
+        fps = cap.get(CAP_PROP_FPS)
         duration = total_frames / fps if fps > 0 else 0
         video_format = os.path.splitext(video_path)[1][1:].upper()
         
-        logger.info(f"Video info: {total_frames} frames, {fps} fps, {duration:.2f}s duration")
+        logger.info(f"Video info: {total_frames} frames, {fps} fps, {duration:.2f}s duration (decoder={decoder})")
         
-        results = []
-        processed_frames = 0
+        # Frame results are written to the job store's side table as they arrive
+        aggregator = FrameResultAggregator(video_id, job_store)
+        # New dangerous objects / alerts, pushed with each progress update
+        threat_feed = ThreatEventFeed()
         t_job = start_timer()
         
         # Update task status to processing with initial info
-        if video_id in analysis_tasks:
-            analysis_tasks[video_id].update({
-                "status": "processing",
-                "total_frames": total_frames,
-                "processed_frames": 0,
-                "progress": 0
-            })
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Process frame
-            frame_results = processor.process_frame(frame)
-            results.append(frame_results)
-            processed_frames += 1
-            
-            # Update progress every 5 frames for more frequent updates
-            if processed_frames % 5 == 0:
-                progress = int((processed_frames / total_frames) * 100) if total_frames > 0 else 0
-                if video_id in analysis_tasks:
-                    analysis_tasks[video_id].update({
-                        "processed_frames": processed_frames,
-                        "progress": progress
-                    })
-                logger.info(f"Processed {processed_frames}/{total_frames} frames ({progress}%)")
-            
-        cap.release()
+        report({
+            "status": "processing",
+            "analysis_mode": analysis_mode,
+            "total_frames": total_frames,
+            "processed_frames": 0,
+            "progress": 0
+        })
+
+        # Decode, inference and aggregation run as overlapping pipeline stages;
+        # frames reach the model in batches of INFERENCE_BATCH_SIZE
+        batch_size = model.batch_size
+        try:
+            if analysis_mode == "coarse_to_fine":
+                # Pass 1: sparse stride over the whole video
+                frame_results: Dict[int, Dict] = {}
+                coarse = None
+
+                def on_coarse_result(frame_index: int, frame_result: Dict) -> None:
+                    frame_result["frame_index"] = frame_index
+                    frame_result["analysis_pass"] = "coarse"
+                    frame_results[frame_index] = frame_result
+                    threat_feed.observe(frame_result)
+                    if len(frame_results) % batch_size == 0:
+                        progress = int((frame_index / total_frames) * 50) if total_frames > 0 else 0
+                        _report_progress(report, len(frame_results), progress, coarse, analysis_pass="coarse",
+                                         threat_events=threat_feed.take())
+
+                coarse = VideoPipeline(processor, batch_size=batch_size, on_result=on_coarse_result, stop_event=cancel_event)
+                coarse_frames = coarse.run(cap, stride=COARSE_STRIDE)
+
+                # Pass 2: dense re-analysis around alerts and dangerous classes only
+                hot_frames = [i for i, r in frame_results.items() if _is_hot_frame(r)]
+                dense_windows = _refine_windows(hot_frames, REFINE_WINDOW, total_frames)
+                dense_total = sum(end - start + 1 for start, end in dense_windows)
+                logger.info(f"Coarse pass: {coarse_frames} frames, {len(hot_frames)} hot, {len(dense_windows)} windows ({dense_total} frames) to refine")
+                dense = None
+                dense_done = [0]
+
+                def on_dense_result(frame_index: int, frame_result: Dict) -> None:
+                    frame_result["frame_index"] = frame_index
+                    frame_result["analysis_pass"] = "dense"
+                    frame_results[frame_index] = frame_result
+                    threat_feed.observe(frame_result)
+                    dense_done[0] += 1
+                    if dense_done[0] % batch_size == 0:
+                        progress = 50 + int((dense_done[0] / dense_total) * 50)
+                        _report_progress(report, len(frame_results), progress, dense, analysis_pass="dense",
+                                         threat_events=threat_feed.take())
+
+                dense = VideoPipeline(processor, batch_size=batch_size, on_result=on_dense_result, stop_event=cancel_event)
+                dense_frames = dense.run(cap, windows=dense_windows) if dense_windows else 0
+
+                for frame_index in sorted(frame_results):
+                    aggregator.add(frame_results[frame_index])
+                # The dense pass re-analyses the stride frames inside its windows; count each frame once
+                processed_frames = len(frame_results)
+                pipeline_stats = {
+                    "coarse": {**coarse.stats(), "frames": coarse_frames},
+                    "dense": {**dense.stats(), "frames": dense_frames},
+                }
+            elif analysis_mode == "segmented":
+                analyzer = SegmentedAnalyzer()
+
+                def on_segment_done(done_frames: int, done_segments: int) -> None:
+                    progress = int((done_frames / total_frames) * 100) if total_frames > 0 else 0
+                    report({"processed_frames": done_frames, "progress": min(99, progress), "segments_done": done_segments})
+
+                frame_results, pipeline_stats = analyzer.run(
+                    video_path, total_frames, batch_size, on_progress=on_segment_done, cancel_event=cancel_event,
+                    decoder=decoder
+                )
+                for frame_index, frame_result in frame_results:
+                    frame_result["frame_index"] = frame_index
+                    aggregator.add(frame_result)
+                    threat_feed.observe(frame_result)
+                    if len(aggregator.frames) % batch_size == 0:
+                        aggregator.flush()
+                processed_frames = len(frame_results)
+                # Counted in the segment workers, not in this processor
+                processor.frames_skipped = sum(seg["frames_skipped"] for seg in pipeline_stats["segments"])
+                processor.frames_inferred = sum(seg["frames_inferred"] for seg in pipeline_stats["segments"])
+                dense_windows = [(0, processed_frames - 1)] if processed_frames else []
+            else:
+                pipeline = None
+                start_frame = _restore_checkpoint(video_id, total_frames, decoder, processor, aggregator)
+                if start_frame:
+                    report({"processed_frames": start_frame, "resumed_from_frame": start_frame})
+                # Tracker snapshots taken in the inference thread, keyed by the
+                # last frame of their batch; saved once that frame is aggregated
+                pending_snapshots: Dict[int, Dict] = {}
+                last_snapshot = [start_frame]
+
+                def on_batch(last_index: int) -> None:
+                    if CHECKPOINT_INTERVAL <= 0 or last_index + 1 - last_snapshot[0] < CHECKPOINT_INTERVAL:
+                        return
+                    last_snapshot[0] = last_index + 1
+                    try:
+                        pending_snapshots[last_index] = processor.export_inference_state()
+                    except Exception as e:
+                        logger.error(f"Tracker snapshot failed, checkpoints disabled for {video_id}: {str(e)}")
+                        last_snapshot[0] = float("inf")
+
+                def on_result(frame_index: int, frame_result: Dict) -> None:
+                    frame_result["frame_index"] = frame_index
+                    aggregator.add(frame_result)
+                    threat_feed.observe(frame_result)
+                    processed = len(aggregator.frames)
+                    snapshot = pending_snapshots.pop(frame_index, None)
+                    if snapshot is not None:
+                        # Frames up to frame_index are in the store before the checkpoint points past them
+                        aggregator.flush()
+                        checkpoints.save(video_id, {
+                            "analysis_mode": "dense",
+                            "decoder": decoder,
+                            "total_frames": total_frames,
+                            "next_frame": frame_index + 1,
+                            "inference_state": snapshot,
+                            "last_detections": processor._last_detections,
+                        })
+                    # Update progress after every batch
+                    if processed % batch_size == 0:
+                        aggregator.flush()
+                        progress = int((processed / total_frames) * 100) if total_frames > 0 else 0
+                        _report_progress(report, processed, progress, pipeline, threat_events=threat_feed.take())
+                        logger.info(f"Processed {processed}/{total_frames} frames ({progress}%)")
+
+                pipeline = VideoPipeline(processor, batch_size=batch_size, on_result=on_result,
+                                         stop_event=cancel_event, on_batch=on_batch)
+                pipeline.run(cap, start_frame=start_frame)
+                processed_frames = len(aggregator.frames)
+                dense_windows = [(0, processed_frames - 1)] if processed_frames else []
+                pipeline_stats = pipeline.stats()
+                if start_frame:
+                    pipeline_stats["resumed_from_frame"] = start_frame
+        finally:
+            cap.release()
+        aggregator.flush()
+        remaining_threats = threat_feed.take()
+        if remaining_threats:
+            report({"threat_events": remaining_threats})
+        if cancel_event is not None and cancel_event.is_set():
+            raise JobCancelled(f"Analysis of {video_id} was cancelled")
         logger.info(f"Video processing completed: {processed_frames} frames processed")
+        logger.info(f"Pipeline stats: {pipeline_stats}")
         
         # Performans metriklerini hesapla
         job_seconds = observe_duration_seconds(t_job)
-        analysis_duration_seconds.observe(job_seconds)
         inference_time = (job_seconds * 1000) / processed_frames if processed_frames > 0 else 0.0  # ms per frame
         
-        # Clean results first to ensure all elements are dictionaries
-        cleaned_results = []
-        for frame_result in results:
-            if isinstance(frame_result, dict):
-                cleaned_results.append(frame_result)
-            else:
-                logger.warning(f"Skipping non-dict frame result: {type(frame_result)} - {frame_result}")
-        
-        # Calculate average confidence from all detections in all frames
-        all_detections = []
-        for frame_result in cleaned_results:
-            if isinstance(frame_result, dict) and "detections" in frame_result:
-                for detection in frame_result["detections"]:
-                    if isinstance(detection, dict):
-                        all_detections.append(detection)
-                    else:
-                        logger.warning(f"Skipping non-dict detection: {type(detection)} - {detection}")
-        
-        avg_confidence = 0.0
-        if all_detections:
-            avg_confidence = sum(d.get("confidence", 0) for d in all_detections) / len(all_detections)
-        
-        # Count dangerous objects and high risk frames
-        # Comprehensive list of dangerous object categories
-        dangerous_object_categories = [
-            'gun', 'pistol', 'rifle', 'firearm', 'weapon',
-            'knife', 'blade', 'dagger', 'sword', 'machete',
-            'scissors', 'hammer', 'axe', 'hatchet', 'crowbar',
-            'baseball_bat', 'bat', 'club', 'bottle', 'broken_bottle'
-        ]
-        
-        dangerous_objects_count = 0
-        high_risk_frames_count = 0
-        detected_dangerous_types = set()  # Track what types were detected
-        
-        for frame_result in cleaned_results:
-            if isinstance(frame_result, dict) and "detections" in frame_result:
-                for detection in frame_result["detections"]:
-                    if isinstance(detection, dict):
-                        class_name = detection.get("class_name", "").lower()
-                        original_class = detection.get("original_class", "").lower()
-                        confidence = detection.get("confidence", 0.0)
-                        
-                        # Check both mapped class_name and original_class
-                        is_dangerous = (
-                            any(dangerous in class_name for dangerous in dangerous_object_categories) or
-                            any(dangerous in original_class for dangerous in dangerous_object_categories)
-                        )
-                        
-                        if is_dangerous:
-                            dangerous_objects_count += 1
-                            detected_dangerous_types.add(class_name)
-                            logger.info(f"Dangerous object detected: {class_name} (original: {original_class}, confidence: {confidence:.3f})")
-                        
-                        if detection.get("risk_score", 0) >= 0.8:
-                            high_risk_frames_count += 1
+        cleaned_results = aggregator.frames
+        avg_confidence = aggregator.average_confidence
+        dangerous_objects_count = aggregator.dangerous_objects_count
+        high_risk_frames_count = aggregator.high_risk_frames_count
         
         # Log summary
         if dangerous_objects_count > 0:
             logger.info(f"Total dangerous objects detected: {dangerous_objects_count}")
-            logger.info(f"Dangerous object types found: {', '.join(sorted(detected_dangerous_types))}")
+            logger.info(f"Dangerous object types found: {', '.join(sorted(aggregator.detected_dangerous_types))}")
         else:
-            logger.warning(f"No dangerous objects detected in video. Total detections: {len(all_detections)}")
-            if all_detections:
-                detected_classes = set(d.get("class_name", "unknown") for d in all_detections)
-                logger.info(f"Detected classes: {', '.join(sorted(detected_classes))}")
+            logger.warning(f"No dangerous objects detected in video. Total detections: {aggregator.detection_count}")
+            if aggregator.detected_classes:
+                logger.info(f"Detected classes: {', '.join(sorted(aggregator.detected_classes))}")
         
         # Adli bilimlere uygun sonuçları hazırla
         try:
             logger.info(f"Creating analysis_data with {len(cleaned_results)} cleaned results")
             # Create analysis_data step by step
             logger.info("Creating forensic_metadata...")
-            # Create a simple hash using video_id and timestamp
-            import hashlib
-            hash_input = f"{video_id}_{datetime.utcnow().isoformat()}"
-            evidence_hash = hashlib.sha256(hash_input.encode()).hexdigest()[:16]
+            # SHA-256 of the uploaded file, computed while it was streamed to disk
+            if evidence_hash is None:
+                evidence_hash = _file_sha256(video_path)
             
             forensic_metadata = {
                 "case_id": video_id,
@@ -209,13 +620,21 @@ def process_video(video_id: str, video_path: str, gcp_path: str):
                 "frames_processed": processed_frames,
                 "average_confidence": avg_confidence,
                 "model_version": "YOLOv8x",
-                "processing_efficiency": (processed_frames / total_frames * 100) if total_frames > 0 else 0
+                "processing_efficiency": (processed_frames / total_frames * 100) if total_frames > 0 else 0,
+                "motion_skipped_frames": processor.frames_skipped,
+                "motion_gate": processor.get_gate_stats(),
+                "analysis_mode": analysis_mode,
+                "coarse_stride": COARSE_STRIDE if analysis_mode == "coarse_to_fine" else 1,
+                "decoder": decoder,
+                "pipeline": pipeline_stats
             }
             
             logger.info("Creating forensic_analysis...")
             forensic_analysis = {
                 "dangerous_objects_detected": dangerous_objects_count,
                 "high_risk_frames": high_risk_frames_count,
+                # Inclusive [start, end] frame ranges that were analysed frame by frame
+                "densely_analysed_frames": [[start, end] for start, end in dense_windows],
                 "evidence_quality": "HIGH" if processed_frames / total_frames > 0.9 else "MEDIUM",
                 "legal_compliance": {
                     "privacy_protection": "ENABLED",
@@ -236,34 +655,39 @@ def process_video(video_id: str, video_path: str, gcp_path: str):
             }
         except Exception as e:
             logger.error(f"Error creating analysis_data: {str(e)}")
-            logger.error(f"Results type: {type(results)}, length: {len(results) if hasattr(results, '__len__') else 'N/A'}")
-            if results and len(results) > 0:
-                logger.error(f"First result type: {type(results[0])}, content: {results[0]}")
+            logger.error(f"Results type: {type(cleaned_results)}, length: {len(cleaned_results)}")
+            if cleaned_results:
+                logger.error(f"First result type: {type(cleaned_results[0])}, content: {cleaned_results[0]}")
             raise e
         
-        # Save results to GCP (if available)
+        # Save results to the storage backend (if available)
         results_path = None
-        if gcp:
-            results_path = gcp.save_results(video_id, analysis_data)
+        storage = get_storage_or_none()
+        if storage:
+            # Detections are converted frame by frame while the document is encoded
+            results_path = storage.save_results(video_id, analysis_data)
         else:
-            logger.warning("GCP not available - results not saved to cloud")
+            logger.warning("Storage not available - results not saved")
         
         # Update task status
         try:
-            analysis_tasks[video_id].update({
+            report({
                 "status": "completed",
+                "duration_seconds": job_seconds,
                 "results_path": results_path,
                 "summary": analysis_data["summary"],
                 "model_performance": analysis_data["model_performance"],
                 "forensic_metadata": analysis_data["forensic_metadata"],
-                "frames": analysis_data["frames"],
                 "forensic_analysis": analysis_data["forensic_analysis"],
-                "analysis_data": analysis_data  # Store complete analysis data
+                "video_path": gcp_path,
+                "analysis_timestamp": analysis_data["timestamp"],
+                # Frames stay in the store's side table and are loaded on request
+                "frame_count": len(cleaned_results)
             })
             logger.info(f"Analysis completed successfully for video {video_id}")
         except Exception as e:
             logger.error(f"Error updating task status: {str(e)}")
-            analysis_tasks[video_id].update({
+            report({
                 "status": "failed",
                 "error": f"Error updating task status: {str(e)}"
             })
@@ -271,19 +695,151 @@ def process_video(video_id: str, video_path: str, gcp_path: str):
         
         # Cleanup local file
         os.remove(video_path)
+        checkpoints.delete(video_id)
         
+    except JobCancelled:
+        logger.info(f"Analysis cancelled for video {video_id}")
+        report({"status": "cancelled"})
+        if os.path.exists(video_path):
+            os.remove(video_path)
+        checkpoints.delete(video_id)
     except Exception as e:
-        analysis_failures_total.inc()
-        analysis_tasks[video_id]["status"] = "failed"
-        analysis_tasks[video_id]["error"] = str(e)
+        report({"status": "failed", "error": str(e)})
         if os.path.exists(video_path):
             os.remove(video_path)
+        checkpoints.delete(video_id)
+
+
+def _init_analysis_worker() -> VideoProcessor:
+    """Runs once in every analysis worker process: load the model and keep it"""
+    return VideoProcessor(get_model())
+
+
+def _run_analysis_job(processor, video_id, video_path, gcp_path, analysis_mode, evidence_hash=None, decoder=None,
+                      report=None, cancel_event=None):
+    """Worker-side job entry point (see utils.job_queue.JobQueue)"""
+    process_video(video_id, video_path, gcp_path, analysis_mode,
+                  processor=processor, report=report, cancel_event=cancel_event,
+                  evidence_hash=evidence_hash, decoder=decoder)
+
+
+# Analysis jobs run in a pool of worker processes (started on first upload)
+job_queue = JobQueue(
+    job_fn=_run_analysis_job,
+    init_fn=_init_analysis_worker,
+    on_update=_apply_job_update
+)
+
+
+def resume_interrupted_jobs() -> int:
+    """
+    Re-queue jobs that were queued or running when the API last stopped.
+
+    Jobs whose upload is still on disk are submitted again (dense jobs pick up
+    from their checkpoint); the rest are marked failed. Disabled with
+    RESUME_JOBS_ON_STARTUP=false. Returns the number of re-queued jobs.
+    """
+    if os.getenv("RESUME_JOBS_ON_STARTUP", "true").lower() not in ("1", "true", "yes"):
+        return 0
+    resumed = 0
+    for video_id in job_store.list_ids(("queued", "processing")):
+        task = job_store.get(video_id) or {}
+        local_path = task.get("local_path")
+        if not local_path or not os.path.exists(local_path):
+            job_store.update(video_id, {"status": "failed", "error": "Uploaded video missing after restart"})
+            checkpoints.delete(video_id)
+            continue
+        try:
+            job_queue.submit(
+                video_id,
+                (local_path, task.get("video_path") or local_path, task.get("analysis_mode"), task.get("sha256"),
+                 task.get("decoder")),
+                priority=task.get("priority") or 0
+            )
+        except QueueFullError as qe:
+            job_store.update(video_id, {"status": "failed", "error": str(qe)})
+            continue
+        job_store.update(video_id, {"status": "queued"})
+        resumed += 1
+    if resumed:
+        logger.info(f"Re-queued {resumed} interrupted analysis job(s)")
+    return resumed
+
+async def _stream_upload_to_disk(video: UploadFile, dest_path: str) -> Tuple[int, str]:
+    """
+    Copy an upload to dest_path in UPLOAD_CHUNK_SIZE chunks.
+
+    Enforces MAX_FILE_SIZE while streaming and hashes the content in the same
+    pass. Returns (size_in_bytes, sha256_hex); the partial file is removed on
+    any error.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as buffer:
+            while True:
+                chunk = await video.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail="File too large. Maximum size is 500MB"
+                    )
+                sha256.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return size, sha256.hexdigest()
+
+
+def _file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _reused_job_response(task: Dict, t0: float) -> FastJSONResponse:
+    """Upload response pointing at an existing job with the same cache key"""
+    video_id = task["id"]
+    completed = task["status"] == "completed"
+    upload_cache_hits_total.labels(kind="completed" if completed else "in_flight").inc()
+    logger.info(f"Upload matches job {video_id} ({task['status']}), reusing it")
+    process_time = observe_duration_seconds(t0)
+    response = {
+        "status": "success",
+        "id": video_id,
+        "message": "Identical video already analysed, returning the cached result" if completed
+                   else "Identical video is already being analysed, attached to the running job",
+        "cached": completed,
+        "analysis_status": task["status"],
+        "process_time": process_time
+    }
+    if task["status"] == "queued":
+        response["queue_position"] = job_queue.position(video_id)
+    return FastJSONResponse(response)
+
 
 @router.post("/video/upload")
 async def upload_video(
-    background_tasks: BackgroundTasks,
-    video: UploadFile = File(...)
+    video: UploadFile = File(...),
+    analysis_mode: Optional[str] = Form(None),
+    priority: int = Form(0),
+    decoder: Optional[str] = Form(None),
+    force: bool = Form(False)
 ):
+    """
+    Store an uploaded video and queue its analysis.
+
+    An upload with the same content and analysis settings as an earlier job
+    returns that job instead (its result if completed, otherwise the running
+    job to follow); force=true always starts a new analysis.
+    """
     uploads_total.inc()
     t0 = start_timer()
     temp_path = None
@@ -296,66 +852,101 @@ async def upload_video(
                 status_code=400,
                 detail=f"Invalid file type. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
             )
-
-        # Dosya boyutu kontrolü
-        content = await video.read()
-        if len(content) > MAX_FILE_SIZE:
+        if analysis_mode is not None and analysis_mode not in ANALYSIS_MODES:
             raise HTTPException(
-                status_code=413,
-                detail="File too large. Maximum size is 500MB"
+                status_code=400,
+                detail=f"Invalid analysis mode. Allowed modes: {', '.join(ANALYSIS_MODES)}"
+            )
+        if decoder is not None and decoder not in DECODER_BACKENDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid decoder. Allowed decoders: {', '.join(DECODER_BACKENDS)}"
             )
 
         # Video işleme
         video_id = str(uuid.uuid4())
         temp_path = os.path.join(UPLOAD_DIR, f"{video_id}{file_ext}")
+
+        # Diske parça parça yaz; boyut kontrolü ve SHA-256 aynı geçişte
+        file_size, content_sha256 = await _stream_upload_to_disk(video, temp_path)
+        logger.info(f"Video saved temporarily: {temp_path} ({file_size} bytes, sha256={content_sha256})")
+
+        analysis_mode = analysis_mode or DEFAULT_ANALYSIS_MODE
+        decoder = decoder or DEFAULT_DECODER
+        cache_key = analysis_cache_key(content_sha256, analysis_mode, decoder)
+        # Created before the (slow) storage upload so identical uploads arriving meanwhile attach to it
+        job_fields = {
+            "status": "queued",
+            "timestamp": datetime.utcnow().isoformat(),
+            "video_path": temp_path,
+            "local_path": temp_path,
+            "sha256": content_sha256,
+            "cache_key": cache_key,
+            "file_size": file_size,
+            "priority": priority,
+            "results_path": None,
+            "error": None,
+            "summary": None,
+            "model_performance": None,
+            "analysis_mode": analysis_mode,
+            "decoder": decoder
+        }
+        existing = None
+        if RESULT_CACHE_ENABLED and not force:
+            existing = await run_in_threadpool(
+                job_store.create_unless_cached, video_id, job_fields, ("completed", "queued", "processing")
+            )
+        else:
+            await run_in_threadpool(job_store.create, video_id, job_fields)
+        if existing is not None:
+            os.remove(temp_path)
+            return _reused_job_response(existing, t0)
         
         try:
-            # Geçici dosyaya kaydet
-            with open(temp_path, "wb") as buffer:
-                buffer.write(content)
-            
-            logger.info(f"Video saved temporarily: {temp_path}")
             
-            # GCP'ye yükleme (if available) veya local path kullan
+            # Depolama backend'ine yükleme (if available) veya local path kullan
             gcp_path = temp_path  # Default to local path
-            if gcp:
+            storage = get_storage_or_none()
+            if storage:
                 try:
-                    gcp_path = gcp.upload_video(temp_path)
-                    logger.info(f"Video uploaded to GCP: {gcp_path}")
-                except Exception as gcp_error:
-                    logger.warning(f"GCP upload failed, using local path: {str(gcp_error)}")
+                    gcp_path = storage.upload_video(temp_path)
+                except Exception as storage_error:
+                    logger.warning(f"Video upload to {storage.name} storage failed, using local path: {str(storage_error)}")
                     gcp_path = temp_path
             else:
                 logger.info(f"Using local path for video: {gcp_path}")
+            if gcp_path != temp_path:
+                job_store.update(video_id, {"video_path": gcp_path})
             
-            # Analiz task'ını başlat
-            analysis_tasks[video_id] = {
-                "status": "processing",
-                "timestamp": datetime.utcnow().isoformat(),
-                "video_path": gcp_path,
-                "results_path": None,
-                "error": None,
-                "summary": None,
-                "model_performance": None
-            }
-            
-            # Background task'ı başlat
+            # Job kuyruğuna ekle
+            try:
+                queue_position = job_queue.submit(video_id, (temp_path, gcp_path, analysis_mode, content_sha256, decoder), priority=priority)
+            except QueueFullError as qe:
+                job_store.delete(video_id)
+                raise HTTPException(status_code=503, detail=str(qe))
             analysis_jobs_total.inc()
-            background_tasks.add_task(process_video, video_id, temp_path, gcp_path)
             
             process_time = observe_duration_seconds(t0)
             logger.info(f"Upload completed in {process_time:.2f} seconds")
             
-            return JSONResponse({
+            return FastJSONResponse({
                 "status": "success",
                 "id": video_id,
-                "message": "Video upload successful, analysis started",
+                "message": "Video upload successful, analysis queued",
+                "queue_position": queue_position,
                 "process_time": process_time
             })
                 
+        except HTTPException:
+            upload_failures_total.inc()
+            job_store.delete(video_id)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         except Exception as e:
             logger.error(f"Error processing video: {str(e)}")
             upload_failures_total.inc()
+            job_store.delete(video_id)
             if temp_path and os.path.exists(temp_path):
                 os.remove(temp_path)
             raise HTTPException(
@@ -376,17 +967,29 @@ async def upload_video(
         )
 
 @router.get("/video/analysis/{video_id}")
-async def get_analysis_results(video_id: str):
+def get_analysis_results(video_id: str, include_frames: bool = False):
+    """
+    Job status and summary. Per-frame results are left out unless
+    include_frames=true; use /video/analysis/{video_id}/frames to page them.
+    Plain def: the job store calls block, so FastAPI runs this in its threadpool.
+    """
     try:
         # Check if task exists
-        if video_id not in analysis_tasks:
+        task = job_store.get(video_id)
+        if task is None:
             raise HTTPException(status_code=404, detail="Video analysis not found")
         
-        task = analysis_tasks[video_id]
-        
         # Return task status and results
         if task["status"] == "completed":
-            return JSONResponse({
+            analysis_data = {
+                "video_path": task["video_path"],
+                "timestamp": task.get("analysis_timestamp", task["timestamp"]),
+                "forensic_metadata": task.get("forensic_metadata"),
+                "summary": task["summary"],
+                "model_performance": task["model_performance"],
+                "forensic_analysis": task.get("forensic_analysis")
+            }
+            response = {
                 "id": video_id,
                 "status": "completed",
                 "timestamp": task["timestamp"],
@@ -395,10 +998,16 @@ async def get_analysis_results(video_id: str):
                 "summary": task["summary"],
                 "model_performance": task["model_performance"],
                 "forensic_metadata": task.get("forensic_metadata"),
-                "frames": task.get("frames"),
                 "forensic_analysis": task.get("forensic_analysis"),
-                "analysis_data": task.get("analysis_data")
-            })
+                "frame_count": task["frame_count"] if "frame_count" in task else job_store.count_frames(video_id),
+                "frames_url": f"/api/video/analysis/{video_id}/frames",
+                "analysis_data": analysis_data
+            }
+            if include_frames:
+                frames = job_store.get_frames(video_id)
+                response["frames"] = frames
+                analysis_data["frames"] = frames
+            return FastJSONResponse(response)
         elif task["status"] == "processing":
             progress_info = {
                 "id": video_id,
@@ -414,17 +1023,37 @@ async def get_analysis_results(video_id: str):
                 progress_info["processed_frames"] = task["processed_frames"]
                 progress_info["total_frames"] = task["total_frames"]
                 progress_info["message"] = f"Processing frame {task['processed_frames']}/{task['total_frames']}"
+            if "pipeline" in task:
+                progress_info["pipeline"] = task["pipeline"]
+            if "analysis_pass" in task:
+                progress_info["analysis_pass"] = task["analysis_pass"]
+            if "segments_done" in task:
+                progress_info["segments_done"] = task["segments_done"]
             
-            return JSONResponse(progress_info)
+            return FastJSONResponse(progress_info)
+        elif task["status"] == "queued":
+            return FastJSONResponse({
+                "id": video_id,
+                "status": "queued",
+                "timestamp": task["timestamp"],
+                "queue_position": job_queue.position(video_id),
+                "message": "Waiting for an analysis worker"
+            })
+        elif task["status"] == "cancelled":
+            return FastJSONResponse({
+                "id": video_id,
+                "status": "cancelled",
+                "timestamp": task["timestamp"]
+            })
         elif task["status"] == "failed":
-            return JSONResponse({
+            return FastJSONResponse({
                 "id": video_id,
                 "status": "failed",
                 "timestamp": task["timestamp"],
                 "error": task["error"]
             })
         else:
-            return JSONResponse({
+            return FastJSONResponse({
                 "id": video_id,
                 "status": "unknown",
                 "timestamp": task["timestamp"]
@@ -439,6 +1068,162 @@ async def get_analysis_results(video_id: str):
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
+@router.get("/video/analysis/{video_id}/frames")
+def get_analysis_frames(
+    video_id: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    from_frame: Optional[int] = Query(None, ge=0),
+    to_frame: Optional[int] = Query(None, ge=0),
+    from_time: Optional[float] = Query(None, ge=0),
+    to_time: Optional[float] = Query(None, ge=0),
+    class_name: Optional[str] = Query(None, alias="class"),
+    min_conf: Optional[float] = Query(None, ge=0.0, le=1.0)
+):
+    """
+    Page through per-frame results in frame order.
+
+    Frames can be restricted to a frame range (from_frame/to_frame) or a time
+    range in seconds (from_time/to_time), and to frames containing a detection
+    of a given class and/or with at least min_conf confidence. When a class or
+    confidence filter is given, only the matching detections are returned.
+    Frames already written by a running job are available before it completes.
+    Plain def, like get_analysis_results, to keep SQLite queries off the event loop.
+    """
+    task = job_store.get(video_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Video analysis not found")
+
+    limit = min(limit or FRAMES_PAGE_SIZE, FRAMES_PAGE_MAX)
+    if from_time is not None or to_time is not None:
+        fps = (task.get("summary") or {}).get("fps") or 0
+        if fps <= 0:
+            raise HTTPException(status_code=409, detail="Time filters need the video fps, which is not known yet")
+        if from_time is not None:
+            start = int(from_time * fps)
+            from_frame = start if from_frame is None else max(from_frame, start)
+        if to_time is not None:
+            end = int(to_time * fps)
+            to_frame = end if to_frame is None else min(to_frame, end)
+
+    total, frames = job_store.query_frames(
+        video_id,
+        from_frame=from_frame,
+        to_frame=to_frame,
+        class_name=class_name,
+        min_conf=min_conf,
+        offset=offset,
+        limit=limit
+    )
+    if class_name is not None or min_conf is not None:
+        for frame in frames:
+            frame["detections"] = [
+                d for d in frame.get("detections", [])
+                if (class_name is None or d.get("class_name") == class_name)
+                and (min_conf is None or d.get("confidence", 0) >= min_conf)
+            ]
+
+    next_offset = offset + len(frames)
+    return FastJSONResponse({
+        "id": video_id,
+        "status": task["status"],
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset if next_offset < total else None,
+        "frames": frames
+    })
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+
+def _completion_event(video_id: str, task: Dict) -> Dict:
+    """Last message of a progress stream: final status and where the results are"""
+    event = {
+        "id": video_id,
+        "status": task.get("status"),
+        "results_url": f"/api/video/analysis/{video_id}",
+    }
+    if task.get("status") == "completed":
+        event["frames_url"] = f"/api/video/analysis/{video_id}/frames"
+        event["frame_count"] = task.get("frame_count")
+    elif task.get("error"):
+        event["error"] = task["error"]
+    return event
+
+
+@router.get("/video/analysis/{video_id}/events")
+async def stream_analysis_events(video_id: str, request: Request):
+    """
+    Server-sent events for one analysis job.
+
+    Streams `progress` events (status, progress, processed_frames, ...) and
+    `threat` events (first sighting of each dangerous object track or alert)
+    as the job reports them, then a single `complete` event with the final
+    status and the results URL. The stream starts with a `progress` snapshot
+    of the current job state.
+    """
+    if job_store.get(video_id) is None:
+        raise HTTPException(status_code=404, detail="Video analysis not found")
+    # Subscribe before reading the snapshot so no update falls in between
+    subscription = job_events.subscribe(video_id)
+    task = job_store.get(video_id) or {}
+
+    async def event_stream():
+        try:
+            status = task.get("status")
+            snapshot = {k: task.get(k) for k in PROGRESS_EVENT_FIELDS if task.get(k) is not None}
+            if status == "queued":
+                snapshot["queue_position"] = job_queue.position(video_id)
+            yield _sse("progress", snapshot)
+            while status not in TERMINAL_STATUSES:
+                if await request.is_disconnected():
+                    return
+                message = await subscription.get(timeout=EVENTS_KEEPALIVE_S)
+                if message is None:
+                    # Nothing pushed (the job may run behind another API process); check the store
+                    current = job_store.get(video_id)
+                    if current is None:
+                        return
+                    status = current.get("status")
+                    if status not in TERMINAL_STATUSES:
+                        yield ": keep-alive\n\n"
+                    continue
+                yield _sse(message["event"], message["data"])
+                status = message["data"].get("status", status)
+            yield _sse("complete", _completion_event(video_id, job_store.get(video_id) or {"status": status}))
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.delete("/video/analysis/{video_id}")
+async def cancel_analysis(video_id: str):
+    """Cancel a queued or running analysis job"""
+    task = job_store.get(video_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Video analysis not found")
+    if task["status"] not in ("queued", "processing"):
+        raise HTTPException(status_code=409, detail=f"Analysis is already {task['status']}")
+
+    was_queued = task["status"] == "queued"
+    if not job_queue.cancel(video_id):
+        raise HTTPException(status_code=409, detail="Analysis is not running")
+    if was_queued:
+        # The worker never saw this job, so the upload is removed here
+        local_path = task.get("local_path")
+        if local_path and os.path.exists(local_path):
+            os.remove(local_path)
+    return FastJSONResponse({
+        "id": video_id,
+        "status": "cancelled" if was_queued else "cancelling"
+    })
+
 @router.get("/video/academic-analysis/{video_id}")
 async def get_academic_analysis(video_id: str):
     try:
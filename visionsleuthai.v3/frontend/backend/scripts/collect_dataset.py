@@ -13,7 +13,7 @@ import logging
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.gcp_connector import GCPConnector
+from utils.storage import GCSStorage, get_storage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,8 +23,8 @@ class DatasetCollector:
     """Collect and organize dataset images for training"""
     
     def __init__(self, bucket_name: str = None):
-        """Initialize with GCP bucket"""
-        self.gcp = GCPConnector(bucket_name=bucket_name)
+        """Initialize with a GCS bucket, or the configured storage backend when none is given"""
+        self.storage = GCSStorage(bucket_name) if bucket_name else get_storage()
         self.bucket_name = bucket_name or os.getenv('GCP_BUCKET_NAME')
         
     def download_image(self, url: str, save_path: str) -> bool:
@@ -47,7 +47,7 @@ class DatasetCollector:
     def upload_to_gcp(self, local_path: str, gcp_path: str) -> str:
         """Upload image to GCP Storage"""
         try:
-            self.gcp.upload_file(local_path, gcp_path)
+            self.storage.put_file(local_path, gcp_path)
             logger.info(f"Uploaded to GCP: {gcp_path}")
             return gcp_path
         except Exception as e:
@@ -77,8 +77,8 @@ class DatasetCollector:
             
             # Download image
             if self.download_image(url, str(local_path)):
-            # Upload to GCP (organized structure)
-            gcp_path = f"data/raw/{category}/images/{filename}"
+                # Upload to GCP (organized structure)
+                gcp_path = f"data/raw/{category}/images/{filename}"
                 try:
                     self.upload_to_gcp(str(local_path), gcp_path)
                     
@@ -101,7 +101,7 @@ class DatasetCollector:
         
         # Upload metadata to GCP
         gcp_metadata_path = f"data/raw/{category}/metadata.json"
-        self.gcp.upload_file(str(metadata_path), gcp_metadata_path)
+        self.storage.put_file(str(metadata_path), gcp_metadata_path)
         
         logger.info(f"Collected {len(metadata)} images for {category}")
         return metadata
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from utils.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_create_update_round_trip(store):
+    store.create("a", {"status": "queued", "timestamp": "t0", "video_path": "/tmp/a.mp4", "cache_key": "k"})
+    assert store.update("a", {"status": "processing", "progress": 40, "processed_frames": 8, "total_frames": 20,
+                              "pipeline": {"batch_size": 4}})
+    assert not store.update("missing", {"progress": 1})
+    job = store.get("a")
+    assert job == {"id": "a", "status": "processing", "timestamp": "t0", "video_path": "/tmp/a.mp4", "cache_key": "k",
+                   "progress": 40, "processed_frames": 8, "total_frames": 20, "pipeline": {"batch_size": 4}}
+    assert store.list_ids(["processing"]) == ["a"]
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_completed_jobs_are_cached_until_updated(store):
+    store.create("a", {"status": "completed", "timestamp": "t0"})
+    assert store.get("a")["status"] == "completed"
+    store.update("a", {"summary": {"fps": 25}})
+    assert store.get("a")["summary"] == {"fps": 25}
+
+
+def test_find_by_cache_key_prefers_completed(store):
+    store.create("running", {"status": "processing", "cache_key": "k"})
+    store.create("done", {"status": "completed", "cache_key": "k"})
+    store.create("failed", {"status": "failed", "cache_key": "k"})
+    assert store.find_by_cache_key("k", ("completed", "processing"))["id"] == "done"
+    assert store.find_by_cache_key("k", ("processing",))["id"] == "running"
+    assert store.find_by_cache_key("other", ("completed",)) is None
+
+
+def test_create_unless_cached(store):
+    fields = {"status": "queued", "cache_key": "k"}
+    assert store.create_unless_cached("first", fields, ("queued", "completed")) is None
+    assert store.create_unless_cached("second", fields, ("queued", "completed"))["id"] == "first"
+    assert store.get("second") is None
+
+
+def test_frames_paging_and_queries(store):
+    store.create("a", {"status": "processing"})
+    store.add_frames("a", [
+        (i, {"frame_index": i, "detections": [{"class_name": "knife" if i % 3 == 0 else "person",
+                                               "confidence": np.float32(0.1 * (i % 10))}]})
+        for i in range(10)
+    ])
+    assert store.count_frames("a") == 10
+    assert [f["frame_index"] for f in store.get_frames("a", offset=2, limit=3)] == [2, 3, 4]
+    total, frames = store.query_frames("a", from_frame=2, to_frame=8, class_name="knife")
+    assert total == 2 and [f["frame_index"] for f in frames] == [3, 6]
+    total, frames = store.query_frames("a", min_conf=0.75, limit=1)
+    assert total == 2 and [f["frame_index"] for f in frames] == [8]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from models.motion_gate import MotionGate
+
+
+def _frame(value=0):
+    return np.full((120, 160, 3), value, dtype=np.uint8)
+
+
+def test_static_frames_are_skipped_until_max_skip():
+    gate = MotionGate(threshold=0.01, pixel_threshold=25, width=32, max_skip=2)
+    assert gate.is_static(_frame()) is False  # first frame becomes the reference
+    assert gate.is_static(_frame()) is True
+    assert gate.is_static(_frame()) is True
+    assert gate.is_static(_frame()) is False  # forced inference after max_skip
+    assert gate.is_static(_frame()) is True
+
+
+def test_motion_resets_reference():
+    gate = MotionGate(threshold=0.01, pixel_threshold=25, width=32, max_skip=10)
+    gate.is_static(_frame())
+    moved = _frame()
+    moved[40:80, 60:100] = 255
+    assert gate.is_static(moved) is False
+    assert gate.last_motion > 0.01
+    assert gate.is_static(moved) is True
+
+
+def test_state_round_trip():
+    gate = MotionGate(threshold=0.01, pixel_threshold=25, width=32, max_skip=10)
+    gate.is_static(_frame())
+    gate.is_static(_frame())
+    restored = MotionGate(threshold=0.01, pixel_threshold=25, width=32, max_skip=10)
+    restored.set_state(gate.get_state())
+    assert restored.is_static(_frame()) is True
+    assert restored.get_state()["skip_run"] == 2
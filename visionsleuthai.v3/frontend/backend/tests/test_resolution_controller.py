@@ -0,0 +1,45 @@
+import pytest
+
+from models.resolution_controller import ResolutionController, parse_levels
+
+
+def _controller(**kwargs):
+    options = dict(levels=parse_levels("320,480,640"), target_p95_ms=100, window=10, min_samples=5, cooldown=5)
+    options.update(kwargs)
+    return ResolutionController(**options)
+
+
+def test_parse_levels_sorts_and_reads_model_paths():
+    assert parse_levels("640, 320:yolo11n.pt ,480") == [(320, "yolo11n.pt"), (480, None), (640, None)]
+    with pytest.raises(ValueError):
+        parse_levels(" , ")
+
+
+def test_steps_down_when_p95_over_target():
+    controller = _controller()
+    assert controller.imgsz == 640
+    decisions = [controller.record(150) for _ in range(5)]
+    assert decisions == [None, None, None, None, "down"]
+    assert controller.imgsz == 480 and controller.p95() is None
+
+
+def test_cooldown_and_floor():
+    controller = _controller()
+    for _ in range(5):
+        controller.record(150)
+    # The window restarted; the next switch needs min_samples / cooldown frames again
+    assert [controller.record(150) for _ in range(5)] == [None, None, None, None, "down"]
+    assert controller.at_floor
+    assert all(controller.record(500) is None for _ in range(10))
+    assert controller.over_budget()
+
+
+def test_steps_up_only_with_headroom():
+    controller = _controller()
+    controller.index = 0
+    # 320 -> 480 scales latency by 2.25: 40 ms projects to 90 ms, above 80% of the 100 ms budget
+    assert all(controller.record(40) is None for _ in range(10))
+    controller = _controller()
+    controller.index = 0
+    assert [controller.record(30) for _ in range(5)][-1] == "up"
+    assert controller.imgsz == 480 and controller.switches == 1
@@ -0,0 +1,28 @@
+import asyncio
+
+import numpy as np
+
+from utils.responses import FastJSONResponse, send_json_fast
+from utils.result_codec import loads
+
+
+def test_fast_json_response_renders_numpy_arrays():
+    response = FastJSONResponse({
+        "strided": np.arange(12).reshape(3, 4)[:, ::2],
+        "half": np.array([0.5, 1.0], dtype=np.float16),
+        "score": np.float32(0.75),
+    })
+    assert response.media_type == "application/json"
+    assert loads(response.body) == {"strided": [[0, 2], [4, 6], [8, 10]], "half": [0.5, 1.0], "score": 0.75}
+
+
+def test_send_json_fast_sends_numpy_arrays():
+    class _WebSocket:
+        sent = None
+
+        async def send_text(self, text):
+            self.sent = text
+
+    websocket = _WebSocket()
+    asyncio.run(send_json_fast(websocket, {"boxes": np.arange(8, dtype=np.float16).reshape(2, 4)[:, 1:3]}))
+    assert loads(websocket.sent) == {"boxes": [[1.0, 2.0], [5.0, 6.0]]}
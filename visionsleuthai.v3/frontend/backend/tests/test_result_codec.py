@@ -0,0 +1,59 @@
+import gzip
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from utils import result_codec
+from utils.result_codec import RESULTS_SCHEMA_VERSION, decode_results, dumps, encode_results, loads
+
+
+@pytest.mark.parametrize("array", [
+    np.arange(6, dtype=np.float32).reshape(2, 3),
+    np.arange(12).reshape(3, 4)[:, ::2],  # non-contiguous
+    np.arange(4, dtype=np.float16),
+    np.array([7]),
+    np.zeros((0, 4)),
+])
+def test_dumps_arrays(array):
+    assert loads(dumps({"a": array})) == {"a": array.tolist()}
+
+
+def test_dumps_numpy_scalars_and_datetimes():
+    doc = loads(dumps({"i": np.int64(3), "f": np.float16(0.5), "b": np.bool_(True),
+                       "t": datetime(2024, 1, 1, 12, 0)}))
+    assert doc["i"] == 3 and doc["f"] == 0.5 and doc["b"] is True
+    assert doc["t"].startswith("2024-01-01T12:00")
+
+
+def test_default_arrays_on_stdlib_path():
+    assert result_codec._default(np.arange(4).reshape(2, 2)[:, ::-1]) == [[1, 0], [3, 2]]
+    assert result_codec._default(np.float32(1.5)) == 1.5
+
+
+def test_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        dumps({"a": object()})
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip", "zstd"])
+def test_encode_decode_round_trip(compression):
+    if compression == "zstd" and result_codec._zstd() is None:
+        pytest.skip("zstandard not installed")
+    results = {"frames": [{"boxes": np.arange(8).reshape(2, 4)[:, ::2]}], "score": np.float32(0.25)}
+    payload, used = encode_results(results, compression)
+    assert used == compression
+    decoded = decode_results(payload)
+    assert decoded["schema_version"] == RESULTS_SCHEMA_VERSION
+    assert decoded["frames"] == [{"boxes": [[0, 2], [4, 6]]}]
+    assert decoded["score"] == 0.25
+
+
+def test_encode_magic_bytes():
+    assert encode_results({}, "gzip")[0][:2] == b"\x1f\x8b"
+    assert encode_results({}, "none")[0].startswith(b"{")
+
+
+def test_decode_unversioned_documents():
+    assert decode_results(b'{"status":"completed"}') == {"status": "completed", "schema_version": 0}
+    assert decode_results(gzip.compress(b'{"a":1}'))["schema_version"] == 0
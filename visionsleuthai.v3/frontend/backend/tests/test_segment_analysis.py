@@ -0,0 +1,48 @@
+import numpy as np
+
+from models.detections import CLASS_NAMES, Detections
+from models.segment_analysis import match_tracks, plan_segments, stitch_segments
+
+PERSON = CLASS_NAMES.intern("person")
+KNIFE = CLASS_NAMES.intern("knife")
+
+
+def _frame(*rows):
+    """rows of (box, class_id, track_id)"""
+    return {
+        "detections": Detections(
+            np.array([box for box, _, _ in rows], dtype=np.float32).reshape(-1, 4),
+            np.full(len(rows), 0.9),
+            np.array([cls for _, cls, _ in rows]),
+            track_id=np.array([tid for _, _, tid in rows])
+        ),
+        "suspicious_interactions": [],
+    }
+
+
+def test_plan_segments_overlap_and_bounds():
+    assert plan_segments(1000, 4, 10) == [(0, 249), (240, 499), (490, 749), (740, 999)]
+    assert plan_segments(1000, 4, 10, min_frames=400) == [(0, 499), (490, 999)]
+    assert plan_segments(0, 4, 10) == []
+
+
+def test_match_tracks_requires_same_class_and_iou():
+    previous = {5: _frame(([0, 0, 10, 10], PERSON, 7), ([50, 50, 60, 60], KNIFE, 8))}
+    current = {5: _frame(([0, 0, 10, 10], PERSON, 1), ([50, 50, 60, 60], PERSON, 2))}
+    assert match_tracks(previous, current, [5], 0.5) == {1: 7}
+
+
+def test_stitch_remaps_ids_across_overlap():
+    person = [0, 0, 10, 20]
+    first = {"frames": [(i, _frame((person, PERSON, 3))) for i in range(0, 6)]}
+    # Overlap frames 4-5: local track 1 is the same person, local track 2 is new
+    second = {"frames": [(i, _frame((person, PERSON, 1), ([40, 40, 50, 50], KNIFE, 2))) for i in range(4, 10)]}
+
+    merged, stats = stitch_segments([first, second], 0.5)
+
+    assert [index for index, _ in merged] == list(range(10))
+    assert merged[0][1]["detections"].track_id.tolist() == [1]
+    # Overlap frames keep the earlier segment's result
+    assert merged[5][1]["detections"].track_id.tolist() == [1]
+    assert merged[6][1]["detections"].track_id.tolist() == [1, 2]
+    assert stats == {"tracks": 2, "stitched_tracks": 1}
@@ -0,0 +1,19 @@
+import pytest
+
+from utils.storage import LocalStorage, StorageBackend
+
+
+def test_incomplete_backend_fails_on_construction():
+    class PartialStorage(StorageBackend):
+        def put_bytes(self, key, data, content_type=None):
+            return key
+
+    with pytest.raises(TypeError):
+        PartialStorage()
+
+
+def test_local_results_round_trip(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    key = storage.save_results("abc", {"status": "completed"})
+    assert storage.exists(key) and storage.list("results/") == [key]
+    assert storage.get_results(key)["status"] == "completed"
@@ -0,0 +1,54 @@
+import numpy as np
+
+from models.detections import CLASS_NAMES, Detections
+from models.tiling import class_aware_nms, merge_tile_detections, select_tiles, tile_grid, tile_to_frame
+
+KNIFE = CLASS_NAMES.intern("knife")
+PERSON = CLASS_NAMES.intern("person")
+
+
+def _dets(boxes, confs, classes, track_ids=None):
+    return Detections(np.array(boxes, dtype=np.float32), np.array(confs), np.array(classes), track_id=track_ids)
+
+
+def test_tile_grid_covers_frame_with_overlap():
+    tiles = tile_grid(1920, 1080, 640, 0.2)
+    assert tiles[:, 0].min() == 0 and tiles[:, 1].min() == 0
+    assert tiles[:, 2].max() == 1920 and tiles[:, 3].max() == 1080
+    assert ((tiles[:, 2] - tiles[:, 0]) == 640).all() and ((tiles[:, 3] - tiles[:, 1]) == 640).all()
+    xs = sorted(set(tiles[:, 0].tolist()))
+    assert all(b - a <= 512 for a, b in zip(xs, xs[1:]))
+
+
+def test_tile_grid_small_frame_is_one_tile():
+    assert tile_grid(500, 300, 640, 0.2).tolist() == [[0, 0, 500, 300]]
+
+
+def test_select_tiles_prefers_covered_area():
+    tiles = np.array([[0, 0, 100, 100], [100, 0, 200, 100], [200, 0, 300, 100]], dtype=np.int32)
+    regions = np.array([[90, 10, 180, 50]], dtype=np.float32)
+    assert select_tiles(tiles, regions, 2).tolist() == [[0, 0, 100, 100], [100, 0, 200, 100]]
+    assert select_tiles(tiles, regions, 1).tolist() == [[100, 0, 200, 100]]
+    assert len(select_tiles(tiles, regions[:0], 3)) == 0
+
+
+def test_tile_to_frame_offsets_then_scales():
+    boxes = np.array([[10, 20, 30, 40]], dtype=np.float32)
+    assert tile_to_frame(boxes, (640, 320, 0.5)).tolist() == [[325.0, 170.0, 335.0, 180.0]]
+
+
+def test_class_aware_nms_keeps_other_classes():
+    dets = _dets([[0, 0, 10, 10], [1, 1, 10, 10], [0, 0, 10, 10]], [0.6, 0.9, 0.5], [KNIFE, KNIFE, PERSON])
+    assert class_aware_nms(dets, 0.5).tolist() == [1, 2]
+
+
+def test_merge_drops_tile_duplicates_of_tracked_boxes():
+    base = _dets([[100, 100, 120, 140]], [0.7], [KNIFE], track_ids=[4])
+    tiles = _dets(
+        [[101, 101, 120, 140], [102, 100, 121, 141], [400, 400, 410, 420]],
+        [0.8, 0.9, 0.6],
+        [KNIFE, KNIFE, KNIFE]
+    )
+    merged = merge_tile_detections(base, tiles, 0.5)
+    assert merged.track_id.tolist() == [4, -1]
+    assert merged.xyxy.tolist() == [[100, 100, 120, 140], [400, 400, 410, 420]]
@@ -0,0 +1,61 @@
+"""
+On-disk checkpoints for long-running analysis jobs.
+
+A checkpoint records how far a job got (frame results up to that point are
+already in the JobStore) together with the tracker / motion-gate state needed
+to continue from there. Files are written atomically, so a crash while saving
+leaves the previous checkpoint intact.
+"""
+import logging
+import os
+import pickle
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointStore:
+    """
+    Args:
+        directory: Where checkpoints are kept (CHECKPOINT_DIR, default data/checkpoints)
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("CHECKPOINT_DIR", os.path.join("data", "checkpoints"))
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.ckpt")
+
+    def save(self, job_id: str, state: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(job_id)
+        tmp_path = f"{path}.tmp"
+        payload = {"version": CHECKPOINT_VERSION, "saved_at": time.time(), **state}
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(job_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except Exception as e:
+            logger.error(f"Ignoring unreadable checkpoint {path}: {str(e)}")
+            return None
+        if state.get("version") != CHECKPOINT_VERSION:
+            logger.warning(f"Ignoring checkpoint {path} with version {state.get('version')}")
+            return None
+        return state
+
+    def delete(self, job_id: str) -> None:
+        for path in (self._path(job_id), f"{self._path(job_id)}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,91 @@
+"""
+In-process fan-out of analysis job events to streaming clients.
+
+Job updates reach the API process through the JobQueue listener thread (or the
+inline fallback); they are published here and delivered to every subscriber
+of that job on its own asyncio loop. Slow subscribers lose their oldest
+events rather than blocking the publisher; the stream endpoint re-reads the
+job store when it falls behind, so a dropped progress event only costs
+intermediate updates.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobSubscription:
+    def __init__(self, bus: "JobEventBus", job_id: str, loop: asyncio.AbstractEventLoop, max_events: int):
+        self.bus = bus
+        self.job_id = job_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_events)
+        self.dropped = 0
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None after timeout seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+
+class JobEventBus:
+    """
+    Args:
+        max_events: Events buffered per subscriber before the oldest are dropped
+    """
+
+    def __init__(self, max_events: int = 256):
+        self.max_events = max_events
+        self._subscribers: Dict[str, List[JobSubscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_id: str) -> JobSubscription:
+        """Must be called from the event loop that will consume the events"""
+        subscription = JobSubscription(self, job_id, asyncio.get_running_loop(), self.max_events)
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: JobSubscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.job_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.job_id, None)
+
+    def publish(self, job_id: str, event: Dict[str, Any]) -> None:
+        """Thread-safe; a no-op when nobody is listening"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # Loop already closed; the subscriber is gone
+                self.unsubscribe(subscription)
+
+    def subscriber_count(self, job_id: Optional[str] = None) -> int:
+        with self._lock:
+            if job_id is not None:
+                return len(self._subscribers.get(job_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+job_events = JobEventBus()
@@ -0,0 +1,304 @@
+"""
+Bounded, prioritised job queue served by a pool of worker processes.
+
+Each worker process runs init_fn once (e.g. to load the detection model) and
+then executes job_fn for every job it is handed, so model weights stay loaded
+between jobs and heavy analyses never run inside the web process. Progress and
+status messages travel back to the parent through a single update queue.
+"""
+import heapq
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when the queue is at capacity"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancel event has been set"""
+
+
+def _worker_main(worker_id: int, init_fn, job_fn, task_queue, update_queue, cancel_event) -> None:
+    state = None
+    try:
+        state = init_fn() if init_fn is not None else None
+    except Exception as e:
+        logger.exception("Worker %s initialisation failed: %s", worker_id, str(e))
+    update_queue.put(("ready", worker_id, None, None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        job_id, args = task
+
+        def report(fields: Dict[str, Any], _job_id=job_id) -> None:
+            update_queue.put(("update", worker_id, _job_id, fields))
+
+        try:
+            job_fn(state, job_id, *args, report=report, cancel_event=cancel_event)
+        except JobCancelled:
+            update_queue.put(("update", worker_id, job_id, {"status": "cancelled"}))
+        except Exception as e:
+            logger.exception("Job %s failed in worker %s: %s", job_id, worker_id, str(e))
+            update_queue.put(("update", worker_id, job_id, {"status": "failed", "error": str(e)}))
+        update_queue.put(("finished", worker_id, job_id, None))
+
+
+class _Worker:
+    def __init__(self, worker_id: int, ctx):
+        self.worker_id = worker_id
+        self.task_queue = ctx.Queue()
+        self.cancel_event = ctx.Event()
+        self.process = None
+        self.ready = False
+        self.job_id: Optional[str] = None
+        # (args, priority) of the running job, for re-queueing after a crash
+        self.job: Optional[Tuple[tuple, int]] = None
+
+
+class JobQueue:
+    """
+    Args:
+        job_fn: Top-level function called in the worker as
+            job_fn(state, job_id, *args, report=..., cancel_event=...)
+        init_fn: Top-level function run once per worker; its return value is `state`
+        on_update: Called in the parent as on_update(job_id, fields) for every
+            progress/status message
+        workers: Number of worker processes (ANALYSIS_WORKERS, default 1)
+        max_queued: Maximum number of waiting jobs (JOB_QUEUE_MAX, default 16)
+        max_retries: Times a job is re-queued after its worker process died
+            (JOB_MAX_RETRIES, default 2); jobs are expected to resume from
+            their own checkpoints
+    """
+
+    def __init__(
+        self,
+        job_fn: Callable,
+        init_fn: Optional[Callable] = None,
+        on_update: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        workers: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        if workers is None:
+            try:
+                workers = int(os.getenv("ANALYSIS_WORKERS", "1"))
+            except Exception:
+                workers = 1
+        if max_queued is None:
+            try:
+                max_queued = int(os.getenv("JOB_QUEUE_MAX", "16"))
+            except Exception:
+                max_queued = 16
+        if max_retries is None:
+            try:
+                max_retries = int(os.getenv("JOB_MAX_RETRIES", "2"))
+            except Exception:
+                max_retries = 2
+        self.max_retries = max(0, max_retries)
+        self._attempts: Dict[str, int] = {}
+        self.job_fn = job_fn
+        self.init_fn = init_fn
+        self.on_update = on_update
+        self.num_workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+
+        # spawn: CUDA/torch state must not be forked from the web process
+        self._ctx = mp.get_context("spawn")
+        self._update_queue = self._ctx.Queue()
+        self._workers: List[_Worker] = []
+        self._heap: List[Tuple[int, int, str, tuple]] = []
+        self._queued: Dict[str, Tuple[int, int]] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._started = False
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+    # -- lifecycle -------------------------------------------------------
+    def start(self) -> None:
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            for worker_id in range(self.num_workers):
+                worker = _Worker(worker_id, self._ctx)
+                self._workers.append(worker)
+                self._spawn(worker)
+        for target, name in ((self._dispatch_loop, "job-dispatcher"), (self._listen_loop, "job-listener")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"JobQueue started with {self.num_workers} worker(s), capacity {self.max_queued}")
+
+    def _spawn(self, worker: _Worker) -> None:
+        # Not daemonic: jobs may start their own process pools
+        worker.ready = False
+        worker.job_id = None
+        worker.job = None
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.worker_id, self.init_fn, self.job_fn, worker.task_queue, self._update_queue, worker.cancel_event),
+            name=f"analysis-worker-{worker.worker_id}",
+            daemon=False
+        )
+        worker.process.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.cancel_event.set()
+            worker.task_queue.put(None)
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        self._update_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    # -- public API ------------------------------------------------------
+    def submit(self, job_id: str, args: tuple = (), priority: int = 0) -> int:
+        """Queue a job (higher priority runs first); returns its 1-based queue position"""
+        self.start()
+        with self._cond:
+            if len(self._queued) >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+            self._attempts[job_id] = 0
+            self._push_locked(job_id, args, priority)
+            return self._position_locked(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a waiting or running job; returns False if the job is unknown"""
+        with self._cond:
+            if job_id in self._queued:
+                # Lazily dropped from the heap by the dispatcher
+                del self._queued[job_id]
+                self._attempts.pop(job_id, None)
+                self._cond.notify_all()
+                self._notify(job_id, {"status": "cancelled"})
+                return True
+            for worker in self._workers:
+                if worker.job_id == job_id:
+                    worker.cancel_event.set()
+                    return True
+        return False
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position among waiting jobs, or None if the job is not waiting"""
+        with self._cond:
+            return self._position_locked(job_id)
+
+    def _position_locked(self, job_id: str) -> Optional[int]:
+        entry = self._queued.get(job_id)
+        if entry is None:
+            return None
+        return 1 + sum(1 for other in self._queued.values() if other < entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.num_workers,
+                "ready_workers": sum(1 for w in self._workers if w.ready),
+                "busy_workers": sum(1 for w in self._workers if w.job_id is not None),
+                "queued_jobs": len(self._queued),
+                "capacity": self.max_queued,
+            }
+
+    # -- internals -------------------------------------------------------
+    def _notify(self, job_id: str, fields: Dict[str, Any]) -> None:
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(job_id, fields)
+        except Exception as e:
+            logger.error(f"JobQueue update callback failed for {job_id}: {str(e)}")
+
+    def _pop_next_locked(self) -> Optional[Tuple[str, tuple, int]]:
+        while self._heap:
+            neg_priority, seq, job_id, args = heapq.heappop(self._heap)
+            if self._queued.get(job_id) == (neg_priority, seq):
+                del self._queued[job_id]
+                return job_id, args, -neg_priority
+        return None
+
+    def _push_locked(self, job_id: str, args: tuple, priority: int) -> None:
+        entry = (-int(priority), next(self._seq))
+        self._queued[job_id] = entry
+        heapq.heappush(self._heap, (entry[0], entry[1], job_id, tuple(args)))
+        self._cond.notify_all()
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                self._reap_dead_workers_locked()
+                idle = [w for w in self._workers if w.ready and w.job_id is None]
+                if not idle or not self._queued:
+                    self._cond.wait(timeout=1.0)
+                    continue
+                job = self._pop_next_locked()
+                if job is None:
+                    continue
+                job_id, args, priority = job
+                worker = idle[0]
+                worker.cancel_event.clear()
+                worker.job_id = job_id
+                worker.job = (args, priority)
+                worker.task_queue.put((job_id, args))
+            logger.info(f"Dispatched job {job_id} to worker {worker.worker_id}")
+
+    def _reap_dead_workers_locked(self) -> None:
+        for worker in self._workers:
+            if worker.process is not None and not worker.process.is_alive() and not self._stopping:
+                logger.error(f"Analysis worker {worker.worker_id} died (exit code {worker.process.exitcode}), restarting")
+                job_id, job = worker.job_id, worker.job
+                cancelled = worker.cancel_event.is_set()
+                self._spawn(worker)
+                if job_id is None or job is None:
+                    continue
+                attempts = self._attempts.get(job_id, 0)
+                if attempts < self.max_retries and not cancelled:
+                    self._attempts[job_id] = attempts + 1
+                    # Ahead of jobs of the same priority that have not started yet
+                    self._push_locked(job_id, job[0], job[1] + 1)
+                    logger.info(f"Re-queued job {job_id} after worker crash (retry {attempts + 1}/{self.max_retries})")
+                    self._notify(job_id, {"status": "queued", "retries": attempts + 1})
+                else:
+                    self._attempts.pop(job_id, None)
+                    self._notify(job_id, {"status": "failed", "error": "Analysis worker crashed"})
+
+    def _listen_loop(self) -> None:
+        while True:
+            try:
+                message = self._update_queue.get()
+            except (EOFError, OSError, ValueError):
+                # Queue closed during interpreter shutdown
+                return
+            if message is None:
+                return
+            kind, worker_id, job_id, fields = message
+            if kind == "update":
+                self._notify(job_id, fields)
+                continue
+            with self._cond:
+                worker = self._workers[worker_id]
+                if kind == "ready":
+                    worker.ready = True
+                elif kind == "finished" and worker.job_id == job_id:
+                    worker.job_id = None
+                    worker.job = None
+                    self._attempts.pop(job_id, None)
+                self._cond.notify_all()
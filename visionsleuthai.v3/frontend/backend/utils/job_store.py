@@ -0,0 +1,312 @@
+"""
+SQLite-backed store for video analysis jobs.
+
+Job status, progress and summaries live in the `jobs` table; per-frame results
+live in the `frames` side table and are only read when a caller asks for them.
+The database runs in WAL mode so the API process and the analysis worker
+processes can read and write it concurrently. Finished jobs are kept in a
+small in-memory LRU cache because they no longer change.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.result_codec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Columns stored natively; every other field goes into the JSON `data` column
+_COLUMNS = ("status", "timestamp", "progress", "processed_frames", "total_frames", "cache_key")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    timestamp TEXT,
+    progress INTEGER,
+    processed_frames INTEGER,
+    total_frames INTEGER,
+    cache_key TEXT,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS frames (
+    job_id TEXT NOT NULL,
+    frame_index INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, frame_index)
+) WITHOUT ROWID;
+"""
+
+
+def _dumps(value: Any) -> str:
+    # Stored as TEXT so SQLite's JSON functions can query frames
+    return dumps(value).decode("utf-8")
+
+
+class JobStore:
+    """
+    Args:
+        path: SQLite file (JOB_STORE_PATH, default data/analysis_jobs.sqlite3)
+        cache_size: Finished jobs kept in memory (JOB_CACHE_SIZE, default 64)
+    """
+
+    def __init__(self, path: Optional[str] = None, cache_size: Optional[int] = None):
+        self.path = path or os.getenv("JOB_STORE_PATH", os.path.join("data", "analysis_jobs.sqlite3"))
+        if cache_size is None:
+            try:
+                cache_size = int(os.getenv("JOB_CACHE_SIZE", "64"))
+            except Exception:
+                cache_size = 64
+        self.cache_size = max(0, cache_size)
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # -- connection ------------------------------------------------------
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            # Databases created before cache keys existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "cache_key" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN cache_key TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_cache_key ON jobs (cache_key)")
+            self._conn = conn
+            logger.info(f"JobStore opened: {self.path}")
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- jobs ------------------------------------------------------------
+    @staticmethod
+    def _split(fields: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        columns = {k: v for k, v in fields.items() if k in _COLUMNS}
+        data = {k: v for k, v in fields.items() if k not in _COLUMNS}
+        return columns, data
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job_id, status, timestamp, progress, processed, total, cache_key, data = row
+        job = loads(data)
+        job.update({"id": job_id, "status": status, "timestamp": timestamp})
+        if cache_key is not None:
+            job["cache_key"] = cache_key
+        if progress is not None:
+            job["progress"] = progress
+        if processed is not None:
+            job["processed_frames"] = processed
+        if total is not None:
+            job["total_frames"] = total
+        return job
+
+    def _insert(self, conn: sqlite3.Connection, job_id: str, fields: Dict[str, Any]) -> None:
+        columns, data = self._split(fields)
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, timestamp, progress, processed_frames, total_frames, cache_key, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, columns.get("status", "queued"), columns.get("timestamp"), columns.get("progress"),
+             columns.get("processed_frames"), columns.get("total_frames"), columns.get("cache_key"),
+             time.time(), _dumps(data))
+        )
+
+    def create(self, job_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._insert(conn, job_id, fields)
+            self._cache.pop(job_id, None)
+
+    def create_unless_cached(self, job_id: str, fields: Dict[str, Any], statuses: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Job with fields["cache_key"] in one of statuses (see find_by_cache_key),
+        or None after creating job_id from fields.
+
+        The lookup and the insert share one BEGIN IMMEDIATE transaction, which
+        holds SQLite's write lock, so API processes sharing the database
+        cannot both miss the key and both create a job.
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._find_by_cache_key(conn, fields.get("cache_key"), statuses)
+                if existing is None:
+                    self._insert(conn, job_id, fields)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            self._cache.pop(job_id, None)
+        return existing
+
+    def update(self, job_id: str, fields: Dict[str, Any]) -> bool:
+        """Merge fields into an existing job; returns False if the job is unknown"""
+        columns, data = self._split(fields)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return False
+                assignments = ["updated_at = ?"]
+                params: List[Any] = [time.time()]
+                for name, value in columns.items():
+                    assignments.append(f"{name} = ?")
+                    params.append(value)
+                if data:
+                    merged = loads(row[0])
+                    merged.update(data)
+                    assignments.append("data = ?")
+                    params.append(_dumps(merged))
+                params.append(job_id)
+                conn.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ?", params)
+            self._cache.pop(job_id, None)
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job fields without per-frame results (see get_frames)"""
+        with self._lock:
+            cached = self._cache.get(job_id)
+            if cached is not None:
+                self._cache.move_to_end(job_id)
+                return dict(cached)
+            row = self._connection().execute(
+                "SELECT id, status, timestamp, progress, processed_frames, total_frames, cache_key, data FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            job = self._row_to_job(row)
+            if job["status"] in TERMINAL_STATUSES and self.cache_size:
+                self._cache[job_id] = job
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return dict(job)
+
+    def _find_by_cache_key(self, conn: sqlite3.Connection, cache_key: Optional[str],
+                           statuses: Iterable[str]) -> Optional[Dict[str, Any]]:
+        statuses = list(statuses)
+        if cache_key is None or not statuses:
+            return None
+        placeholders = ", ".join("?" for _ in statuses)
+        row = conn.execute(
+            "SELECT id, status, timestamp, progress, processed_frames, total_frames, cache_key, data FROM jobs "
+            f"WHERE cache_key = ? AND status IN ({placeholders}) "
+            "ORDER BY status = 'completed' DESC, updated_at DESC LIMIT 1",
+            [cache_key, *statuses]
+        ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def find_by_cache_key(self, cache_key: str, statuses: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Job with this cache key in one of statuses; completed jobs first, then the most recent"""
+        with self._lock:
+            return self._find_by_cache_key(self._connection(), cache_key, statuses)
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM frames WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._cache.pop(job_id, None)
+
+    def list_ids(self, statuses: Iterable[str]) -> List[str]:
+        statuses = list(statuses)
+        if not statuses:
+            return []
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT id FROM jobs WHERE status IN ({placeholders}) ORDER BY updated_at", statuses
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    # -- frames ----------------------------------------------------------
+    def add_frames(self, job_id: str, frames: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+        rows = [(job_id, int(index), _dumps(result)) for index, result in frames]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO frames (job_id, frame_index, data) VALUES (?, ?, ?)", rows)
+
+    def get_frames(self, job_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Frame results in frame order"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT data FROM frames WHERE job_id = ? ORDER BY frame_index LIMIT ? OFFSET ?",
+                (job_id, -1 if limit is None else int(limit), int(offset))
+            ).fetchall()
+        return [loads(r[0]) for r in rows]
+
+    def query_frames(
+        self,
+        job_id: str,
+        from_frame: Optional[int] = None,
+        to_frame: Optional[int] = None,
+        class_name: Optional[str] = None,
+        min_conf: Optional[float] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Filtered page of frame results in frame order.
+
+        The frame range uses the primary key; class and confidence filters keep
+        frames with at least one matching detection (evaluated with SQLite's
+        JSON functions, so non-matching frames are never decoded in Python).
+        Returns (total_matching_frames, frames).
+        """
+        where = ["job_id = ?"]
+        params: List[Any] = [job_id]
+        if from_frame is not None:
+            where.append("frame_index >= ?")
+            params.append(int(from_frame))
+        if to_frame is not None:
+            where.append("frame_index <= ?")
+            params.append(int(to_frame))
+        if class_name is not None or min_conf is not None:
+            conditions = []
+            if class_name is not None:
+                conditions.append("json_extract(d.value, '$.class_name') = ?")
+                params.append(class_name)
+            if min_conf is not None:
+                conditions.append("json_extract(d.value, '$.confidence') >= ?")
+                params.append(float(min_conf))
+            where.append(
+                "EXISTS (SELECT 1 FROM json_each(frames.data, '$.detections') d WHERE "
+                + " AND ".join(conditions) + ")"
+            )
+        clause = " AND ".join(where)
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute(f"SELECT COUNT(*) FROM frames WHERE {clause}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT data FROM frames WHERE {clause} ORDER BY frame_index LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else int(limit), int(offset)]
+            ).fetchall()
+        return int(total), [loads(r[0]) for r in rows]
+
+    def count_frames(self, job_id: str) -> int:
+        with self._lock:
+            row = self._connection().execute("SELECT COUNT(*) FROM frames WHERE job_id = ?", (job_id,)).fetchone()
+        return int(row[0])
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
 import time
 
 registry = CollectorRegistry()
@@ -24,6 +24,13 @@ frame_latency_ms = Histogram(
     registry=registry
 )
 
+live_resolution_switches = Counter(
+    'vs_live_resolution_switches_total',
+    'Live sessions switching input resolution because of their p95 latency',
+    ['direction'],
+    registry=registry
+)
+
 # Upload and analysis metrics
 uploads_total = Counter(
     'vs_video_uploads_total',
@@ -37,6 +44,13 @@ upload_failures_total = Counter(
     registry=registry
 )
 
+upload_cache_hits_total = Counter(
+    'vs_video_upload_cache_hits_total',
+    'Uploads answered by an existing job with the same content and settings',
+    ['kind'],
+    registry=registry
+)
+
 analysis_jobs_total = Counter(
     'vs_analysis_jobs_total',
     'Total number of analysis jobs started',
@@ -56,6 +70,13 @@ analysis_duration_seconds = Histogram(
     registry=registry
 )
 
+pipeline_queue_depth = Gauge(
+    'vs_pipeline_queue_depth',
+    'Current depth of the video analysis pipeline queues',
+    ['queue'],
+    registry=registry
+)
+
 
 def start_timer():
     return time.time()
@@ -0,0 +1,21 @@
+"""
+Response classes built on the project's JSON encoder (utils.result_codec).
+"""
+from typing import Any
+
+from fastapi import WebSocket
+from fastapi.responses import JSONResponse
+
+from utils.result_codec import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with result_codec.dumps (orjson; NumPy, datetimes and Detections supported)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def send_json_fast(websocket: WebSocket, content: Any) -> None:
+    """WebSocket.send_json counterpart encoded with result_codec.dumps (sent as a text frame)"""
+    await websocket.send_text(dumps(content).decode("utf-8"))
@@ -0,0 +1,52 @@
+"""
+Cache keys for content-addressed reuse of analysis results.
+
+An analysis is identified by the SHA-256 of the uploaded file plus everything
+that changes its output: analysis mode, decoder and the model / threshold /
+tracking settings read from the environment, and the identity of the weights
+file. Two uploads with the same key produce the same result, so the second
+one can reuse the first job instead of running the model again.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict
+
+# Bump when a code change alters results for the same settings
+RESULT_CACHE_VERSION = 1
+
+# Environment settings that influence analysis results
+RESULT_CONFIG_ENV = (
+    "MODEL_PATH", "INFERENCE_BACKEND", "MODEL_CONFIDENCE_THRESHOLD", "CLASS_THRESHOLDS", "CONFIDENCE_TEMP_SCALE",
+    "NMS_IOU_THRESHOLD", "NMS_CLASS_AGNOSTIC", "SMOOTHING_ALPHA", "RISK_CLASS_WEIGHTS",
+    "TRACK_IOU_THRESHOLD", "MOTION_GATE_ENABLED", "MOTION_THRESHOLD", "MOTION_PIXEL_THRESHOLD",
+    "MOTION_THUMB_WIDTH", "MOTION_MAX_SKIP", "COARSE_STRIDE", "REFINE_WINDOW",
+    "ANALYSIS_WORKERS", "SEGMENT_WORKERS", "SEGMENT_OVERLAP", "SEGMENT_MIN_FRAMES", "STITCH_IOU_THRESHOLD",
+    "DECODE_MAX_SIZE", "DECODE_MAX_FPS", "TILED_INFERENCE", "TILE_SIZE", "TILE_OVERLAP", "TILE_MAX_TILES",
+    "TILE_REGION_MARGIN", "TILE_TRIGGER_CLASSES",
+)
+
+
+def _weights_identity(model_path: str) -> Dict[str, Any]:
+    """Size and mtime of a local weights file, so retrained weights at the same path miss the cache"""
+    try:
+        stat = os.stat(model_path)
+        return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+    except OSError:
+        return {}
+
+
+def config_fingerprint(analysis_mode: str, decoder: str) -> Dict[str, Any]:
+    return {
+        "version": RESULT_CACHE_VERSION,
+        "analysis_mode": analysis_mode,
+        "decoder": decoder,
+        "env": {name: os.getenv(name) for name in RESULT_CONFIG_ENV},
+        "weights": _weights_identity(os.getenv("MODEL_PATH", "yolo11n.pt")),
+    }
+
+
+def analysis_cache_key(content_sha256: str, analysis_mode: str, decoder: str) -> str:
+    """Stable key of (file content, analysis configuration)"""
+    config = json.dumps(config_fingerprint(analysis_mode, decoder), sort_keys=True, separators=(",", ":"))
+    return f"{content_sha256}:{hashlib.sha256(config.encode()).hexdigest()[:16]}"
@@ -0,0 +1,124 @@
+"""
+Serialization of analysis results.
+
+dumps()/loads() are the project's JSON encoder: orjson when installed (with
+native NumPy arrays/scalars and datetimes), the stdlib json module otherwise.
+Columnar Detections are encoded through their to_dicts() while the document
+is written, so callers never build a dict copy of all frames first.
+
+encode_results()/decode_results() add the stored-document format on top: a
+schema_version field and optional zstd/gzip compression
+(RESULTS_COMPRESSION = zstd | gzip | none). decode_results() recognises the
+compression from the payload's magic bytes, so documents written with any
+setting (or by older versions as plain JSON) stay readable.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+RESULTS_SCHEMA_VERSION = 1
+COMPRESSIONS = ("zstd", "gzip", "none")
+# File name suffix per compression
+COMPRESSION_SUFFIXES = {"zstd": ".zst", "gzip": ".gz", "none": ""}
+CONTENT_TYPES = {"zstd": "application/zstd", "gzip": "application/gzip", "none": "application/json"}
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _default(obj: Any) -> Any:
+    # Detections (models.detections) and anything else with a dict form
+    to_dicts = getattr(obj, "to_dicts", None)
+    if to_dicts is not None:
+        return to_dicts()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    # Arrays before scalars: ndarray also has .item(), which only works for size-1 arrays.
+    # orjson hands over the arrays OPT_SERIALIZE_NUMPY rejects (non-contiguous, float16, ...)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__module__}.{type(obj).__name__}")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any) -> bytes:
+        """Compact UTF-8 JSON bytes"""
+        return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def loads(data) -> Any:
+        return json.loads(data)
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def results_compression() -> str:
+    """Configured compression, downgraded to gzip when zstandard is not installed"""
+    compression = os.getenv("RESULTS_COMPRESSION", "zstd").lower()
+    if compression not in COMPRESSIONS:
+        logger.warning(f"Unknown RESULTS_COMPRESSION {compression}, using gzip")
+        compression = "gzip"
+    if compression == "zstd" and _zstd() is None:
+        compression = "gzip"
+    return compression
+
+
+def encode_results(results: Dict[str, Any], compression: str = None) -> Tuple[bytes, str]:
+    """Stored form of an analysis document; returns (payload, compression used)"""
+    compression = compression or results_compression()
+    payload = dumps({"schema_version": RESULTS_SCHEMA_VERSION, **results})
+    if compression == "zstd":
+        try:
+            level = int(os.getenv("RESULTS_ZSTD_LEVEL", "3"))
+        except Exception:
+            level = 3
+        payload = _zstd().ZstdCompressor(level=level).compress(payload)
+    elif compression == "gzip":
+        payload = gzip.compress(payload, compresslevel=6)
+    return payload, compression
+
+
+def decode_results(payload: bytes) -> Dict[str, Any]:
+    """Inverse of encode_results; also reads plain JSON written before versioning (schema_version 0)"""
+    if payload[:4] == _ZSTD_MAGIC:
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed results")
+        payload = zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+    elif payload[:2] == _GZIP_MAGIC:
+        payload = gzip.decompress(payload)
+    results = loads(payload)
+    if isinstance(results, dict):
+        results.setdefault("schema_version", 0)
+    return results
+
@@ -0,0 +1,287 @@
+"""
+Pluggable object storage for uploaded videos, analysis results and model weights.
+
+Keys are "/"-separated paths such as "videos/2024/05/01/<id>.mp4" or
+"results/<id>/analysis.json". Two backends implement the same interface:
+
+- GCSStorage: a Google Cloud Storage bucket (google-cloud-storage is only
+  imported when this backend is used)
+- LocalStorage: a directory tree on local disk, for air-gapped nodes and
+  benchmarks. Files are sharded into sub-directories by a hash of the key so no
+  directory grows unbounded, and every write goes to a temp file that is
+  fsynced and renamed into place, so readers never see partial files.
+
+get_storage() returns the backend selected by STORAGE_BACKEND ("gcs" or
+"local"; default "gcs" when GCP_BUCKET_NAME is set, "local" otherwise).
+"""
+import abc
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from utils.result_codec import COMPRESSION_SUFFIXES, CONTENT_TYPES, decode_results, encode_results
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ("gcs", "local")
+
+
+class StorageBackend(abc.ABC):
+    """Interface shared by all storage backends"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def put_file(self, local_path: str, key: str) -> str:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_file(self, key: str, local_path: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_bytes(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list(self, prefix: str = "") -> List[str]:
+        raise NotImplementedError
+
+    # -- application helpers (same key layout on every backend) ----------
+    def upload_video(self, local_path: str) -> str:
+        """Store an uploaded video; returns its key"""
+        key = f"videos/{datetime.utcnow().strftime('%Y/%m/%d')}/{os.path.basename(local_path)}"
+        self.put_file(local_path, key)
+        logger.info(f"Video stored ({self.name}): {key}")
+        return key
+
+    def save_results(self, video_id: str, results: dict) -> str:
+        """Store the analysis results of video_id (see utils.result_codec); returns their key"""
+        payload, compression = encode_results(results)
+        key = f"results/{video_id}/analysis.json{COMPRESSION_SUFFIXES[compression]}"
+        self.put_bytes(key, payload, content_type=CONTENT_TYPES[compression])
+        logger.info(f"Results stored ({self.name}): {key} ({len(payload)} bytes, {compression})")
+        return key
+
+    def get_results(self, results_path: str) -> dict:
+        return decode_results(self.get_bytes(results_path))
+
+
+class GCSStorage(StorageBackend):
+    """
+    Args:
+        bucket_name: Bucket to use (default GCP_BUCKET_NAME)
+    """
+
+    name = "gcs"
+
+    def __init__(self, bucket_name: Optional[str] = None):
+        self.bucket_name = bucket_name or os.getenv("GCP_BUCKET_NAME")
+        if not self.bucket_name:
+            raise ValueError("GCP_BUCKET_NAME environment variable is not set")
+        from google.cloud import storage
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(self.bucket_name)
+        logger.info(f"GCSStorage initialized with bucket: {self.bucket_name}")
+
+    def put_file(self, local_path: str, key: str) -> str:
+        self.bucket.blob(key).upload_from_filename(local_path)
+        return key
+
+    def get_file(self, key: str, local_path: str) -> None:
+        self.bucket.blob(key).download_to_filename(local_path)
+
+    def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> str:
+        self.bucket.blob(key).upload_from_string(data, content_type=content_type or "application/octet-stream")
+        return key
+
+    def get_bytes(self, key: str) -> bytes:
+        return self.bucket.blob(key).download_as_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self.bucket.blob(key).exists()
+
+    def delete(self, key: str) -> None:
+        self.bucket.blob(key).delete()
+
+    def list(self, prefix: str = "") -> List[str]:
+        return [blob.name for blob in self.client.list_blobs(self.bucket_name, prefix=prefix or None)]
+
+
+class LocalStorage(StorageBackend):
+    """
+    Args:
+        root: Base directory (STORAGE_LOCAL_ROOT, default data/storage)
+
+    A key "a/b/name" is stored as <root>/a/b/<shard>/name, where <shard> is
+    the first two hex digits of the key's SHA-1.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.abspath(root or os.getenv("STORAGE_LOCAL_ROOT", os.path.join("data", "storage")))
+        os.makedirs(self.root, exist_ok=True)
+        logger.info(f"LocalStorage initialized at: {self.root}")
+
+    def _path(self, key: str) -> str:
+        parts = [p for p in key.split("/") if p]
+        if not parts or any(p in (".", "..") for p in parts):
+            raise ValueError(f"Invalid storage key: {key}")
+        shard = hashlib.sha1("/".join(parts).encode("utf-8")).hexdigest()[:2]
+        return os.path.join(self.root, *parts[:-1], shard, parts[-1])
+
+    def _temp_for(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+        os.close(fd)
+        return tmp_path
+
+    @staticmethod
+    def _commit(tmp_path: str, path: str) -> None:
+        try:
+            with open(tmp_path, "rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_file(self, local_path: str, key: str) -> str:
+        path = self._path(key)
+        tmp_path = self._temp_for(path)
+        try:
+            # A hard link avoids copying when the source is on the same filesystem
+            os.remove(tmp_path)
+            os.link(local_path, tmp_path)
+        except OSError:
+            shutil.copyfile(local_path, tmp_path)
+        self._commit(tmp_path, path)
+        return key
+
+    def get_file(self, key: str, local_path: str) -> None:
+        shutil.copyfile(self._path(key), local_path)
+
+    def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> str:
+        path = self._path(key)
+        tmp_path = self._temp_for(path)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self._commit(tmp_path, path)
+        return key
+
+    def get_bytes(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def list(self, prefix: str = "") -> List[str]:
+        keys = []
+        for directory, _, files in os.walk(self.root):
+            rel = os.path.relpath(directory, self.root)
+            parts = [] if rel == "." else rel.split(os.sep)
+            if not parts:
+                continue
+            # Drop the shard directory to get the key's directory
+            for name in files:
+                if name.startswith(".") and name.endswith(".tmp"):
+                    continue
+                key = "/".join(parts[:-1] + [name])
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+_gcs_buckets: Dict[str, GCSStorage] = {}
+
+
+def get_storage() -> StorageBackend:
+    """Process-wide storage backend selected by STORAGE_BACKEND"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = os.getenv("STORAGE_BACKEND") or ("gcs" if os.getenv("GCP_BUCKET_NAME") else "local")
+                if backend not in STORAGE_BACKENDS:
+                    raise ValueError(f"Unknown storage backend: {backend}")
+                _storage = GCSStorage() if backend == "gcs" else LocalStorage()
+    return _storage
+
+
+def _gcs_bucket(bucket_name: str) -> GCSStorage:
+    with _storage_lock:
+        if bucket_name not in _gcs_buckets:
+            _gcs_buckets[bucket_name] = GCSStorage(bucket_name)
+        return _gcs_buckets[bucket_name]
+
+
+def resolve_uri(uri: str) -> Optional[Tuple[StorageBackend, str]]:
+    """
+    (backend, key) for a storage URI, or None for plain local paths / hub names.
+
+    "gcp://bucket/key" and "gs://bucket/key" address a GCS bucket directly;
+    "storage://key" addresses the configured backend.
+    """
+    for scheme in ("gcp://", "gs://"):
+        if uri.startswith(scheme):
+            bucket_name, _, key = uri[len(scheme):].partition("/")
+            if not bucket_name or not key:
+                raise ValueError(f"Invalid GCS path format: {uri}")
+            return _gcs_bucket(bucket_name), key
+    if uri.startswith("storage://"):
+        key = uri[len("storage://"):]
+        if not key:
+            raise ValueError(f"Invalid storage path format: {uri}")
+        return get_storage(), key
+    return None
+
+
+def fetch_to_local(uri: str, directory: str) -> str:
+    """
+    Local copy of a storage URI in directory, downloaded only if missing;
+    plain paths are returned unchanged.
+    """
+    resolved = resolve_uri(uri)
+    if resolved is None:
+        return uri
+    backend, key = resolved
+    os.makedirs(directory, exist_ok=True)
+    local_path = os.path.join(directory, os.path.basename(key))
+    if not os.path.exists(local_path):
+        logger.info(f"Downloading {uri} -> {local_path}")
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        os.close(fd)
+        try:
+            backend.get_file(key, tmp_path)
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return local_path
@@ -0,0 +1,276 @@
+"""
+Video decoder backends for the analysis pipeline.
+
+"opencv" is a plain cv2.VideoCapture that decodes frames at full source
+resolution. "ffmpeg" runs a local ffmpeg process that decodes with its own
+thread pool, scales frames down to the inference size (and optionally caps
+the frame rate) before they are piped to Python, so a 4K video never
+materialises as 4K arrays. Both expose the subset of the cv2.VideoCapture
+interface used by VideoPipeline (isOpened / read / grab / get / set / release).
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DECODER_BACKENDS = ("opencv", "ffmpeg")
+DEFAULT_DECODER = os.getenv("DECODER_BACKEND", "opencv")
+
+# cv2.CAP_PROP_* values, so callers can pass either cv2 constants or these
+CAP_PROP_POS_FRAMES = 1
+CAP_PROP_FRAME_WIDTH = 3
+CAP_PROP_FRAME_HEIGHT = 4
+CAP_PROP_FPS = 5
+CAP_PROP_FRAME_COUNT = 7
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """ffprobe frame rate ("30000/1001") as a float"""
+    if not rate:
+        return 0.0
+    try:
+        num, _, den = rate.partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _parse_rotation(stream: Dict[str, Any]) -> int:
+    """Display rotation in degrees (0/90/180/270) from the display matrix or the legacy rotate tag"""
+    for side_data in stream.get("side_data_list") or []:
+        if "rotation" in side_data:
+            try:
+                return int(round(float(side_data["rotation"]))) % 360
+            except (TypeError, ValueError):
+                pass
+    try:
+        return int((stream.get("tags") or {}).get("rotate", 0)) % 360
+    except (TypeError, ValueError):
+        return 0
+
+
+def probe_video(path: str) -> Dict[str, Any]:
+    """
+    Width, height, fps and frame count of the first video stream (via ffprobe).
+
+    width/height are the displayed dimensions: ffmpeg auto-rotates on decode,
+    so for 90/270 degree rotation metadata (portrait phone videos) the stored
+    dimensions are swapped.
+    """
+    output = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries",
+            "stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration"
+            ":stream_tags=rotate:stream_side_data=rotation:format=duration",
+            "-of", "json", path
+        ],
+        capture_output=True, check=True, timeout=30
+    ).stdout
+    info = json.loads(output or b"{}")
+    streams = info.get("streams") or []
+    if not streams:
+        raise ValueError(f"No video stream in {path}")
+    stream = streams[0]
+    fps = _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate"))
+    duration = float(stream.get("duration") or (info.get("format") or {}).get("duration") or 0.0)
+    try:
+        frame_count = int(stream["nb_frames"])
+    except (KeyError, TypeError, ValueError):
+        frame_count = int(round(duration * fps)) if fps > 0 else 0
+    width, height = int(stream["width"]), int(stream["height"])
+    rotation = _parse_rotation(stream)
+    if rotation in (90, 270):
+        width, height = height, width
+    return {
+        "width": width,
+        "height": height,
+        "rotation": rotation,
+        "fps": fps,
+        "duration": duration,
+        "frame_count": frame_count,
+    }
+
+
+def _scaled_size(width: int, height: int, max_size: int) -> Tuple[int, int]:
+    """Fit (width, height) into max_size on the long side; even dimensions for the scaler"""
+    if max_size <= 0 or max(width, height) <= max_size:
+        return width - width % 2, height - height % 2
+    scale = max_size / max(width, height)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+class FFmpegCapture:
+    """
+    cv2.VideoCapture-compatible reader over an ffmpeg rawvideo (BGR24) pipe.
+
+    Args:
+        path: Local video file
+        max_size: Longest output side in pixels (DECODE_MAX_SIZE, default 640;
+            0 keeps the source resolution)
+        max_fps: Output frame rate cap (DECODE_MAX_FPS, default 0 = source rate)
+        threads: ffmpeg decoder threads (FFMPEG_THREADS, default 0 = auto)
+
+    Frame indices, FRAME_COUNT and FPS refer to the output stream, i.e. after
+    the frame rate cap. frame_scale maps output pixels back to source pixels.
+    ffmpeg applies rotation metadata, so frames and all sizes are upright.
+    """
+
+    backend = "ffmpeg"
+
+    def __init__(
+        self,
+        path: str,
+        max_size: Optional[int] = None,
+        max_fps: Optional[float] = None,
+        threads: Optional[int] = None
+    ):
+        self.path = path
+        self.max_size = int(max_size if max_size is not None else _env_float("DECODE_MAX_SIZE", 640))
+        self.max_fps = max_fps if max_fps is not None else _env_float("DECODE_MAX_FPS", 0)
+        self.threads = int(threads if threads is not None else _env_float("FFMPEG_THREADS", 0))
+        self._process: Optional[subprocess.Popen] = None
+        self._position = 0
+        self._opened = False
+        try:
+            self.source = probe_video(path)
+        except Exception as e:
+            logger.error(f"ffprobe failed for {path}: {str(e)}")
+            return
+
+        self.width, self.height = _scaled_size(self.source["width"], self.source["height"], self.max_size)
+        self.frame_scale = (self.source["width"] / self.width, self.source["height"] / self.height)
+        self.source_shape = (self.source["height"], self.source["width"], 3)
+        source_fps = self.source["fps"]
+        self.fps = min(source_fps, self.max_fps) if self.max_fps > 0 and source_fps > 0 else source_fps
+        if self.fps < source_fps:
+            self.frame_count = int(self.source["duration"] * self.fps)
+        else:
+            self.frame_count = self.source["frame_count"]
+        self._frame_bytes = self.width * self.height * 3
+        self._opened = self._start(0)
+
+    def _start(self, frame_index: int) -> bool:
+        self._stop()
+        command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-threads", str(self.threads)]
+        if frame_index > 0 and self.fps > 0:
+            # Input seeking; ffmpeg decodes from the previous keyframe and drops frames up to the target
+            command += ["-ss", f"{frame_index / self.fps:.6f}"]
+        filters = []
+        if self.fps < self.source["fps"]:
+            filters.append(f"fps={self.fps}")
+        if (self.width, self.height) != (self.source["width"], self.source["height"]):
+            filters.append(f"scale={self.width}:{self.height}:flags=area")
+        command += ["-i", self.path, "-an", "-sn"]
+        if filters:
+            command += ["-vf", ",".join(filters)]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        try:
+            self._process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                bufsize=self._frame_bytes * 4
+            )
+        except OSError as e:
+            logger.error(f"Could not start ffmpeg: {str(e)}")
+            self._process = None
+            return False
+        self._position = frame_index
+        return True
+
+    def _stop(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.stdout is not None:
+            process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+    def _read_bytes(self) -> Optional[bytearray]:
+        if self._process is None:
+            return None
+        buffer = bytearray(self._frame_bytes)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < self._frame_bytes:
+            n = self._process.stdout.readinto(view[filled:])
+            if not n:
+                return None
+            filled += n
+        self._position += 1
+        return buffer
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        buffer = self._read_bytes()
+        if buffer is None:
+            return False, None
+        return True, np.frombuffer(buffer, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def grab(self) -> bool:
+        return self._read_bytes() is not None
+
+    def get(self, prop: int) -> float:
+        if not self._opened:
+            return 0.0
+        if prop == CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop == CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == CAP_PROP_POS_FRAMES:
+            return float(self._position)
+        if prop == CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        return 0.0
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop != CAP_PROP_POS_FRAMES or not self._opened:
+            return False
+        frame_index = max(0, int(value))
+        if frame_index == self._position:
+            return True
+        return self._start(frame_index)
+
+    def release(self) -> None:
+        self._stop()
+        self._opened = False
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def open_video(path: str, backend: Optional[str] = None):
+    """
+    Open path with the given decoder backend (default DECODER_BACKEND).
+    Falls back to OpenCV when ffmpeg is not installed.
+    """
+    backend = backend or DEFAULT_DECODER
+    if backend not in DECODER_BACKENDS:
+        raise ValueError(f"Unknown decoder backend: {backend}")
+    if backend == "ffmpeg":
+        if ffmpeg_available():
+            return FFmpegCapture(path)
+        logger.warning("ffmpeg/ffprobe not found, decoding with OpenCV")
+    import cv2
+    return cv2.VideoCapture(path)
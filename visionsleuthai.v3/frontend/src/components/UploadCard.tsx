@@ -2,7 +2,7 @@
 
 import { useState, useCallback, useRef, useEffect } from 'react';
 import { useDropzone } from 'react-dropzone';
-import { uploadVideo, getAnalysisResults, type AnalysisResult } from '@/utils/api';
+import { uploadVideo, getAnalysisResults, watchAnalysisProgress, type AnalysisResult } from '@/utils/api';
 import { CloudArrowUpIcon } from '@heroicons/react/24/outline';
 
 type UploadCardProps = {
@@ -58,6 +58,14 @@ const UploadCard = ({ onUploadComplete }: UploadCardProps): JSX.Element => {
       // Analiz sonuçlarını bekle
       setIsAnalyzing(true);
       setProgress(10); // Upload tamamlandı
+
+      // Progress is pushed by the server; the loop below then only fetches the
+      // final result (or keeps polling if the stream is unavailable)
+      await watchAnalysisProgress(id, (event) => {
+        if (typeof event.progress === 'number' && event.progress >= 0) {
+          setProgress(Math.min(95, 10 + event.progress * 0.85));
+        }
+      });
       
       let retryCount = 0;
       const maxRetries = 60; // 2 dakika timeout (60 * 2 saniye)
@@ -154,8 +154,57 @@ export const uploadVideo = async (file: File): Promise<AnalysisResult> => {
   }
 };
 
+export interface FramesQuery {
+  offset?: number;
+  limit?: number;
+  from_frame?: number;
+  to_frame?: number;
+  from_time?: number;
+  to_time?: number;
+  class?: string;
+  min_conf?: number;
+}
+
+export interface FramesPage {
+  id: string;
+  status: string;
+  total: number;
+  offset: number;
+  limit: number;
+  next_offset: number | null;
+  frames: Frame[];
+}
+
+export const getAnalysisFrames = async (videoId: string, query: FramesQuery = {}): Promise<FramesPage> => {
+  const params = new URLSearchParams();
+  Object.entries(query).forEach(([key, value]) => {
+    if (value !== undefined && value !== null) params.append(key, String(value));
+  });
+  const qs = params.toString();
+  const response = await fetch(`${API_BASE_URL}/api/video/analysis/${videoId}/frames${qs ? `?${qs}` : ''}`);
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.detail || 'Failed to get analysis frames');
+  }
+
+  return await response.json();
+};
+
+const getAllAnalysisFrames = async (videoId: string): Promise<Frame[]> => {
+  const frames: Frame[] = [];
+  let offset: number | null = 0;
+  while (offset !== null) {
+    const page: FramesPage = await getAnalysisFrames(videoId, { offset });
+    frames.push(...page.frames);
+    offset = page.next_offset;
+  }
+  return frames;
+};
+
 export const getAnalysisResults = async (videoId: string): Promise<AnalysisResult> => {
   try {
+    // Polling only returns status/summary; frames are fetched once the job is done
     const response = await fetch(`${API_BASE_URL}/api/video/analysis/${videoId}`);
     
     if (!response.ok) {
@@ -163,13 +212,90 @@ export const getAnalysisResults = async (videoId: string): Promise<AnalysisResul
       throw new Error(errorData.detail || 'Failed to get analysis results');
     }
 
-    return await response.json();
+    const result = await response.json();
+    if (result.status === 'completed' && !result.frames) {
+      result.frames = await getAllAnalysisFrames(videoId);
+      if (result.analysis_data) result.analysis_data.frames = result.frames;
+    }
+    return result;
   } catch (error) {
     console.error('Analysis results error:', error);
     throw error;
   }
 };
 
+export interface AnalysisProgressEvent {
+  status?: string;
+  progress?: number;
+  processed_frames?: number;
+  total_frames?: number;
+  analysis_pass?: string;
+  queue_position?: number;
+}
+
+export interface ThreatEvent {
+  frame_index: number;
+  timestamp?: string;
+  class_name: string;
+  confidence: number;
+  track_id: number | null;
+  bbox: number[];
+  alert_level?: string;
+}
+
+export interface AnalysisCompleteEvent {
+  id: string;
+  status: string;
+  results_url: string;
+  frames_url?: string;
+  frame_count?: number;
+  error?: string;
+}
+
+/**
+ * Follow an analysis job over server-sent events until it finishes.
+ * Resolves with the completion message, or null if the stream is unavailable
+ * or drops (callers then fall back to polling getAnalysisResults).
+ */
+export const watchAnalysisProgress = (
+  videoId: string,
+  onProgress: (event: AnalysisProgressEvent) => void,
+  onThreat?: (event: ThreatEvent) => void
+): Promise<AnalysisCompleteEvent | null> => {
+  if (typeof EventSource === 'undefined') return Promise.resolve(null);
+  return new Promise((resolve) => {
+    const source = new EventSource(`${API_BASE_URL}/api/video/analysis/${videoId}/events`);
+    const finish = (result: AnalysisCompleteEvent | null) => {
+      source.close();
+      resolve(result);
+    };
+    source.addEventListener('progress', (event) => {
+      try {
+        onProgress(JSON.parse((event as MessageEvent).data));
+      } catch (error) {
+        console.error('Invalid progress event:', error);
+      }
+    });
+    source.addEventListener('threat', (event) => {
+      if (!onThreat) return;
+      try {
+        onThreat(JSON.parse((event as MessageEvent).data));
+      } catch (error) {
+        console.error('Invalid threat event:', error);
+      }
+    });
+    source.addEventListener('complete', (event) => {
+      try {
+        finish(JSON.parse((event as MessageEvent).data));
+      } catch {
+        finish(null);
+      }
+    });
+    // EventSource would reconnect on its own; polling takes over instead
+    source.onerror = () => finish(null);
+  });
+};
+
 export function connectToWebSocket(
   clientId: string,
   onMessage: (result: AnalysisResult) => void,
@@ -209,6 +335,17 @@ export async function startLiveAnalysis(): Promise<void> {
   }
 }
 
+// One live session (and tracker) per browser tab
+let liveClientId: string | null = null;
+const getLiveClientId = (): string => {
+  if (!liveClientId) {
+    liveClientId = typeof crypto !== 'undefined' && 'randomUUID' in crypto
+      ? crypto.randomUUID()
+      : `client-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+  }
+  return liveClientId;
+};
+
 /**
  * Send a frame to the backend for live analysis
  * 
@@ -243,7 +380,7 @@ export const sendFrame = async (imageData: string) => {
       const response = await fetch(endpoint, {
       method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ image: imageData }),
+      body: JSON.stringify({ image: imageData, client_id: getLiveClientId() }),
         // 10s timeout to match Vercel's serverless function limit
         signal: AbortSignal.timeout(10000),
     });